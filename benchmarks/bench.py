@@ -0,0 +1,199 @@
+"""Benchmarks for parsing, stats and Markdown export
+
+Generates synthetic ledgers with `xplitpay.synthetic` for each size tier,
+then times `parse_xplit`, `compute_stats`, `generate_markdown` (both
+locales, and again with warm fragments) and `export_report` (both locales,
+CSV and JSON Lines at once), and records their peak traced memory. Results
+are written as JSON so that runs can be compared:
+
+    python benchmarks/bench.py --tiers 1000 10000 100000 --output before.json
+    python benchmarks/bench.py --tiers 1000 10000 100000 --output after.json
+    python benchmarks/bench.py --compare before.json after.json
+
+`--large` adds the 1M-entry tier to whichever tiers are given.
+"""
+import argparse
+import gc
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+from pathlib import Path
+from typing import List
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+import xplitpay  # noqa: E402
+from xplitpay.export import (  # noqa: E402
+    MarkdownFragmentCache,
+    compute_stats,
+    export_report,
+    generate_markdown,
+)
+from xplitpay.synthetic import write_xplit  # noqa: E402
+from loguru import logger  # noqa: E402
+
+DEFAULT_TIERS = [1000, 10000, 100000]
+# Slow and memory hungry, so only run with --large
+LARGE_TIERS = [1000000]
+PARSE_OPTIONS = dict(SUPPORT_48_HOURS=True, ALWAYS_INVOLVE_EVERYONE=True)
+
+
+def _measure(func, repeat: int):
+    """Best wall time over `repeat` runs, then one traced run for peak memory."""
+    best = float("inf")
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+        del result
+    gc.collect()
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return best, peak
+
+
+def bench_tier(
+    n_entries: int, n_people: int, repeat: int, directory: Path
+) -> List[dict]:
+    path = directory / f"bench_{n_entries}.xplit"
+    write_xplit(path, n_entries=n_entries, n_people=n_people, n_currencies=3)
+    xplit_log = xplitpay.parse_xplit(path, **PARSE_OPTIONS)
+    # Warm fragments, re-used by a fresh parse as after an edit-and-save
+    fragments = MarkdownFragmentCache()
+    generate_markdown(xplit_log, io.StringIO(), locale="en", fragments=fragments)
+    reparsed = xplitpay.parse_xplit(path, **PARSE_OPTIONS)
+    cases = {
+        "parse_xplit": lambda: xplitpay.parse_xplit(path, **PARSE_OPTIONS),
+        "compute_stats": lambda: compute_stats(xplit_log),
+        "generate_markdown[zh_CN]": lambda: generate_markdown(
+            xplit_log, io.StringIO(), locale="zh_CN"
+        ),
+        "generate_markdown[en]": lambda: generate_markdown(
+            xplit_log, io.StringIO(), locale="en"
+        ),
+        "generate_markdown[cached]": lambda: generate_markdown(
+            reparsed, io.StringIO(), locale="en", fragments=fragments
+        ),
+        "export_report[all]": lambda: export_report(
+            xplit_log,
+            {
+                name: io.StringIO()
+                for name in ("markdown", "markdown:en", "csv", "jsonl")
+            },
+        ),
+    }
+    results = []
+    for name, func in cases.items():
+        seconds, peak = _measure(func, repeat)
+        results.append(
+            {
+                "benchmark": name,
+                "entries": n_entries,
+                "people": n_people,
+                "seconds": seconds,
+                "entries_per_second": n_entries / seconds if seconds else None,
+                "peak_bytes": peak,
+            }
+        )
+        print(
+            f"{name:<26} {n_entries:>9} entries  {seconds * 1000:>10.2f} ms"
+            f"  {peak / 2 ** 20:>9.2f} MiB",
+            file=sys.stderr,
+        )
+    path.unlink()
+    return results
+
+
+def bench_startup(repeat: int, directory: Path) -> List[dict]:
+    """Wall time of `xplitpay stats` on a small ledger, from a cold process."""
+    path = directory / "bench_startup.xplit"
+    write_xplit(path, n_entries=100)
+    commands = {
+        "python -c pass": [sys.executable, "-c", "pass"],
+        "xplitpay stats": [sys.executable, "-m", "xplitpay", "stats", str(path)],
+    }
+    env = dict(os.environ, PYTHONPATH=str(ROOT))
+    results = []
+    for name, command in commands.items():
+        best = float("inf")
+        for _ in range(max(repeat, 5)):
+            start = time.perf_counter()
+            subprocess.run(command, stdout=subprocess.DEVNULL, env=env, check=True)
+            best = min(best, time.perf_counter() - start)
+        results.append(
+            {"benchmark": f"startup[{name}]", "entries": 100, "seconds": best}
+        )
+        print(f"startup[{name}]{'':<6} {best * 1000:>10.2f} ms", file=sys.stderr)
+    path.unlink()
+    return results
+
+
+def compare(before_path: str, after_path: str) -> None:
+    def load(path):
+        with open(path, encoding="utf-8") as f:
+            return {
+                (result["benchmark"], result["entries"]): result
+                for result in json.load(f)["results"]
+            }
+
+    before, after = load(before_path), load(after_path)
+    for key in sorted(before.keys() & after.keys(), key=lambda k: (k[1], k[0])):
+        old, new = before[key]["seconds"], after[key]["seconds"]
+        print(f"{key[0]:<26} {key[1]:>9} entries  {old / new if new else 0:>6.2f}x")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--tiers", type=int, nargs="+", default=DEFAULT_TIERS)
+    parser.add_argument(
+        "--large", action="store_true", help="also run the 1M-entry tier"
+    )
+    parser.add_argument("--people", type=int, default=6)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", default="bench_results.json")
+    parser.add_argument("--compare", nargs=2, metavar=("BEFORE", "AFTER"))
+    parser.add_argument(
+        "--startup", action="store_true", help="also time CLI cold starts"
+    )
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        compare(*args.compare)
+        return 0
+
+    logger.remove()
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        tiers = args.tiers + (LARGE_TIERS if args.large else [])
+        for n_entries in dict.fromkeys(tiers):
+            results.extend(
+                bench_tier(n_entries, args.people, args.repeat, Path(directory))
+            )
+        if args.startup:
+            results.extend(bench_startup(args.repeat, Path(directory)))
+    report = {
+        "xplitpay_version": xplitpay.XPLIT_VERSION,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "results": results,
+    }
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {args.output}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
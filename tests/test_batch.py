@@ -0,0 +1,63 @@
+import pytest
+
+import xplitpay
+from xplitpay.batch import find_ledgers, main, process_batch
+from xplitpay.export import compute_stats
+
+
+class TestBatch:
+    @pytest.fixture
+    def ledgers(self, tmp_path):
+        with open("tests/2_ppl.xplit", "r", encoding="utf-8") as f:
+            content = f.read()
+        (tmp_path / "a.xplit").write_text(content, encoding="utf-8")
+        # Same people under different short codes
+        renamed = (
+            content.replace("L -> K", "X -> Y")
+            .replace("L: Lynnex", "X: Lynnex")
+            .replace("K: Kunologist", "Y: Kunologist")
+            .replace(" L:", " X:")
+            .replace(" K:", " Y:")
+            .replace("s(K)", "s(Y)")
+            .replace("s(L)", "s(X)")
+        )
+        (tmp_path / "nested").mkdir()
+        (tmp_path / "nested" / "b.xplit").write_text(renamed, encoding="utf-8")
+        (tmp_path / "broken.xplit").write_text("not a ledger", encoding="utf-8")
+        return tmp_path
+
+    @pytest.mark.parametrize("jobs", [1, 2])
+    def test_process_batch(self, ledgers, jobs):
+        paths = find_ledgers([ledgers])
+        assert len(paths) == 3
+        rollup = process_batch(paths, jobs=jobs, SUPPORT_48_HOURS=True)
+        assert [result.path for result in rollup.results] == [str(p) for p in paths]
+        assert [failure.path for failure in rollup.failures] == [
+            str(ledgers / "broken.xplit")
+        ]
+        stats = compute_stats(
+            xplitpay.parse_xplit("tests/2_ppl.xplit", SUPPORT_48_HOURS=True)
+        )
+        assert rollup.total == pytest.approx(2 * stats["total"])
+        for person, balance in stats["balance"].items():
+            assert rollup.balance[person] == pytest.approx(2 * balance)
+
+    def test_main(self, ledgers, capsys):
+        assert (
+            main([str(ledgers / "*.xplit"), "--jobs", "1", "--support-48-hours"]) == 1
+        )
+        out = capsys.readouterr().out
+        assert "FAILED" in out
+        assert "Kunologist" in out
+
+    def test_main_keeps_log_handlers(self, ledgers):
+        from loguru import logger
+
+        messages = []
+        handler = logger.add(messages.append, level="ERROR")
+        try:
+            assert main([str(ledgers / "broken.xplit"), "--jobs", "1"]) == 1
+        finally:
+            logger.remove(handler)
+        assert any("Failed to process" in message for message in messages)
+        assert xplitpay.logger.min_level == 0
@@ -0,0 +1,33 @@
+import xplitpay
+from xplitpay.cache import XplitCache
+
+
+class TestCache:
+    def test_warm_load(self, tmp_path):
+        cache = XplitCache(tmp_path)
+        cold = cache.parse("tests/2_ppl.xplit", SUPPORT_48_HOURS=True)
+        warm = cache.parse("tests/2_ppl.xplit", SUPPORT_48_HOURS=True)
+        assert (cache.hits, cache.misses) == (1, 1)
+        assert warm == cold
+        assert warm == xplitpay.parse_xplit("tests/2_ppl.xplit", SUPPORT_48_HOURS=True)
+
+        # Different parse options must not share a cache entry
+        cache.parse(
+            "tests/2_ppl.xplit", SUPPORT_48_HOURS=True, ALWAYS_INVOLVE_EVERYONE=True
+        )
+        assert cache.misses == 2
+
+    def test_warm_load_keeps_raw(self, tmp_path):
+        cache = XplitCache(tmp_path)
+        cache.parse("tests/2_ppl.xplit", SUPPORT_48_HOURS=True)
+        cold = cache.parse("tests/2_ppl.xplit", keep_raw=True, SUPPORT_48_HOURS=True)
+        assert cache.misses == 2 and cold.raw is not None
+        warm = cache.parse("tests/2_ppl.xplit", keep_raw=True, SUPPORT_48_HOURS=True)
+        assert cache.hits == 1
+        assert warm == cold and warm.raw == cold.raw
+        assert cache.parse("tests/2_ppl.xplit", SUPPORT_48_HOURS=True).raw is None
+
+    def test_eviction(self, tmp_path):
+        cache = XplitCache(tmp_path, max_bytes=1)
+        cache.parse("tests/2_ppl.xplit", SUPPORT_48_HOURS=True)
+        assert not list(tmp_path.iterdir())
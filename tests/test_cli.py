@@ -0,0 +1,72 @@
+import json
+import subprocess
+import sys
+
+from xplitpay.cli import main
+
+# Seconds to import the CLI and run `stats` on a small ledger, interpreter
+# start-up excluded
+COLD_START_BUDGET = 0.25
+
+
+class TestCli:
+    def test_stats_and_settle(self, capsys):
+        args = ["tests/2_ppl.xplit", "--support-48-hours", "--json"]
+        assert main(["stats", *args]) == 0
+        stats = json.loads(capsys.readouterr().out)
+        assert set(stats) == {"total", "total_expenses", "total_paid", "balance"}
+        assert main(["settle", *args, "--always-involve-everyone"]) == 0
+        settlement = json.loads(capsys.readouterr().out)
+        assert settlement["mode"] == "greedy"
+        assert len(settlement["transfers"]) == 1
+
+    def test_export(self, tmp_path):
+        out = tmp_path / "report.md"
+        args = ["export", "tests/2_ppl.xplit", "--support-48-hours", "-o", str(out)]
+        assert main([*args, "--locale", "en"]) == 0
+        assert out.read_text(encoding="utf-8").startswith("# Osaka & Tokyo")
+        # An explicit output path is used as given, whatever the format
+        assert main([*args, "--format", "jsonl"]) == 0
+        assert len(out.read_text(encoding="utf-8").splitlines()) > 1
+        assert not out.with_suffix(".md.jsonl").exists()
+
+    def test_cold_start_imports(self):
+        # The CLI must not pay for loguru, NumPy or the process pool unless
+        # something actually needs them
+        code = (
+            "import sys\n"
+            "from xplitpay.cli import main\n"
+            "main(['stats', 'tests/2_ppl.xplit', '--support-48-hours'])\n"
+            "print(' '.join(sys.modules))\n"
+        )
+        result = subprocess.run(
+            [sys.executable, "-c", code],
+            stdout=subprocess.PIPE,
+            universal_newlines=True,
+            check=True,
+        )
+        modules = set(result.stdout.splitlines()[-1].split())
+        assert "xplitpay.export" in modules
+        for heavy in ("loguru", "numpy", "concurrent.futures.process"):
+            assert heavy not in modules
+
+    def test_cold_start_budget(self):
+        code = (
+            "import time\n"
+            "start = time.perf_counter()\n"
+            "from xplitpay.cli import main\n"
+            "main(['stats', 'tests/2_ppl.xplit', '--support-48-hours'])\n"
+            "print(time.perf_counter() - start)\n"
+        )
+        best = min(
+            float(
+                subprocess.run(
+                    [sys.executable, "-c", code],
+                    stdout=subprocess.PIPE,
+                    universal_newlines=True,
+                    check=True,
+                ).stdout.splitlines()[-1]
+            )
+            for _ in range(3)
+        )
+        assert best < COLD_START_BUDGET
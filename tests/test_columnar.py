@@ -0,0 +1,33 @@
+import pytest
+
+import xplitpay
+from xplitpay import columnar
+from xplitpay.columnar import to_columns
+from xplitpay.export import compute_stats
+
+
+class TestColumnar:
+    def _assert_same_stats(self, xplitlog):
+        expected = compute_stats(xplitlog)
+        stats = compute_stats(to_columns(xplitlog))
+        assert stats["total"] == pytest.approx(expected["total"])
+        for key in ("total_expenses", "total_paid", "balance"):
+            assert list(stats[key]) == list(expected[key])
+            for person, amount in expected[key].items():
+                assert stats[key][person] == pytest.approx(amount)
+
+    def test_compute_stats(self):
+        xplitlog = xplitpay.parse_xplit(
+            "tests/2_ppl.xplit", SUPPORT_48_HOURS=True, ALWAYS_INVOLVE_EVERYONE=True
+        )
+        self._assert_same_stats(xplitlog)
+
+    def test_compute_stats_without_numpy(self, monkeypatch):
+        monkeypatch.setattr(columnar, "np", None)
+        xplitlog = xplitpay.parse_xplit("tests/2_ppl.xplit", SUPPORT_48_HOURS=True)
+        self._assert_same_stats(xplitlog)
+        columns = to_columns(xplitlog)
+        assert len(columns) == len(xplitlog.entries)
+        assert list(columns.split_column("Lynnex")) == [
+            entry.splits.get("Lynnex", 0) for entry in xplitlog.entries
+        ]
@@ -0,0 +1,28 @@
+import io
+
+import xplitpay
+from xplitpay.compact import CompactEntries, compact_xplit, parse_xplit_compact
+from xplitpay.export import compute_stats
+from xplitpay.synthetic import generate_xplit
+
+
+class TestCompact:
+    def test_same_entries_and_stats(self):
+        kwargs = dict(SUPPORT_48_HOURS=True, ALWAYS_INVOLVE_EVERYONE=True)
+        xplitlog = xplitpay.parse_xplit("tests/2_ppl.xplit", **kwargs)
+        compact = parse_xplit_compact("tests/2_ppl.xplit", **kwargs)
+        assert isinstance(compact.entries, CompactEntries)
+        assert compact.entries == xplitlog.entries
+        assert [entry.to_entry() for entry in compact.entries] == xplitlog.entries
+        assert compact.entries[-1] == xplitlog.entries[-1]
+        assert compute_stats(compact) == compute_stats(xplitlog)
+        assert compact.people == xplitlog.people
+
+    def test_interning(self):
+        content = generate_xplit(n_entries=300, n_people=3)
+        xplitlog = compact_xplit(xplitpay.parse_xplit(io.StringIO(content)))
+        entries = xplitlog.entries
+        assert len(entries) == 300
+        assert sorted(entries.people) == sorted(xplitlog.people.values())
+        assert len(entries.payment_methods) <= 4
+        assert len(entries.split_offsets) == len(entries) + 1
@@ -0,0 +1,55 @@
+from dataclasses import replace
+
+import pytest
+
+import xplitpay
+from xplitpay.cli import main
+from xplitpay.diff import diff_to_dict, diff_xplit, format_diff
+from xplitpay.export import compute_stats
+
+OPTIONS = dict(SUPPORT_48_HOURS=True, ALWAYS_INVOLVE_EVERYONE=True)
+
+
+class TestDiff:
+    def test_diff_xplit(self):
+        old = xplitpay.parse_xplit("tests/2_ppl.xplit", **OPTIONS)
+        assert not diff_xplit(old, old)
+        assert format_diff(diff_xplit(old, old)) == "No changes"
+
+        new = xplitpay.parse_xplit("tests/2_ppl.xplit", **OPTIONS)
+        removed = new.entries.pop(3)
+        new.entries[10] = replace(new.entries[10], expense=1.0, splits={"Lynnex": 1.0})
+        new.entries[20] = replace(new.entries[20], description="edited")
+        new.entries.append(replace(removed, title="moved", section_title="elsewhere"))
+        # Duplicates pair up in order
+        new.entries.append(new.entries[30])
+        new.extra_payments = new.extra_payments[1:]
+
+        diff = diff_xplit(old, new)
+        assert diff.removed == [removed]
+        assert diff.added == new.entries[-2:]
+        assert [new_entry for _, new_entry in diff.changed] == [
+            new.entries[10],
+            new.entries[20],
+        ]
+        assert diff.unchanged == len(old.entries) - 3
+        assert diff.extra_payments_removed == old.extra_payments[:1]
+
+        old_stats, new_stats = compute_stats(old), compute_stats(new)
+        assert diff.total_delta == pytest.approx(
+            new_stats["total"] - old_stats["total"]
+        )
+        for person in old_stats["balance"]:
+            assert diff.balance_delta.get(person, 0) == pytest.approx(
+                new_stats["balance"][person] - old_stats["balance"][person]
+            )
+        assert diff_to_dict(diff)["changed"][1]["fields"] == ["description"]
+
+    def test_cli(self, tmp_path, capsys):
+        new = tmp_path / "new.xplit"
+        source = open("tests/2_ppl.xplit", encoding="utf-8").read()
+        new.write_text(source.replace("J1653", "J1700"), encoding="utf-8")
+        args = ["diff", "tests/2_ppl.xplit", str(new), "--support-48-hours"]
+        assert main(args) == 1
+        assert capsys.readouterr().out.startswith("~ ")
+        assert main(["diff", "tests/2_ppl.xplit", "tests/2_ppl.xplit", *args[3:]]) == 0
@@ -0,0 +1,91 @@
+import csv
+import io
+import json
+from dataclasses import replace
+
+import xplitpay
+from xplitpay.export import MarkdownFragmentCache, export_report, generate_markdown
+
+
+class TestExport:
+    def test_generate_markdown_stream(self):
+        xplitlog = xplitpay.parse_xplit(
+            "tests/2_ppl.xplit", SUPPORT_48_HOURS=True, ALWAYS_INVOLVE_EVERYONE=True
+        )
+        for locale in ("zh_CN", "en"):
+            out = io.StringIO()
+            generate_markdown(xplitlog, out, locale=locale, include_source=False)
+            report = out.getvalue()
+            assert report.startswith(f"# {xplitlog.title}\n")
+            assert report.count("\n### ") == len(xplitlog.entries)
+            assert "```plaintext" not in report
+        out = io.StringIO()
+        generate_markdown(xplitlog, out)
+        assert xplitlog.original_content in out.getvalue()
+
+    def test_export_report(self, monkeypatch):
+        xplitlog = xplitpay.parse_xplit(
+            "tests/2_ppl.xplit", SUPPORT_48_HOURS=True, ALWAYS_INVOLVE_EVERYONE=True
+        )
+        calls = []
+        compute_stats = xplitpay.export.compute_stats
+        monkeypatch.setattr(
+            xplitpay.export,
+            "compute_stats",
+            lambda *args: calls.append(args) or compute_stats(*args),
+        )
+        outputs = {name: io.StringIO() for name in ("markdown", "markdown:en")}
+        outputs.update(csv=io.StringIO(), jsonl=io.StringIO())
+        report = export_report(xplitlog, outputs, include_source=False)
+        assert len(calls) == 1
+
+        for name in ("markdown", "markdown:en"):
+            single = io.StringIO()
+            generate_markdown(
+                xplitlog, single, locale=name[9:] or "zh_CN", include_source=False
+            )
+            # Reports only differ by their generation time
+            expected = single.getvalue().split("\n")
+            assert outputs[name].getvalue().split("\n")[:-4] == expected[:-4]
+
+        rows = list(csv.reader(io.StringIO(outputs["csv"].getvalue())))
+        assert rows[0][-2:] == report.people == ["Lynnex", "Kunologist"]
+        lines = outputs["jsonl"].getvalue().splitlines()
+        assert len(rows) - 1 == len(lines) == len(xplitlog.entries)
+        ordered = [entry for section in report.sections for entry in section.entries]
+        assert (
+            [json.loads(line)["title"] for line in lines]
+            == [row[1] for row in rows[1:]]
+            == [entry.title for entry in ordered]
+        )
+        assert sorted(map(id, ordered)) == sorted(map(id, xplitlog.entries))
+
+    def test_markdown_fragment_cache(self):
+        xplitlog = xplitpay.parse_xplit(
+            "tests/2_ppl.xplit", SUPPORT_48_HOURS=True, ALWAYS_INVOLVE_EVERYONE=True
+        )
+        n_sections = len({entry.section_title for entry in xplitlog.entries})
+
+        def render(fragments=None):
+            out = io.StringIO()
+            generate_markdown(
+                xplitlog, out, locale="en", include_source=False, fragments=fragments
+            )
+            # Drop the generation time
+            return out.getvalue().split("\n")[:-4]
+
+        fragments = MarkdownFragmentCache()
+        assert render(fragments) == render()
+        assert (fragments.hits, fragments.misses) == (0, n_sections)
+        assert render(fragments) == render()
+        assert (fragments.hits, fragments.misses) == (n_sections, n_sections)
+
+        # A freshly parsed ledger with one edited entry re-renders one section
+        xplitlog = xplitpay.parse_xplit(
+            "tests/2_ppl.xplit", SUPPORT_48_HOURS=True, ALWAYS_INVOLVE_EVERYONE=True
+        )
+        xplitlog.entries[5] = replace(xplitlog.entries[5], title="edited")
+        report = render(fragments)
+        assert "### edited" in report and report == render()
+        assert fragments.misses == n_sections + 1
+        assert len(fragments) == n_sections
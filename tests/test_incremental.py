@@ -0,0 +1,38 @@
+import io
+
+import pytest
+
+import xplitpay
+from xplitpay.export import compute_stats
+from xplitpay.incremental import IncrementalXplit
+
+
+def _assert_same_stats(stats, expected):
+    assert stats["total"] == pytest.approx(expected["total"])
+    for key in ("total_expenses", "total_paid", "balance"):
+        assert set(stats[key]) == set(expected[key])
+        for person, amount in expected[key].items():
+            assert stats[key][person] == pytest.approx(amount)
+
+
+class TestIncremental:
+    def test_update_changed_section(self):
+        options = dict(SUPPORT_48_HOURS=True, ALWAYS_INVOLVE_EVERYONE=True)
+        with open("tests/2_ppl.xplit", "r", encoding="utf-8") as f:
+            content = f.read()
+        ledger = IncrementalXplit(**options)
+        result = ledger.update(content)
+        assert result.full and result.reused == 0
+        expected = xplitpay.parse_xplit(io.StringIO(content), **options)
+        assert ledger.xplit_log.entries == expected.entries
+        _assert_same_stats(ledger.stats, compute_stats(expected))
+
+        edited = content.replace("J1380 s(K)J790", "J2380 s(K)J790").replace(
+            '"LAWSON" "咖啡糖、梅片和葡萄茶" 1947 L:WECHAT J546 s(K)0.5\n', ""
+        )
+        result = ledger.update(edited)
+        assert not result.full
+        assert (result.reparsed, result.removed) == (2, 2)
+        expected = xplitpay.parse_xplit(io.StringIO(edited), **options)
+        assert ledger.xplit_log.entries == expected.entries
+        _assert_same_stats(ledger.stats, compute_stats(expected))
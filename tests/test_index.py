@@ -0,0 +1,60 @@
+import io
+from datetime import date, datetime
+
+import pytest
+
+import xplitpay
+from xplitpay.export import compute_stats
+from xplitpay.synthetic import generate_xplit
+
+
+def _in_range(entry, start, end):
+    return entry.time is not None and start <= entry.time < end
+
+
+class TestIndex:
+    def test_range_queries_match_scan(self):
+        content = generate_xplit(n_entries=2000, n_people=5, n_currencies=3, seed=3)
+        xplitlog = xplitpay.parse_xplit(io.StringIO(content))
+        index = xplitlog.index()
+        assert xplitlog.index() is index
+        start, end = datetime(2024, 1, 10, 12), datetime(2024, 2, 20)
+        entries = [e for e in xplitlog.entries if _in_range(e, start, end)]
+        assert index.entries_between(start, end) == sorted(
+            entries, key=lambda e: e.time
+        )
+        assert index.total(start, end) == pytest.approx(sum(e.expense for e in entries))
+        for person in xplitlog.people.values():
+            assert index.spent(person, start, end) == pytest.approx(
+                sum(e.splits.get(person, 0) for e in entries)
+            )
+            assert index.paid(person, start, end) == pytest.approx(
+                sum(e.expense for e in entries if e.paid_by == person)
+            )
+        for method in xplitlog.payment_methods.values():
+            day = [
+                e
+                for e in xplitlog.entries
+                if e.time is not None and e.time.date() == date(2024, 1, 3)
+            ]
+            expected = sum(e.expense for e in day if e.payment_method == method)
+            assert index.total(
+                date(2024, 1, 3), date(2024, 1, 3), payment_method=method
+            ) == pytest.approx(expected)
+
+    def test_unbounded_queries_and_sections(self):
+        xplitlog = xplitpay.parse_xplit("tests/2_ppl.xplit", SUPPORT_48_HOURS=True)
+        index = xplitlog.index()
+        stats = compute_stats(xplitlog)
+        assert index.total() == pytest.approx(stats["total"])
+        for person, amount in stats["total_expenses"].items():
+            assert index.spent(person) == pytest.approx(amount)
+        assert len(index.entries_between()) == len(xplitlog.entries)
+        title = xplitlog.entries[-1].section_title
+        section = [e for e in xplitlog.entries if e.section_title == title]
+        assert index.section(title) == section
+        assert index.section_total(title) == pytest.approx(
+            sum(e.expense for e in section)
+        )
+        xplitlog.entries.append(xplitlog.entries[0])
+        assert xplitlog.index() is not index
@@ -0,0 +1,87 @@
+import threading
+
+import pytest
+
+import xplitpay
+from xplitpay import XplitLog
+from xplitpay.export import compute_stats
+from xplitpay.live import LiveLedger
+
+
+def _assert_stats(stats, expected):
+    assert stats["total"] == pytest.approx(expected["total"])
+    for key in ("total_expenses", "total_paid", "balance"):
+        assert stats[key] == pytest.approx(expected[key])
+
+
+class TestLive:
+    def test_changes_match_compute_stats(self):
+        xplitlog = xplitpay.parse_xplit(
+            "tests/2_ppl.xplit", SUPPORT_48_HOURS=True, ALWAYS_INVOLVE_EVERYONE=True
+        )
+        ledger = LiveLedger(xplitlog)
+        _assert_stats(ledger.stats, compute_stats(xplitlog))
+
+        entries = ledger.entries()
+        ids = list(entries)
+        ledger.remove_entry(ids[0])
+        ledger.update_entry(ids[1], entries[2])
+        payment_id = next(iter(ledger.extra_payments()))
+        ledger.update_extra_payment(payment_id, "Kunologist", "Lynnex", 100.0)
+        expected = XplitLog(
+            xplitlog.version,
+            xplitlog.title,
+            xplitlog.author,
+            xplitlog.people,
+            xplitlog.currencies,
+            xplitlog.currency_main,
+            xplitlog.payment_methods,
+            xplitlog.description,
+            list(ledger.entries().values()),
+            list(ledger.extra_payments().values()),
+        )
+        _assert_stats(ledger.stats, compute_stats(expected))
+        assert ledger.snapshot().n_entries == len(xplitlog.entries) - 1
+
+        for entry_id in ledger.entries():
+            ledger.remove_entry(entry_id)
+        for payment_id in ledger.extra_payments():
+            ledger.remove_extra_payment(payment_id)
+        assert ledger.stats == {
+            "total": 0,
+            "total_expenses": {},
+            "total_paid": {},
+            "balance": {},
+        }
+
+    def test_concurrent_writers(self):
+        xplitlog = xplitpay.parse_xplit("tests/2_ppl.xplit", SUPPORT_48_HOURS=True)
+        ledger = LiveLedger()
+        errors = []
+
+        def write(entries):
+            for entry in entries:
+                ledger.update_entry(ledger.add_entry(entry), entry)
+
+        def read():
+            for _ in range(200):
+                snapshot = ledger.snapshot()
+                stats = snapshot.stats
+                # Without extra payments, balances are exactly paid - spent
+                for person, balance in stats["balance"].items():
+                    expected = stats["total_paid"].get(person, 0)
+                    expected -= stats["total_expenses"][person]
+                    if balance != pytest.approx(expected):
+                        errors.append(snapshot)
+
+        threads = [
+            threading.Thread(target=write, args=(xplitlog.entries[i::4],))
+            for i in range(4)
+        ] + [threading.Thread(target=read)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert not errors
+        xplitlog.extra_payments = []
+        _assert_stats(ledger.stats, compute_stats(xplitlog))
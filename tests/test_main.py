@@ -15,3 +15,22 @@ class TestMain:
         )
         generate_markdown(xplitlog, "test.md", locale="en")
         assert True
+
+    def test_iter_xplit(self):
+        xplitlog = xplitpay.parse_xplit(
+            "tests/2_ppl.xplit", SUPPORT_48_HOURS=True, ALWAYS_INVOLVE_EVERYONE=True
+        )
+        with open("tests/2_ppl.xplit", "r", encoding="utf-8") as f:
+            entries = list(
+                xplitpay.iter_xplit(
+                    f, SUPPORT_48_HOURS=True, ALWAYS_INVOLVE_EVERYONE=True
+                )
+            )
+        assert entries == xplitlog.entries
+        assert xplitlog.original_content.startswith("@xplit")
+
+    def test_parse_xplit_workers(self):
+        options = dict(SUPPORT_48_HOURS=True, ALWAYS_INVOLVE_EVERYONE=True)
+        serial = xplitpay.parse_xplit("tests/2_ppl.xplit", **options)
+        parallel = xplitpay.parse_xplit("tests/2_ppl.xplit", workers=2, **options)
+        assert parallel == serial
@@ -0,0 +1,67 @@
+import io
+
+import pytest
+
+import xplitpay
+from xplitpay import money
+from xplitpay.export import compute_stats
+from xplitpay.money import allocate, to_minor, to_money
+from xplitpay.settle import settle
+from xplitpay.synthetic import generate_xplit
+
+OPTIONS = dict(SUPPORT_48_HOURS=True, ALWAYS_INVOLVE_EVERYONE=True)
+
+
+class TestMoney:
+    def test_rounding(self):
+        assert [to_minor(x) for x in (2.675, 0.125, 0.135, 1.005, 7552.0)] == [
+            268,
+            12,
+            14,
+            100,
+            755200,
+        ]
+        assert allocate(10000, [100 / 3] * 3) == [3334, 3333, 3333]
+        assert allocate(10000, [33.335, 66.665]) == [3334, 6666]
+        # Splits that do not cover the expense keep their own total
+        assert allocate(10000, [50.0]) == [5000]
+
+    @pytest.mark.parametrize("use_numpy", [True, False])
+    def test_matches_compute_stats(self, monkeypatch, use_numpy):
+        if not use_numpy:
+            monkeypatch.setattr(money, "np", None)
+        xplitlog = xplitpay.parse_xplit("tests/2_ppl.xplit", **OPTIONS)
+        columns = to_money(xplitlog)
+        expected = compute_stats(xplitlog)
+        stats = compute_stats(columns)
+        # Every entry is rounded to the cent on its own
+        tolerance = 0.005 * len(xplitlog.entries)
+        assert stats["total"] == pytest.approx(expected["total"])
+        for key in ("total_expenses", "total_paid", "balance"):
+            assert list(stats[key]) == list(expected[key])
+            for person, amount in expected[key].items():
+                assert stats[key][person] == pytest.approx(amount, abs=tolerance)
+        assert columns.reconcile().ok
+        settlement = settle(columns)
+        assert settlement.residual == 0
+        assert settlement.transfers == [
+            ("Lynnex", "Kunologist", stats["balance"]["Kunologist"])
+        ]
+
+        unbalanced = to_money(
+            xplitpay.parse_xplit("tests/2_ppl.xplit", SUPPORT_48_HOURS=True)
+        )
+        reconciliation = unbalanced.reconcile()
+        assert not reconciliation.ok
+        assert reconciliation.imbalance == sum(
+            gap for _, gap in reconciliation.unbalanced_entries
+        )
+
+    def test_large_ledger_balances_exactly(self):
+        source = generate_xplit(n_entries=5000, n_people=7, n_currencies=3, seed=1)
+        xplitlog = xplitpay.parse_xplit(io.StringIO(source), **OPTIONS)
+        columns = to_money(xplitlog)
+        assert columns.reconcile().ok
+        stats = columns.compute_stats(minor_units=True)
+        assert sum(stats["balance"].values()) == 0
+        assert sum(stats["total_expenses"].values()) == stats["total"]
@@ -0,0 +1,71 @@
+import io
+from datetime import date, datetime
+
+import pytest
+
+import xplitpay
+from xplitpay.rates import RateTable
+
+LEDGER = """@xplit 0.0.3
+@title Rates
+@author test
+@people
+    A: Alice
+    B: Bob
+@currencies
+    C: CNY
+    J: JPY = 0.05
+@rates
+    20240603 J = 0.04
+    20240605 J = 0.06
+@payment_methods
+    CASH: cash
+@description
+    Rates that change during the trip
+@extra_payments
+    A -> B: J100
+
+@ 20240602 Before
+"a" "x" 2330 A:CASH J100 s(B)J50
+@ 20240603 First change
+"b" "x" 1200 A:CASH J100 s(B)J50
+"c" "x" 2530 A:CASH J100
+@ Undated, inherits 20240603
+"d" "x" - B:CASH J100
+@ 20240605 Second change
+"e" "x" - B:CASH J100 s(A)0.5
+"""
+
+
+class TestRates:
+    def test_rate_table(self):
+        table = RateTable(
+            "C",
+            {"J": 0.05},
+            [("J", date(2024, 6, 5), 0.06), ("J", date(2024, 6, 3), 0.04)],
+        )
+        assert table.rate("C", datetime(2024, 1, 1)) == 1.0
+        assert table.rate("J") == 0.05
+        assert table.rate("J", datetime(2024, 6, 2, 23, 59)) == 0.05
+        assert table.rate("J", date(2024, 6, 3)) == 0.04
+        assert table.rate("J", datetime(2024, 6, 4, 12)) == 0.04
+        assert table.rate("J", date(2030, 1, 1)) == 0.06
+        assert table.convert(100, "J") == pytest.approx(5)
+        assert table.convert(100, "C", date(2024, 6, 5)) == 100
+        assert table.convert(100, "J", date(2024, 6, 5)) == pytest.approx(6)
+        with pytest.raises(ValueError):
+            RateTable("C", {"J": 0.05}, [("U", date(2024, 6, 5), 7.1)])
+
+    def test_dated_conversion(self):
+        xplitlog = xplitpay.parse_xplit(io.StringIO(LEDGER), SUPPORT_48_HOURS=True)
+        expenses = [entry.expense for entry in xplitlog.entries]
+        # "c" is at 25:30 on 06/03, i.e. 01:30 on 06/04
+        assert expenses == pytest.approx([5, 4, 4, 4, 6])
+        assert xplitlog.entries[0].splits["Bob"] == pytest.approx(2.5)
+        assert xplitlog.entries[1].splits["Bob"] == pytest.approx(2)
+        assert xplitlog.entries[4].splits["Alice"] == pytest.approx(3)
+        assert xplitlog.extra_payments == [("Alice", "Bob", pytest.approx(5))]
+
+    def test_malformed_rates(self):
+        with pytest.raises(ValueError):
+            xplitpay.parse_xplit(io.StringIO(LEDGER.replace("20240605 J", "0605 J")))
@@ -0,0 +1,54 @@
+import io
+
+import pytest
+
+import xplitpay
+from xplitpay.export import compute_stats
+from xplitpay.scenarios import Scenario, evaluate
+
+
+class TestScenarios:
+    def test_matches_parse(self):
+        xplitlog = xplitpay.parse_xplit(
+            "tests/2_ppl.xplit", keep_raw=True, SUPPORT_48_HOURS=True
+        )
+        assert len(xplitlog.raw.entries) == len(xplitlog.entries)
+        source = xplitlog.original_content
+        everyone = {"SUPPORT_48_HOURS": True, "ALWAYS_INVOLVE_EVERYONE": True}
+        scenarios = [
+            Scenario("as parsed", {"SUPPORT_48_HOURS": True}),
+            Scenario("everyone", everyone),
+            Scenario("same", everyone),
+            Scenario("cheap yen", everyone, rates={"J": 0.044}),
+        ]
+        results = evaluate(xplitlog, scenarios, entries=True)
+        assert list(results) == [scenario.name for scenario in scenarios]
+
+        assert results["as parsed"].entries == xplitlog.entries
+        assert results["as parsed"].stats == compute_stats(xplitlog)
+        expected = xplitpay.parse_xplit("tests/2_ppl.xplit", **everyone)
+        assert results["everyone"].entries == expected.entries
+        assert results["everyone"].stats == results["same"].stats
+        assert results["everyone"].stats == compute_stats(expected)
+        expected = xplitpay.parse_xplit(
+            io.StringIO(source.replace("JPY = 0.046", "JPY = 0.044")), **everyone
+        )
+        assert results["cheap yen"].entries == expected.entries
+        assert results["cheap yen"].stats == compute_stats(expected)
+
+    def test_errors(self):
+        xplitlog = xplitpay.parse_xplit("tests/2_ppl.xplit", SUPPORT_48_HOURS=True)
+        assert xplitlog.raw is None
+        with pytest.raises(ValueError):
+            evaluate(xplitlog, [Scenario("base")])
+        xplitlog = xplitpay.parse_xplit(
+            "tests/2_ppl.xplit", keep_raw=True, SUPPORT_48_HOURS=True
+        )
+        with pytest.raises(ValueError):
+            evaluate(xplitlog, [Scenario("x", rates={"C": 2.0})])
+        with pytest.raises(ValueError):
+            evaluate(xplitlog, [Scenario("x"), Scenario("x")])
+        # Without SUPPORT_48_HOURS, the late-night times of this ledger fail
+        # to parse, exactly as they would in `parse_xplit`
+        with pytest.raises(ValueError):
+            evaluate(xplitlog, [Scenario("strict")])
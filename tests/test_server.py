@@ -0,0 +1,104 @@
+import asyncio
+import http.client
+import json
+import shutil
+import threading
+
+import pytest
+
+from xplitpay.server import XplitServer
+
+
+@pytest.fixture
+def server(tmp_path):
+    shutil.copy("tests/2_ppl.xplit", tmp_path / "trip.xplit")
+    app = XplitServer(root=tmp_path)
+    loop = asyncio.new_event_loop()
+    srv = loop.run_until_complete(app.start("127.0.0.1", 0))
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+    yield app, srv.sockets[0].getsockname()[1]
+    loop.call_soon_threadsafe(loop.stop)
+    thread.join()
+    srv.close()
+    loop.run_until_complete(srv.wait_closed())
+    loop.close()
+
+
+def request(port, method, path, body=None, headers=None):
+    connection = http.client.HTTPConnection("127.0.0.1", port, timeout=10)
+    try:
+        connection.request(method, path, body, headers or {})
+        response = connection.getresponse()
+        return response.status, dict(response.getheaders()), response.read()
+    finally:
+        connection.close()
+
+
+class TestServer:
+    def test_ledger_views_and_etags(self, server):
+        app, port = server
+        with open("tests/2_ppl.xplit", "rb") as f:
+            source = f.read()
+        status, headers, body = request(
+            port, "POST", "/ledgers?support_48_hours=1", source
+        )
+        assert status == 201
+        ledger = json.loads(body)
+        assert headers["Location"] == f"/ledgers/{ledger['id']}"
+        assert ledger["title"] == "Osaka & Tokyo, 2024.06"
+
+        # Same content, whether uploaded or read from the root: no new parse
+        status, _, body = request(
+            port, "POST", "/ledgers?support_48_hours=1&path=trip.xplit"
+        )
+        assert status == 200 and json.loads(body)["id"] == ledger["id"]
+        assert app.parses == 1
+
+        base = headers["Location"]
+        status, headers, body = request(port, "GET", base + "/stats")
+        assert status == 200
+        assert set(json.loads(body)) == {
+            "total",
+            "total_expenses",
+            "total_paid",
+            "balance",
+        }
+        status, _, _ = request(
+            port, "GET", base + "/stats", headers={"If-None-Match": headers["ETag"]}
+        )
+        assert status == 304
+
+        status, _, body = request(port, "GET", base + "/entries")
+        assert len(json.loads(body)) == ledger["n_entries"]
+        status, _, body = request(port, "GET", base + "/settlement?mode=exact")
+        assert json.loads(body)["mode"] == "exact"
+        status, headers, body = request(port, "GET", base + "/markdown?locale=en")
+        assert headers["Content-Type"].startswith("text/markdown")
+        assert body.decode("utf-8").startswith("# Osaka & Tokyo")
+
+    def test_view_params(self, server):
+        app, port = server
+        with open("tests/2_ppl.xplit", "rb") as f:
+            _, headers, _ = request(
+                port, "POST", "/ledgers?support_48_hours=1", f.read()
+            )
+        base = headers["Location"]
+        _, headers, _ = request(port, "GET", base + "/markdown")
+        etag = headers["ETag"]
+        for query in ("?source=yes", "?locale=zh_CN&source=1", "?x=1", "?x=2"):
+            _, headers, _ = request(port, "GET", base + "/markdown" + query)
+            assert headers["ETag"] == etag
+        _, headers, _ = request(port, "GET", base + "/markdown?source=0")
+        assert headers["ETag"] != etag
+        (ledger,) = app._ledgers.values()
+        assert len(ledger.responses) == 2
+
+    def test_errors(self, server):
+        _, port = server
+        assert request(port, "GET", "/ledgers/unknown/stats")[0] == 404
+        stale = {"If-None-Match": "*"}
+        assert request(port, "GET", "/ledgers/unknown/stats", headers=stale)[0] == 404
+        assert request(port, "GET", "/ledgers")[0] == 405
+        assert request(port, "POST", "/ledgers?path=../etc/passwd")[0] == 403
+        assert request(port, "POST", "/ledgers", b"not an xplit file")[0] == 400
@@ -0,0 +1,48 @@
+import xplitpay
+from xplitpay.export import compute_stats
+from xplitpay.settle import settle
+
+
+def _remaining(balance, settlement):
+    remaining = {person: round(amount * 100) for person, amount in balance.items()}
+    for payer, receiver, amount in settlement.transfers:
+        remaining[payer] += round(amount * 100)
+        remaining[receiver] -= round(amount * 100)
+    return remaining
+
+
+class TestSettle:
+    def test_settle_xplit(self):
+        xplitlog = xplitpay.parse_xplit(
+            "tests/2_ppl.xplit", SUPPORT_48_HOURS=True, ALWAYS_INVOLVE_EVERYONE=True
+        )
+        stats = compute_stats(xplitlog)
+        settlement = settle(xplitlog)
+        assert settlement.n_transfers == 1
+        assert not any(_remaining(stats["balance"], settlement).values())
+
+    def test_exact_beats_greedy(self):
+        balance = {"A": 6, "B": 4, "C": -3, "D": -3, "E": -4}
+        greedy = settle({"balance": balance})
+        exact = settle({"balance": balance}, mode="exact")
+        assert exact.exact
+        assert greedy.n_transfers == 4
+        assert exact.n_transfers == 3
+        assert not any(_remaining(balance, exact).values())
+
+    def test_exact_gives_up(self, monkeypatch):
+        # Few enough people to attempt the exact search, which then runs out
+        # of time
+        balance = {f"P{idx}": (-1) ** idx * (idx // 2 + 1) for idx in range(20)}
+        results = []
+        settle_exact = xplitpay.settle._settle_exact
+        monkeypatch.setattr(
+            xplitpay.settle,
+            "_settle_exact",
+            lambda *args: results.append(settle_exact(*args)) or results[-1],
+        )
+        settlement = settle({"balance": balance}, mode="exact", time_budget=0)
+        assert results == [None]
+        assert not settlement.exact
+        assert settlement.n_transfers <= len(balance) - 1
+        assert not any(_remaining(balance, settlement).values())
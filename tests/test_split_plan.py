@@ -0,0 +1,50 @@
+import sys
+import threading
+
+import xplitpay
+
+
+class TestSplitPlan:
+    def test_split_plan_cache(self):
+        cache = xplitpay.SPLIT_PLAN_CACHE
+        cache.clear()
+        xplitlog = xplitpay.parse_xplit(
+            "tests/2_ppl.xplit", SUPPORT_48_HOURS=True, ALWAYS_INVOLVE_EVERYONE=True
+        )
+        assert cache.hits + cache.misses == len(xplitlog.entries)
+        assert cache.misses == len(cache) < len(xplitlog.entries)
+
+        plan = xplitpay.compile_split_plan(
+            "s(K)J790", xplitlog.people, "C", always_involve_everyone=True
+        )
+        splits = plan.apply(100.0, xplitlog.currencies, "C")
+        assert splits["Kunologist"] == 790 * 0.046
+        assert splits["Lynnex"] == 100.0 - 790 * 0.046
+
+    def test_split_plan_cache_threads(self):
+        cache = xplitpay.SplitPlanCache(maxsize=2)
+        people = {"L": "Lynnex", "K": "Kunologist"}
+        specs = ["s(K)", "s(L)", "s(L)C10", "s(K)C10", ""]
+        errors = []
+
+        def lookups():
+            try:
+                for _ in range(2000):
+                    for spec in specs:
+                        cache.get(spec, people, "L:Lynnex\0K:Kunologist", "C")
+            except Exception as e:  # pragma: no cover - only on failure
+                errors.append(e)
+
+        threads = [threading.Thread(target=lookups) for _ in range(4)]
+        switch_interval = sys.getswitchinterval()
+        sys.setswitchinterval(1e-6)
+        try:
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        finally:
+            sys.setswitchinterval(switch_interval)
+        assert not errors
+        assert cache.hits + cache.misses == 4 * 2000 * len(specs)
+        assert len(cache) == 2
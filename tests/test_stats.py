@@ -0,0 +1,21 @@
+import xplitpay
+
+
+class TestParseStats:
+    def test_parse_stats(self, monkeypatch):
+        received = []
+        monkeypatch.setattr(xplitpay, "PARSE_HOOKS", [received.append])
+        parse_stats = xplitpay.ParseStats()
+        xplitlog = xplitpay.parse_xplit(
+            "tests/2_ppl.xplit",
+            parse_stats=parse_stats,
+            SUPPORT_48_HOURS=True,
+            ALWAYS_INVOLVE_EVERYONE=True,
+        )
+        assert received == [parse_stats]
+        assert set(parse_stats.timings) == set(xplitpay.PARSE_PHASES)
+        assert parse_stats.entries == len(xplitlog.entries)
+        assert parse_stats.splits == 2 * len(xplitlog.entries)
+        assert parse_stats.conversions > 0
+        assert len(parse_stats.sections) == 12
+        assert sum(n for _, _, n in parse_stats.sections) == len(xplitlog.entries)
@@ -0,0 +1,93 @@
+import shutil
+from datetime import date
+
+import pytest
+
+import xplitpay
+from xplitpay.export import compute_stats
+from xplitpay.store import XplitStore
+
+OPTIONS = dict(SUPPORT_48_HOURS=True, ALWAYS_INVOLVE_EVERYONE=True)
+
+
+def _assert_stats(stats, expected):
+    assert stats["total"] == pytest.approx(expected["total"])
+    for key in ("total_expenses", "total_paid", "balance"):
+        assert stats[key] == pytest.approx(expected[key])
+        assert list(stats[key]) == list(expected[key])
+
+
+class TestStore:
+    def test_stats_match_compute_stats(self):
+        xplitlog = xplitpay.parse_xplit("tests/2_ppl.xplit", **OPTIONS)
+        with XplitStore() as store:
+            ledger_id, imported = store.import_file("tests/2_ppl.xplit", **OPTIONS)
+            assert imported
+            _assert_stats(store.compute_stats(), compute_stats(xplitlog))
+            _assert_stats(store.compute_stats([ledger_id]), compute_stats(xplitlog))
+            assert store.compute_stats([ledger_id + 1])["total"] == 0
+
+            index = xplitlog.index()
+            start, end = date(2024, 6, 2), date(2024, 6, 4)
+            stats = store.compute_stats(start=start, end=end)
+            assert stats["total"] == pytest.approx(index.total(start, end))
+            for person in xplitlog.people.values():
+                assert stats["total_expenses"].get(person, 0) == pytest.approx(
+                    index.spent(person, start, end)
+                )
+            by_method = store.totals_by("payment_method")
+            for method, total in by_method.items():
+                assert total == pytest.approx(index.total(payment_method=method))
+
+    def test_import_is_idempotent(self, tmp_path):
+        path = tmp_path / "trip.xplit"
+        shutil.copy("tests/2_ppl.xplit", path)
+        store = XplitStore(tmp_path / "archive.sqlite")
+        assert store.import_paths([tmp_path], **OPTIONS) == {str(path): None}
+        ledger_id, imported = store.import_file(path, **OPTIONS)
+        assert not imported
+        total = store.compute_stats()["total"]
+
+        # A changed file replaces its previous version
+        source = path.read_text(encoding="utf-8")
+        entries = xplitpay.parse_xplit(path, **OPTIONS).entries
+        path.write_text(
+            source.replace(f'"{entries[0].title}"', '"renamed"', 1), "utf-8"
+        )
+        new_id, imported = store.import_file(path, **OPTIONS)
+        assert imported and new_id != ledger_id
+        assert store.ledgers() == [
+            (new_id, str(path.resolve()), "Osaka & Tokyo, 2024.06")
+        ]
+        assert store.compute_stats()["total"] == pytest.approx(total)
+
+        # The same file under another spelling is the same ledger
+        assert store.import_file(tmp_path / "." / "trip.xplit", **OPTIONS) == (
+            new_id,
+            False,
+        )
+        store.close()
+
+        with XplitStore(tmp_path / "archive.sqlite") as store:
+            assert store.import_file(path, **OPTIONS) == (new_id, False)
+            store.remove(path)
+            assert store.ledgers() == []
+            assert store.compute_stats()["total"] == 0
+
+    def test_copies_are_separate_ledgers(self, tmp_path):
+        for name in ("a.xplit", "b.xplit"):
+            shutil.copy("tests/2_ppl.xplit", tmp_path / name)
+        with XplitStore() as store:
+            store.import_paths([tmp_path], **OPTIONS)
+            assert [path for _, path, _ in store.ledgers()] == [
+                str((tmp_path / name).resolve()) for name in ("a.xplit", "b.xplit")
+            ]
+            (a_id, _, _), (b_id, _, _) = store.ledgers()
+            single = store.compute_stats([a_id])
+            both = store.compute_stats()
+            assert both["total"] == pytest.approx(2 * single["total"])
+            for person, balance in single["balance"].items():
+                assert both["balance"][person] == pytest.approx(2 * balance)
+            assert store.compute_stats([b_id])["balance"] == pytest.approx(
+                single["balance"]
+            )
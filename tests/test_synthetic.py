@@ -0,0 +1,40 @@
+import io
+
+import pytest
+
+import xplitpay
+from xplitpay.export import compute_stats
+from xplitpay.synthetic import generate_xplit
+from xplitpay.writer import serialize_xplit
+
+
+class TestSynthetic:
+    def test_generate_xplit(self):
+        content = generate_xplit(n_people=5, n_entries=500, n_currencies=3, seed=7)
+        assert content == generate_xplit(
+            n_people=5, n_entries=500, n_currencies=3, seed=7
+        )
+        assert content != generate_xplit(
+            n_people=5, n_entries=500, n_currencies=3, seed=8
+        )
+        xplitlog = xplitpay.parse_xplit(
+            io.StringIO(content), ALWAYS_INVOLVE_EVERYONE=True
+        )
+        assert len(xplitlog.entries) == 500
+        assert len(xplitlog.people) == 5
+        assert len(xplitlog.currencies) == 3
+        assert compute_stats(xplitlog)["total"] > 0
+
+    def test_splits_cover_expenses(self):
+        for n_currencies in (1, 3, 6):
+            content = generate_xplit(
+                n_people=5, n_entries=2000, n_currencies=n_currencies, seed=3
+            )
+            xplitlog = xplitpay.parse_xplit(
+                io.StringIO(content), ALWAYS_INVOLVE_EVERYONE=True
+            )
+            for entry in xplitlog.entries:
+                assert min(entry.splits.values()) >= 0
+                assert sum(entry.splits.values()) == pytest.approx(entry.expense)
+            # Which also makes the ledger writable
+            serialize_xplit(xplitlog)
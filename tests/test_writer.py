@@ -0,0 +1,153 @@
+import io
+import shutil
+from dataclasses import replace
+from datetime import datetime
+
+import pytest
+
+import xplitpay
+from xplitpay import XplitEntry
+from xplitpay.cache import XplitCache
+from xplitpay.export import compute_stats
+from xplitpay.scenarios import Scenario, evaluate
+from xplitpay.writer import XplitWriter, append_entries, serialize_xplit
+
+OPTIONS = dict(SUPPORT_48_HOURS=True, ALWAYS_INVOLVE_EVERYONE=True)
+
+
+def _assert_same_entries(entries, expected):
+    assert len(entries) == len(expected)
+    for entry, other in zip(entries, expected):
+        assert (entry.section_title, entry.title, entry.time, entry.paid_by) == (
+            other.section_title,
+            other.title,
+            other.time,
+            other.paid_by,
+        )
+        assert entry.expense == pytest.approx(other.expense)
+        assert entry.splits == pytest.approx(other.splits)
+
+
+class TestWriter:
+    def test_round_trip(self):
+        xplitlog = xplitpay.parse_xplit("tests/2_ppl.xplit", **OPTIONS)
+        content = serialize_xplit(xplitlog, **OPTIONS)
+        reparsed = xplitpay.parse_xplit(io.StringIO(content), **OPTIONS)
+        assert reparsed.people == xplitlog.people
+        assert reparsed.currencies == xplitlog.currencies
+        assert reparsed.extra_payments == pytest.approx(xplitlog.extra_payments)
+        _assert_same_entries(reparsed.entries, xplitlog.entries)
+
+    def test_serialize_entries_without_section(self):
+        xplitlog = xplitpay.parse_xplit("tests/2_ppl.xplit", **OPTIONS)
+        entry = replace(
+            xplitlog.entries[0], section_title=None, time=datetime(2024, 6, 12, 19, 5)
+        )
+        xplitlog.entries = [entry, replace(entry, title="same day")]
+        content = serialize_xplit(xplitlog, **OPTIONS)
+        reparsed = xplitpay.parse_xplit(io.StringIO(content), **OPTIONS)
+        assert [e.section_title for e in reparsed.entries] == ["2024/06/12"] * 2
+        assert [e.time for e in reparsed.entries] == [entry.time] * 2
+
+        xplitlog.entries = [replace(entry, time=None)]
+        with pytest.raises(ValueError):
+            serialize_xplit(xplitlog, **OPTIONS)
+
+    def test_append(self, tmp_path):
+        path = tmp_path / "trip.xplit"
+        shutil.copy("tests/2_ppl.xplit", path)
+        cache = XplitCache(tmp_path / "cache")
+        xplitlog = cache.parse(path, **OPTIONS)
+        n_entries = len(xplitlog.entries)
+        last_day = xplitlog.entries[-1].time or datetime(2024, 6, 11)
+        size = path.stat().st_size
+
+        with XplitWriter(path, xplitlog, cache, **OPTIONS) as writer:
+            writer.append(
+                XplitEntry(
+                    None,
+                    "水",
+                    "最后一瓶",
+                    last_day.replace(hour=9, minute=5),
+                    "Lynnex",
+                    "💵现金",
+                    5.5,
+                    {"Lynnex": 5.5},
+                )
+            )
+            writer.append(
+                XplitEntry(
+                    None,
+                    "拉面",
+                    "一兰",
+                    datetime(last_day.year, 6, 12, 19, 30),
+                    "Kunologist",
+                    "💭微信",
+                    120.0,
+                    {"Lynnex": 60.0, "Kunologist": 60.0},
+                )
+            )
+            writer.append(
+                XplitEntry(
+                    "纪念品",
+                    "钥匙扣",
+                    "给朋友",
+                    None,
+                    "Kunologist",
+                    "💵现金",
+                    30.25,
+                    {"Kunologist": 30.25},
+                )
+            )
+            assert path.stat().st_size == size  # Buffered until the block ends
+
+        content = path.read_text(encoding="utf-8")
+        with open("tests/2_ppl.xplit", encoding="utf-8") as f:
+            assert content.startswith(f.read())
+        assert f"@ {last_day.year}0612\n" in content and "@ 纪念品\n" in content
+        expected = xplitpay.parse_xplit(path, **OPTIONS)
+        _assert_same_entries(xplitlog.entries, expected.entries)
+        assert len(xplitlog.entries) == n_entries + 3
+        assert (
+            xplitlog.entries[n_entries].section_title
+            == expected.entries[n_entries - 1].section_title
+        )
+        assert xplitlog.original_content == content
+        assert cache.parse(path, **OPTIONS).entries == xplitlog.entries
+        assert cache.hits == 1
+
+        # Without an in-memory ledger, only the header and the tail are read
+        entries = append_entries(
+            path,
+            [XplitEntry(None, "咖啡", "续命", None, "Lynnex", "💵现金", 9.0, {})],
+            **OPTIONS,
+        )
+        assert entries[0].section_title == "纪念品"
+        assert xplitpay.parse_xplit(path, **OPTIONS).entries[-1] == entries[0]
+
+    def test_append_keeps_raw_form(self, tmp_path):
+        path = tmp_path / "trip.xplit"
+        shutil.copy("tests/2_ppl.xplit", path)
+        cache = XplitCache(tmp_path / "cache")
+        xplitlog = cache.parse(path, keep_raw=True, **OPTIONS)
+        entry = replace(xplitlog.entries[-1], title="appended")
+        append_entries(path, [entry], xplitlog, cache, **OPTIONS)
+        reparsed = xplitpay.parse_xplit(path, keep_raw=True, **OPTIONS)
+        assert xplitlog.raw.entries == reparsed.raw.entries
+        assert cache.parse(path, keep_raw=True, **OPTIONS).raw == reparsed.raw
+        assert cache.hits == 1
+        results = evaluate(xplitlog, [Scenario("as parsed", OPTIONS)])
+        assert results["as parsed"].stats == compute_stats(reparsed)
+
+    def test_rejects_unwritable_entries(self, tmp_path):
+        path = tmp_path / "trip.xplit"
+        shutil.copy("tests/2_ppl.xplit", path)
+        bad = XplitEntry(None, 'say "hi"', "x", None, "Lynnex", "💵现金", 1.0, {})
+        with pytest.raises(ValueError):
+            append_entries(path, [bad], **OPTIONS)
+        # Amounts have no sign in the format
+        refund = replace(bad, title="refund", expense=-5.0)
+        for entry in (refund, replace(refund, expense=5.0, splits={"Lynnex": -5.0})):
+            with pytest.raises(ValueError):
+                append_entries(path, [entry], **OPTIONS)
+        assert path.read_bytes() == open("tests/2_ppl.xplit", "rb").read()
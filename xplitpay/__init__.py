@@ -5,14 +5,68 @@ XplitPay is a simple python library that helps you split payments between multip
 @author: Kunologist
 """
 import re
+import threading
 from pathlib import Path
-from typing import Union, List, Dict, Tuple, Optional
+from typing import (
+    Union,
+    List,
+    Dict,
+    Tuple,
+    Optional,
+    Callable,
+    Iterable,
+    Iterator,
+    TextIO,
+    NamedTuple,
+)
 from dataclasses import dataclass, field
+from contextlib import contextmanager
+from itertools import chain, repeat
+from collections import OrderedDict
 from datetime import datetime, timedelta
-from loguru import logger
+from time import perf_counter
+
+from .rates import RateTable, parse_rate_line
 
 XPLIT_VERSION = "0.0.3"
 
+_LOG_LEVELS = {
+    "trace": 5,
+    "debug": 10,
+    "info": 20,
+    "success": 25,
+    "warning": 30,
+    "error": 40,
+    "critical": 50,
+}
+
+
+def _discard(*args, **kwargs) -> None:
+    pass
+
+
+class _LazyLogger:
+    """Stand-in for `loguru.logger` that imports loguru on first use.
+
+    Importing loguru costs more than the rest of the package, so it is put
+    off until something is actually logged. Messages below `min_level` are
+    dropped without importing it at all; the CLI raises `min_level` to keep
+    quiet runs free of the import.
+    """
+
+    def __init__(self):
+        self.min_level = 0
+
+    def __getattr__(self, name: str):
+        if _LOG_LEVELS.get(name, 100) < self.min_level:
+            return _discard
+        from loguru import logger
+
+        return getattr(logger, name)
+
+
+logger = _LazyLogger()
+
 
 @dataclass
 class XplitEntry:
@@ -26,6 +80,28 @@ class XplitEntry:
     splits: Dict[str, float]
 
 
+class RawEntry(NamedTuple):
+    """What an entry line says before options and rates are applied."""
+
+    time_str: str
+    date: Optional[datetime]  # Of the section, or inherited
+    amount: float
+    currency: Optional[str]  # `None` when the line has no amount
+    spec: str
+
+
+@dataclass
+class RawForm:
+    """Raw form of a ledger, kept by `parse_xplit(..., keep_raw=True)`.
+
+    `entries` is aligned with `XplitLog.entries`; extra payments are
+    `(payer, receiver, amount, currency)`. See `xplitpay.scenarios`.
+    """
+
+    entries: List[RawEntry] = field(default_factory=list)
+    extra_payments: List[Tuple[str, str, float, str]] = field(default_factory=list)
+
+
 @dataclass
 class XplitLog:
     version: str
@@ -39,6 +115,29 @@ class XplitLog:
     entries: List[XplitEntry] = field(default_factory=list)
     extra_payments: List[Tuple[str, str, float]] = field(default_factory=list)
     original_content: str = None
+    rates: Optional[RateTable] = field(default=None, repr=False)
+    raw: Optional[RawForm] = field(default=None, repr=False, compare=False)
+    _index: Optional["XplitIndex"] = field(
+        default=None, init=False, repr=False, compare=False
+    )
+
+    def index(self, rebuild: bool = False) -> "XplitIndex":
+        """Time, person, payment method and section indexes of `entries`.
+
+        Built on first use and rebuilt when entries are appended or the list
+        is replaced. Pass `rebuild=True` after editing entries in place. See
+        `xplitpay.index` for the queries.
+        """
+        from .index import XplitIndex
+
+        if (
+            rebuild
+            or self._index is None
+            or self._index.entries is not self.entries
+            or self._index.size != len(self.entries)
+        ):
+            self._index = XplitIndex(self.entries)
+        return self._index
 
 
 def uncomment_line(line: str) -> str:
@@ -114,229 +213,334 @@ def convert_to_main_currency(
     return amount * rate
 
 
-def parse_xplit(file: Union[Path, str], **kwargs) -> XplitLog:
-    logger.debug("Parsing xplit file")
+SPLIT_FIXED = "fixed"
+SPLIT_RATIO = "ratio"
+SPLIT_EMPTY = "empty"
+
+
+@dataclass(frozen=True)
+class SplitPlan:
+    """A compiled split spec such as `s(K)0.5 s(L)J790`.
+
+    `terms` holds `(person, kind, currency, value)` in spec order: fixed
+    amounts (`currency` is `None` for the main currency), ratios of the
+    expense, or empty shares. `implicit` lists the people added as empty
+    shares by `ALWAYS_INVOLVE_EVERYONE`. Empty shares split what the fixed
+    amounts leave over.
+    """
+
+    terms: Tuple[Tuple[str, str, Optional[str], float], ...]
+    implicit: Tuple[str, ...] = ()
+
+    def apply(
+        self,
+        total_expense: float,
+        currencies: Dict[str, Union[str, Tuple[str, float]]],
+        main_currency: str,
+        rates: Optional[RateTable] = None,
+        when: Optional[datetime] = None,
+    ) -> Dict[str, float]:
+        """Split `total_expense`. Fixed amounts in other currencies use
+        `rates` on the day of `when` if given, the `@currencies` rate
+        otherwise."""
+        splits = {}
+        for person, kind, currency, value in self.terms:
+            if kind == SPLIT_FIXED:
+                if currency is None:
+                    splits[person] = value
+                elif rates is not None:
+                    splits[person] = rates.convert(value, currency, when)
+                else:
+                    splits[person] = convert_to_main_currency(
+                        value, currency, currencies, main_currency
+                    )
+            elif kind == SPLIT_RATIO:
+                splits[person] = value * total_expense
+            else:
+                splits[person] = False
+        for person in self.implicit:
+            splits[person] = False
+
+        # Calculating empty splits
+        empty_splits = [person for person, amount in splits.items() if amount == False]
+        if empty_splits:
+            allocated_amount = sum(amount for amount in splits.values() if amount > 1)
+            remaining_amount = total_expense - allocated_amount
+            split_value = remaining_amount / len(empty_splits)
+            for person in empty_splits:
+                splits[person] = split_value
+        return splits
+
+
+def compile_split_plan(
+    spec: str,
+    people: Dict[str, str],
+    main_currency: str,
+    always_involve_everyone: bool = False,
+) -> SplitPlan:
+    terms = []
+    for split_match in SPLIT_PATTERN.finditer(spec):
+        person_abbr, amount = split_match.groups()
+        try:
+            person = people[person_abbr]
+        except KeyError:
+            logger.error(f"Person abbreviation not found: {person_abbr}")
+            raise ValueError(f"Person abbreviation not found: {person_abbr}")
+        if main_currency in amount:
+            split_amount = float(
+                re.search(rf"{main_currency}(\d+(\.\d+)?)", amount).group(1)
+            )
+            terms.append((person, SPLIT_FIXED, None, split_amount))
+        elif any(
+            char.isdigit() for char in amount
+        ):  # Checking if it is a ratio or other currency
+            currency_match = CURRENCY_AMOUNT_PATTERN.search(amount)
+            if currency_match:
+                currency = currency_match.group(1)
+                split_amount = float(currency_match.group(2))
+                terms.append((person, SPLIT_FIXED, currency, split_amount))
+            else:
+                terms.append((person, SPLIT_RATIO, None, float(amount)))
+        else:
+            terms.append((person, SPLIT_EMPTY, None, 0.0))
+
+    # If ALWAYS_INVOLVE_EVERYONE is enabled, calculate empty splits
+    implicit = ()
+    if always_involve_everyone:
+        named = {term[0] for term in terms}
+        implicit = tuple(person for person in people.values() if person not in named)
+    return SplitPlan(tuple(terms), implicit)
+
+
+class SplitPlanCache:
+    """Bounded LRU cache of compiled split plans.
+
+    Most entries of a ledger share a handful of split specs, so each spec
+    is compiled once per people table. `hits` and `misses` count lookups.
+    Safe to share between threads, such as the executor threads of
+    `xplitpay.server`.
+    """
+
+    def __init__(self, maxsize: int = 4096):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._plans = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._plans)
+
+    def get(
+        self,
+        spec: str,
+        people: Dict[str, str],
+        people_key: str,
+        main_currency: str,
+        always_involve_everyone: bool = False,
+    ) -> SplitPlan:
+        key = (spec, people_key, main_currency, always_involve_everyone)
+        with self._lock:
+            plan = self._plans.get(key)
+            if plan is not None:
+                self.hits += 1
+                self._plans.move_to_end(key)
+                return plan
+            self.misses += 1
+        plan = compile_split_plan(spec, people, main_currency, always_involve_everyone)
+        with self._lock:
+            self._plans[key] = plan
+            if len(self._plans) > self.maxsize:
+                self._plans.popitem(last=False)
+        return plan
+
+    def clear(self) -> None:
+        with self._lock:
+            self._plans.clear()
+            self.hits = 0
+            self.misses = 0
+
+
+SPLIT_PLAN_CACHE = SplitPlanCache()
+
+
+PARSE_PHASES = ("read", "uncomment", "header", "entries", "splits")
 
-    ALWAYS_INVOLVE_EVERYONE = kwargs.get("ALWAYS_INVOLVE_EVERYONE", False)
-    SUPPORT_48_HOURS = kwargs.get("SUPPORT_48_HOURS", False)
 
-    if isinstance(file, Path):
-        file = file.read_text(encoding="utf-8")
-    elif isinstance(file, str):
-        with open(file, "r", encoding="utf-8") as f:
-            file = f.read()
+@dataclass
+class ParseStats:
+    """Where `parse_xplit` spent its time.
 
-    original_content = str(file)
+    `timings` maps each of `PARSE_PHASES` to seconds. Phases are exclusive:
+    `entries` does not include the time spent in `uncomment` or `splits`.
+    `sections` lists `(section title, seconds, entries)` in file order.
+    Section and conversion figures are not collected when `workers` > 1.
+    """
 
-    lines = file.splitlines()
-    if not lines[0].startswith("@xplit"):
+    timings: Dict[str, float] = field(
+        default_factory=lambda: dict.fromkeys(PARSE_PHASES, 0.0)
+    )
+    entries: int = 0
+    splits: int = 0
+    conversions: int = 0
+    sections: List[Tuple[str, float, int]] = field(default_factory=list)
+
+    @property
+    def total(self) -> float:
+        return sum(self.timings.values())
+
+
+# Called with the `ParseStats` of every `parse_xplit` call
+PARSE_HOOKS: List[Callable[[ParseStats], None]] = []
+
+
+HEADER_KEYWORDS = (
+    "xplit",
+    "title",
+    "author",
+    "people",
+    "currencies",
+    "payment_methods",
+    "description",
+    "extra_payments",
+    "rates",
+)
+SECTION_DATE_PATTERN = re.compile(r"\d{4}")
+CURRENCY_AMOUNT_PATTERN = re.compile(r"([A-Z])(\d+(\.\d+)?)")
+SPLIT_PATTERN = re.compile(r"s\((\w+)\)([^s]+)")
+ENTRY_PATTERN = re.compile(r'"(.+?)"\s+"(.+?)"\s+([\d:-]+)\s+(\w+):(\w+)\s+(.+)')
+
+
+@contextmanager
+def _open_xplit(file: Union[Path, str, TextIO]) -> Iterator[TextIO]:
+    if isinstance(file, (Path, str)):
+        with open(file, "r", encoding="utf-8") as f:
+            yield f
+    else:
+        yield file
+
+
+def _read_header(
+    raw_lines: Iterable[str],
+    parse_stats: Optional[ParseStats] = None,
+    keep_raw: bool = False,
+) -> Tuple[XplitLog, Iterator[str]]:
+    """Consume the `@xplit` header blocks from `raw_lines`.
+
+    Returns an `XplitLog` without entries, and an iterator over the remaining
+    uncommented, non-empty lines, starting at the first section header. With
+    `keep_raw`, the log gets a `RawForm` that `_iter_entries` fills in.
+    """
+    raw_lines = iter(raw_lines)
+    first_line = next(raw_lines, "")
+    if not first_line.startswith("@xplit"):
         logger.error("File does not start with @xplit")
         raise ValueError("File does not start with @xplit")
 
-    version = lines[0].split()[1]
+    version = first_line.split()[1]
     if version != XPLIT_VERSION:
         logger.warning(
             f"Unmatched xplit record version: expected {XPLIT_VERSION}, got {version}"
         )
 
-    logger.debug(f"Version: {version}")
+    logger.debug("Version: {}", version)
 
-    lines = [uncomment_line(line) for line in lines if uncomment_line(line)]
-    content = "\n".join(lines)
+    uncomment = uncomment_line
+    if parse_stats is not None:
+        timings = parse_stats.timings
+
+        def uncomment(line: str) -> str:
+            start = perf_counter()
+            line = uncomment_line(line)
+            timings["uncomment"] += perf_counter() - start
+            return line
+
+    lines = (line for line in map(uncomment, raw_lines) if line)
+
+    fields: Dict[str, str] = {}
+    blocks: Dict[str, List[str]] = {}
+    current_block = None
+    for line in lines:
+        if line.startswith("@"):
+            keyword = line.split()[0][1:]
+            if keyword not in HEADER_KEYWORDS:
+                # First section header, the header is over
+                lines = chain([line], lines)
+                break
+            if keyword in ("title", "author"):
+                fields[keyword] = line.split(maxsplit=1)[1] if " " in line else ""
+                current_block = None
+            else:
+                current_block = blocks.setdefault(keyword, [])
+        elif current_block is not None:
+            current_block.append(line)
 
     try:
-        xplit_log_title = re.search(r"@title\s+(.*)", content).group(1)
-        xplit_log_author = re.search(r"@author\s+(.*)", content).group(1)
-        people_block = re.search(r"@people\n([\s\S]+?)\n@", content).group(1).strip()
-        currencies_block = (
-            re.search(r"@currencies\n([\s\S]+?)\n@", content).group(1).strip()
-        )
-        payment_methods_block = (
-            re.search(r"@payment_methods\n([\s\S]+?)\n@", content).group(1).strip()
-        )
-        xplit_log_description = (
-            re.search(r"@description\n([\s\S]+?)\n@", content).group(1).strip()
-        )
-        extra_payments_block = (
-            re.search(r"@extra_payments\n([\s\S]+?)\n@", content).group(1).strip()
-        )
-    except AttributeError as e:
-        logger.error(f"Failed to parse meta information: {e}")
+        xplit_log_title = fields["title"]
+        xplit_log_author = fields["author"]
+        people_block = blocks["people"]
+        currencies_block = blocks["currencies"]
+        payment_methods_block = blocks["payment_methods"]
+        xplit_log_description = "\n".join(blocks["description"])
+        extra_payments_block = blocks["extra_payments"]
+    except KeyError as e:
+        logger.error(f"Failed to parse meta information: missing {e}")
         raise ValueError("Missing or malformed meta information")
 
-    logger.debug(f"Title: {xplit_log_title}")
-    logger.debug(f"Author: {xplit_log_author}")
-    logger.debug(f"People block: {people_block}")
-    logger.debug(f"Currencies block: {currencies_block}")
-    logger.debug(f"Payment methods block: {payment_methods_block}")
-    logger.debug(f"Description: {xplit_log_description}")
-    logger.debug(f"Extra payments block: {extra_payments_block}")
+    logger.debug("Title: {}", xplit_log_title)
+    logger.debug("Author: {}", xplit_log_author)
+    logger.debug("People block: {}", people_block)
+    logger.debug("Currencies block: {}", currencies_block)
+    logger.debug("Payment methods block: {}", payment_methods_block)
+    logger.debug("Description: {}", xplit_log_description)
+    logger.debug("Extra payments block: {}", extra_payments_block)
 
     # Parsing people
     people = {
-        line.split(":")[0].strip(): line.split(":")[1].strip()
-        for line in people_block.split("\n")
+        line.split(":")[0].strip(): line.split(":")[1].strip() for line in people_block
     }
-    logger.debug(f"People: {people}")
+    logger.debug("People: {}", people)
 
     # Parsing currencies
     currencies = {}
-    currency_lines = currencies_block.split("\n")
-    main_currency = currency_lines[0].split(":")[0].strip()
-    currencies[main_currency] = currency_lines[0].split(":")[1].strip()
-    for currency_line in currency_lines[1:]:
+    main_currency = currencies_block[0].split(":")[0].strip()
+    currencies[main_currency] = currencies_block[0].split(":")[1].strip()
+    for currency_line in currencies_block[1:]:
         parts = currency_line.split()
         symbol = parts[0].strip(":")
         name = parts[1].strip()
         rate = float(parts[3].strip())
         currencies[symbol] = (name, rate)
-    logger.debug(f"Currencies: {currencies}")
+    logger.debug("Currencies: {}", currencies)
+    rates = RateTable.from_currencies(
+        currencies, map(parse_rate_line, blocks.get("rates", []))
+    )
 
     # Parsing payment methods
     payment_methods = {
         line.split(":")[0].strip(): line.split(":")[1].strip()
-        for line in payment_methods_block.split("\n")
+        for line in payment_methods_block
     }
-    logger.debug(f"Payment Methods: {payment_methods}")
+    logger.debug("Payment Methods: {}", payment_methods)
 
     # Parsing extra payments
     extra_payments = []
-    for line in extra_payments_block.split("\n"):
+    raw_extra_payments = []
+    for line in extra_payments_block:
         parts = line.split()
         payer_abbr = parts[0]
         receiver_abbr = parts[2].strip(":")
         amount = parts[3].strip()
         currency = amount[0]
         value = float(amount[1:])
-        value_in_main_currency = convert_to_main_currency(
-            value, currency, currencies, main_currency
-        )
+        value_in_main_currency = rates.convert(value, currency)
         payer = people.get(payer_abbr, payer_abbr)
         receiver = people.get(receiver_abbr, receiver_abbr)
         extra_payments.append((payer, receiver, value_in_main_currency))
-    logger.debug(f"Extra Payments: {extra_payments}")
-
-    # Entries
-    entries = []
-    current_section_title = None
-    current_date = None
-    entry_pattern = re.compile(r'"(.+?)"\s+"(.+?)"\s+([\d:-]+)\s+(\w+):(\w+)\s+(.+)')
-    for idx, line in enumerate(lines):
-        if line.startswith("@"):
-            current_section_title = line[1:].strip()
-            if re.match(r"\d{4}", current_section_title.split()[0]):
-                current_date = parse_date(current_section_title.split()[0])
-                if len(current_section_title.split(" ")) > 1:
-                    current_section_title = "{date_str} {title}".format(
-                        date_str=current_date.strftime("%Y/%m/%d"),
-                        title=current_section_title.split(" ", maxsplit=1)[1],
-                    )
-                else:
-                    current_section_title = current_date.strftime("%Y/%m/%d")
-        else:
-            match = entry_pattern.match(line)
-            if match:
-                (
-                    title,
-                    description,
-                    time_str,
-                    paid_by,
-                    payment_method,
-                    details,
-                ) = match.groups()
-                paid_by = people[paid_by]
-                splits = {}
-                total_expense = 0.0
-                currency_match = re.search(r"([A-Z])(\d+(\.\d+)?)", details)
-                if currency_match:
-                    currency = currency_match.group(1)
-                    total_expense = float(currency_match.group(2))
-                    total_expense = convert_to_main_currency(
-                        total_expense, currency, currencies, main_currency
-                    )
+        raw_extra_payments.append((payer, receiver, value, currency))
+    logger.debug("Extra Payments: {}", extra_payments)
 
-                split_pattern = re.compile(r"s\((\w+)\)([^s]+)")
-                for split_match in split_pattern.finditer(details):
-                    person_abbr, amount = split_match.groups()
-                    try:
-                        person = people[person_abbr]
-                    except KeyError:
-                        logger.error(f"Person abbreviation not found: {person_abbr}")
-                        logger.debug(
-                            f"The error above occurred when parsing entry #{idx+1}: '{line}'"
-                        )
-                        raise ValueError(
-                            f"Person abbreviation not found: {person_abbr}"
-                        )
-                    if main_currency in amount:
-                        split_amount = float(
-                            re.search(rf"{main_currency}(\d+(\.\d+)?)", amount).group(1)
-                        )
-                        splits[person] = split_amount
-                    elif any(
-                        char.isdigit() for char in amount
-                    ):  # Checking if it is a ratio or other currency
-                        if main_currency in amount:
-                            split_amount = float(
-                                re.search(
-                                    rf"{main_currency}(\d+(\.\d+)?)", amount
-                                ).group(1)
-                            )
-                        else:
-                            currency_match = re.search(r"([A-Z])(\d+(\.\d+)?)", amount)
-                            if currency_match:
-                                currency = currency_match.group(1)
-                                split_amount = float(currency_match.group(2))
-                                split_amount = convert_to_main_currency(
-                                    split_amount, currency, currencies, main_currency
-                                )
-                            else:
-                                split_amount = float(amount) * total_expense
-                        splits[person] = split_amount
-                    else:
-                        splits[person] = False
-
-                # If ALWAYS_INVOLVE_EVERYONE is enabled, calculate empty splits
-                involved_people = (
-                    list(splits.keys())
-                    if not ALWAYS_INVOLVE_EVERYONE
-                    else list(people.values())
-                )
-                for person in involved_people:
-                    if person not in splits:
-                        splits[person] = False
-
-                # Calculating empty splits
-                empty_splits = [
-                    person for person, amount in splits.items() if amount == False
-                ]
-                if empty_splits:
-                    allocated_amount = sum(
-                        amount for amount in splits.values() if amount > 1
-                    )
-                    remaining_amount = total_expense - allocated_amount
-                    split_value = remaining_amount / len(empty_splits)
-                    for person in empty_splits:
-                        splits[person] = split_value
-
-                time = (
-                    parse_time(time_str, current_date, SUPPORT_48_HOURS)
-                    if current_date
-                    else None
-                )
-                entry = XplitEntry(
-                    current_section_title,
-                    title,
-                    description,
-                    time,
-                    paid_by,
-                    payment_methods[payment_method],
-                    total_expense,
-                    splits,
-                )
-                entries.append(entry)
-
-    return XplitLog(
+    xplit_log = XplitLog(
         version,
         xplit_log_title,
         xplit_log_author,
@@ -345,7 +549,304 @@ def parse_xplit(file: Union[Path, str], **kwargs) -> XplitLog:
         currencies[main_currency],
         payment_methods,
         xplit_log_description,
-        entries,
+        [],
         extra_payments,
-        original_content,
+        rates=rates,
+        raw=RawForm([], raw_extra_payments) if keep_raw else None,
     )
+    return xplit_log, lines
+
+
+def _parse_section_header(line: str) -> Tuple[str, Optional[datetime]]:
+    """Section title and date of an `@` line; undated sections get `None`.
+
+    Dated titles are normalized to `YYYY/MM/DD rest of the title`.
+    """
+    section_title = line[1:].strip()
+    if not SECTION_DATE_PATTERN.match(section_title.split()[0]):
+        return section_title, None
+    section_date = parse_date(section_title.split()[0])
+    if len(section_title.split(" ")) > 1:
+        section_title = "{date_str} {title}".format(
+            date_str=section_date.strftime("%Y/%m/%d"),
+            title=section_title.split(" ", maxsplit=1)[1],
+        )
+    else:
+        section_title = section_date.strftime("%Y/%m/%d")
+    return section_title, section_date
+
+
+def _iter_entries(
+    lines: Iterable[str],
+    xplit_log: XplitLog,
+    current_date: Optional[datetime] = None,
+    parse_stats: Optional[ParseStats] = None,
+    **kwargs,
+) -> Iterator[XplitEntry]:
+    """Parse entry lines. `current_date` is the date inherited by undated
+    sections before the first dated one, for parsing a slice of a file."""
+    ALWAYS_INVOLVE_EVERYONE = kwargs.get("ALWAYS_INVOLVE_EVERYONE", False)
+    SUPPORT_48_HOURS = kwargs.get("SUPPORT_48_HOURS", False)
+
+    people = xplit_log.people
+    currencies = xplit_log.currencies
+    payment_methods = xplit_log.payment_methods
+    main_currency = next(iter(currencies))
+    rates = xplit_log.rates or RateTable.from_currencies(currencies)
+    convert = rates.convert
+    raw_entries = xplit_log.raw.entries if xplit_log.raw is not None else None
+
+    current_section_title = None
+    # Plans are cached per people table, keyed by a string for cheap hashing
+    people_key = "\0".join(f"{abbr}:{name}" for abbr, name in people.items())
+    profiling = parse_stats is not None
+    if profiling:
+        timings = parse_stats.timings
+        section_start = perf_counter()
+        section_entries = 0
+    for line in lines:
+        if line.startswith("@"):
+            if profiling:
+                if current_section_title is not None or section_entries:
+                    now = perf_counter()
+                    parse_stats.sections.append(
+                        (current_section_title, now - section_start, section_entries)
+                    )
+                    section_start = now
+                section_entries = 0
+            current_section_title, section_date = _parse_section_header(line)
+            if section_date is not None:
+                current_date = section_date
+            continue
+
+        match = ENTRY_PATTERN.match(line)
+        if not match:
+            continue
+        (
+            title,
+            description,
+            time_str,
+            paid_by,
+            payment_method,
+            details,
+        ) = match.groups()
+        paid_by = people[paid_by]
+        time = (
+            parse_time(time_str, current_date, SUPPORT_48_HOURS)
+            if current_date
+            else None
+        )
+        # Foreign amounts are converted at the rate of the entry's day
+        when = time or current_date
+        total_expense = 0.0
+        currency_match = CURRENCY_AMOUNT_PATTERN.search(details)
+        if currency_match:
+            total_expense = convert(
+                float(currency_match.group(2)), currency_match.group(1), when
+            )
+
+        if profiling:
+            split_start = perf_counter()
+        spec_start = details.find("s(")
+        spec = details[spec_start:] if spec_start >= 0 else ""
+        try:
+            plan = SPLIT_PLAN_CACHE.get(
+                spec, people, people_key, main_currency, ALWAYS_INVOLVE_EVERYONE
+            )
+        except ValueError:
+            logger.debug("The error above occurred when parsing entry: '{}'", line)
+            raise
+        splits = plan.apply(total_expense, currencies, main_currency, rates, when)
+        if raw_entries is not None:
+            raw_entries.append(
+                RawEntry(
+                    time_str,
+                    current_date,
+                    float(currency_match.group(2)) if currency_match else 0.0,
+                    currency_match.group(1) if currency_match else None,
+                    spec,
+                )
+            )
+        if profiling:
+            timings["splits"] += perf_counter() - split_start
+            section_entries += 1
+            parse_stats.entries += 1
+            parse_stats.splits += len(splits)
+            parse_stats.conversions += sum(
+                1 for term in plan.terms if term[2] is not None
+            ) + bool(currency_match and currency_match.group(1) != main_currency)
+
+        yield XplitEntry(
+            current_section_title,
+            title,
+            description,
+            time,
+            paid_by,
+            payment_methods[payment_method],
+            total_expense,
+            splits,
+        )
+    if profiling and (current_section_title is not None or section_entries):
+        parse_stats.sections.append(
+            (current_section_title, perf_counter() - section_start, section_entries)
+        )
+
+
+def _iter_sections(
+    lines: Iterable[str],
+) -> Iterator[Tuple[Optional[str], List[str]]]:
+    """Group uncommented entry lines by `@` section.
+
+    Yields `(inherited date, lines)` pairs, where the inherited date is the
+    date token of the last dated section before an undated one (`None` for
+    dated sections), i.e. what `_iter_entries` needs to parse the section on
+    its own.
+    """
+    date_token = None
+    inherited = None
+    current = []
+    for line in lines:
+        if line.startswith("@"):
+            if current:
+                yield inherited, current
+            section_title = line[1:].strip()
+            inherited = date_token
+            if SECTION_DATE_PATTERN.match(section_title.split()[0]):
+                date_token = section_title.split()[0]
+                inherited = None
+            current = []
+        current.append(line)
+    if current:
+        yield inherited, current
+
+
+def _parse_chunk(
+    xplit_log: XplitLog,
+    sections: List[Tuple[Optional[str], List[str]]],
+    kwargs: dict,
+) -> List[tuple]:
+    # Runs in a worker process. Entries are sent back as plain tuples, which
+    # pickle much smaller than dataclass instances.
+    return [
+        (
+            entry.section_title,
+            entry.title,
+            entry.description,
+            entry.time,
+            entry.paid_by,
+            entry.payment_method,
+            entry.expense,
+            entry.splits,
+        )
+        for inherited, lines in sections
+        for entry in _iter_entries(
+            lines, xplit_log, parse_date(inherited) if inherited else None, **kwargs
+        )
+    ]
+
+
+def _chunk_sections(
+    lines: List[str], n_chunks: int
+) -> List[List[Tuple[Optional[str], List[str]]]]:
+    chunk_size = max(1, -(-len(lines) // n_chunks))
+    chunks = []
+    chunk = []
+    chunk_lines = 0
+    for section in _iter_sections(lines):
+        chunk.append(section)
+        chunk_lines += len(section[1])
+        if chunk_lines >= chunk_size:
+            chunks.append(chunk)
+            chunk = []
+            chunk_lines = 0
+    if chunk:
+        chunks.append(chunk)
+    return chunks
+
+
+def iter_xplit(file: Union[Path, str, TextIO], **kwargs) -> Iterator[XplitEntry]:
+    """Stream the entries of an xplit file one at a time.
+
+    `file` may be a path or an open text file handle. Only the header blocks
+    and the current line are held in memory, so this is suitable for ledgers
+    too large for `parse_xplit`. Accepts the same options as `parse_xplit`.
+    """
+    with _open_xplit(file) as f:
+        xplit_log, lines = _read_header(f)
+        yield from _iter_entries(lines, xplit_log, **kwargs)
+
+
+def parse_xplit(
+    file: Union[Path, str, TextIO],
+    workers: int = 1,
+    parse_stats: Optional[ParseStats] = None,
+    keep_raw: bool = False,
+    **kwargs,
+) -> XplitLog:
+    """Parse an xplit file.
+
+    With `workers` > 1, the `@` sections are parsed in a pool of that many
+    processes. The result is identical to the serial parse, which is only
+    worth it for very large files.
+
+    With `keep_raw`, the result keeps the `RawForm` of the ledger, so that
+    `xplitpay.scenarios` can re-evaluate it under other options and rates.
+    Such parses always run serially.
+
+    Pass a `ParseStats` as `parse_stats` to have it filled with per-phase
+    timings and counts. It is also passed to every hook in `PARSE_HOOKS`.
+    Nothing is measured when neither is used.
+    """
+    logger.debug("Parsing xplit file")
+    if parse_stats is None and PARSE_HOOKS:
+        parse_stats = ParseStats()
+    if parse_stats is not None:
+        timings = parse_stats.timings
+        start = perf_counter()
+
+    with _open_xplit(file) as f:
+        original_content = f.read()
+
+    if parse_stats is not None:
+        timings["read"] += perf_counter() - start
+        start = perf_counter()
+        excluded = timings["uncomment"]
+    xplit_log, lines = _read_header(
+        original_content.splitlines(), parse_stats, keep_raw
+    )
+    if parse_stats is not None:
+        timings["header"] += perf_counter() - start - (timings["uncomment"] - excluded)
+        start = perf_counter()
+        excluded = timings["uncomment"] + timings["splits"]
+
+    if workers > 1 and not keep_raw:
+        chunks = _chunk_sections(list(lines), workers * 4)
+        logger.debug("Parsing {} chunks with {} workers", len(chunks), workers)
+        from concurrent.futures import ProcessPoolExecutor
+
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            for entries in executor.map(
+                _parse_chunk,
+                repeat(xplit_log),
+                chunks,
+                repeat(kwargs),
+            ):
+                xplit_log.entries.extend(XplitEntry(*entry) for entry in entries)
+        if parse_stats is not None:
+            parse_stats.entries += len(xplit_log.entries)
+            parse_stats.splits += sum(len(entry.splits) for entry in xplit_log.entries)
+    else:
+        xplit_log.entries.extend(
+            _iter_entries(lines, xplit_log, parse_stats=parse_stats, **kwargs)
+        )
+    xplit_log.original_content = original_content
+
+    if parse_stats is not None:
+        timings["entries"] += (
+            perf_counter()
+            - start
+            - (timings["uncomment"] + timings["splits"] - excluded)
+        )
+        for hook in PARSE_HOOKS:
+            hook(parse_stats)
+    return xplit_log
@@ -0,0 +1,183 @@
+"""Batch processing of many xplit files
+
+Parses and computes the stats of every ledger in parallel worker processes,
+then merges the per-person totals and balances into one rollup. People are
+matched by full name, since the short codes of `@people` differ between
+files. A file that fails to parse is reported and skipped.
+
+Command line usage::
+
+    python -m xplitpay.batch trips/ "2024/*.xplit" --jobs 4
+"""
+import argparse
+import glob
+import json
+import os
+import sys
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Union
+
+from . import logger, parse_xplit
+from .export import compute_stats
+
+
+@dataclass
+class BatchResult:
+    path: str
+    title: Optional[str] = None
+    stats: Optional[dict] = None
+    error: Optional[str] = None
+
+
+@dataclass
+class Rollup:
+    results: List[BatchResult] = field(default_factory=list)
+    total: float = 0
+    total_expenses: Dict[str, float] = field(default_factory=dict)
+    total_paid: Dict[str, float] = field(default_factory=dict)
+    balance: Dict[str, float] = field(default_factory=dict)
+
+    @property
+    def failures(self) -> List[BatchResult]:
+        return [result for result in self.results if result.error is not None]
+
+    def add(self, result: BatchResult) -> None:
+        self.results.append(result)
+        if result.stats is None:
+            return
+        self.total += result.stats["total"]
+        for key in ("total_expenses", "total_paid", "balance"):
+            totals = getattr(self, key)
+            for person, amount in result.stats[key].items():
+                totals[person] = totals.get(person, 0) + amount
+
+
+def find_ledgers(patterns: Iterable[Union[Path, str]]) -> List[Path]:
+    """Expand directories (searched recursively for `*.xplit`) and globs."""
+    paths = []
+    for pattern in patterns:
+        pattern = str(pattern)
+        if os.path.isdir(pattern):
+            paths.extend(sorted(Path(pattern).rglob("*.xplit")))
+        else:
+            matches = sorted(glob.glob(pattern, recursive=True))
+            paths.extend(Path(match) for match in (matches or [pattern]))
+    return list(dict.fromkeys(paths))
+
+
+def _process_file(path: Path, kwargs: dict) -> BatchResult:
+    try:
+        xplit_log = parse_xplit(path, **kwargs)
+        return BatchResult(str(path), xplit_log.title, compute_stats(xplit_log))
+    except Exception as e:
+        return BatchResult(str(path), error=f"{type(e).__name__}: {e}")
+
+
+def _init_worker(log_level: Optional[str]) -> None:
+    if log_level is not None:
+        logger.remove()
+        logger.add(sys.stderr, level=log_level)
+
+
+def process_batch(
+    paths: Iterable[Union[Path, str]],
+    jobs: int = 1,
+    log_level: Optional[str] = None,
+    **kwargs,
+) -> Rollup:
+    """Parse every ledger in `paths` and roll their stats up.
+
+    `jobs` > 1 processes the files in that many worker processes. Results are
+    kept in the order of `paths`. Accepts the same options as `parse_xplit`.
+    """
+    paths = list(paths)
+    rollup = Rollup()
+    if jobs > 1 and len(paths) > 1:
+        from concurrent.futures import ProcessPoolExecutor
+
+        with ProcessPoolExecutor(
+            max_workers=min(jobs, len(paths)),
+            initializer=_init_worker,
+            initargs=(log_level,),
+        ) as executor:
+            results = executor.map(_process_file, paths, [kwargs] * len(paths))
+            for result in results:
+                rollup.add(result)
+    else:
+        for path in paths:
+            rollup.add(_process_file(path, kwargs))
+    for failure in rollup.failures:
+        logger.error(f"Failed to process {failure.path}: {failure.error}")
+    return rollup
+
+
+def add_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("paths", nargs="+", help="xplit files, directories or globs")
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="number of worker processes (default: number of CPUs)",
+    )
+    parser.add_argument("--json", action="store_true", help="print the rollup as JSON")
+    parser.add_argument("--always-involve-everyone", action="store_true")
+    parser.add_argument("--support-48-hours", action="store_true")
+
+
+def run(args: argparse.Namespace) -> int:
+    rollup = process_batch(
+        find_ledgers(args.paths),
+        jobs=args.jobs,
+        log_level="WARNING",
+        ALWAYS_INVOLVE_EVERYONE=args.always_involve_everyone,
+        SUPPORT_48_HOURS=args.support_48_hours,
+    )
+    if args.json:
+        json.dump(
+            {
+                "files": [vars(result) for result in rollup.results],
+                "total": rollup.total,
+                "total_expenses": rollup.total_expenses,
+                "total_paid": rollup.total_paid,
+                "balance": rollup.balance,
+            },
+            sys.stdout,
+            ensure_ascii=False,
+            indent=2,
+        )
+        print()
+    else:
+        for result in rollup.results:
+            status = "FAILED " + result.error if result.error else result.title
+            print(f"{result.path}: {status}")
+        print(f"Total: {rollup.total:.2f}")
+        for person, balance in rollup.balance.items():
+            print(
+                f"{person}: expense {rollup.total_expenses.get(person, 0):.2f}"
+                f" | paid {rollup.total_paid.get(person, 0):.2f}"
+                f" | balance {balance:.2f}"
+            )
+    return 1 if rollup.failures else 0
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="python -m xplitpay.batch",
+        description="Parse many xplit files and roll up their stats.",
+    )
+    add_arguments(parser)
+    args = parser.parse_args(argv)
+    # Like `xplitpay.cli.main`: drop debug messages without touching the
+    # loguru handlers of the caller
+    min_level = logger.min_level
+    logger.min_level = 30  # WARNING
+    try:
+        return run(args)
+    finally:
+        logger.min_level = min_level
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,264 @@
+"""Persistent cache of parsed xplit files
+
+Parsed ledgers are stored on disk in a compact binary form (a string table
+plus flat tuples, marshalled and zlib-compressed) and looked up by a SHA-256
+of the source text, the parse options and `XPLIT_VERSION`. A warm load
+skips parsing entirely. Ledgers parsed with `keep_raw=True` are cached
+with their `RawForm`, under their own key. The cache directory is bounded
+in size: the least recently used files are evicted first.
+"""
+import hashlib
+import io
+import marshal
+import os
+import re
+import zlib
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import Optional, TextIO, Union
+
+from . import (
+    XPLIT_VERSION,
+    RawEntry,
+    RawForm,
+    XplitEntry,
+    XplitLog,
+    logger,
+    parse_xplit,
+)
+from .rates import RateTable
+
+CACHE_FORMAT = 3
+CACHE_SUFFIX = ".xplitc"
+PARSE_OPTIONS = ("ALWAYS_INVOLVE_EVERYONE", "SUPPORT_48_HOURS")
+_EPOCH = datetime(1970, 1, 1)
+# Four-digit section dates are resolved against today by `guess_year`
+_GUESSED_YEAR_PATTERN = re.compile(rb"^@\s*\d{4}(?:\s|$)", re.MULTILINE)
+
+
+def default_cache_dir() -> Path:
+    base = os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache"
+    return Path(base) / "xplitpay"
+
+
+def cache_key(source: bytes, **kwargs) -> str:
+    """SHA-256 identifying the result of parsing `source` with `kwargs`."""
+    digest = hashlib.sha256()
+    digest.update(f"{XPLIT_VERSION}\0{CACHE_FORMAT}\0{marshal.version}".encode())
+    for option in PARSE_OPTIONS:
+        digest.update(f"\0{option}={bool(kwargs.get(option, False))}".encode())
+    if kwargs.get("keep_raw"):
+        digest.update(b"\0keep_raw")
+    if _GUESSED_YEAR_PATTERN.search(source):
+        digest.update(f"\0{date.today().isoformat()}".encode())
+    digest.update(b"\0")
+    digest.update(source)
+    return digest.hexdigest()
+
+
+def _seconds(when: Optional[datetime]) -> Optional[int]:
+    return int((when - _EPOCH).total_seconds()) if when is not None else None
+
+
+def _datetime(seconds: Optional[int]) -> Optional[datetime]:
+    return _EPOCH + timedelta(seconds=seconds) if seconds is not None else None
+
+
+def pack_xplit(xplit_log: XplitLog) -> bytes:
+    """Serialize `xplit_log` without its `original_content`."""
+    strings = {}
+
+    def ref(string: str) -> int:
+        return strings.setdefault(string, len(strings))
+
+    entries = []
+    for entry in xplit_log.entries:
+        splits = []
+        for person, amount in entry.splits.items():
+            splits.extend((ref(person), amount))
+        entries.append(
+            (
+                ref(entry.section_title) if entry.section_title is not None else -1,
+                entry.title,
+                entry.description,
+                _seconds(entry.time),
+                ref(entry.paid_by),
+                ref(entry.payment_method),
+                entry.expense,
+                tuple(splits),
+            )
+        )
+    raw = None
+    if xplit_log.raw is not None:
+        raw = (
+            tuple(
+                (time_str, _seconds(when), amount, currency, ref(spec))
+                for time_str, when, amount, currency, spec in xplit_log.raw.entries
+            ),
+            tuple(xplit_log.raw.extra_payments),
+        )
+    payload = (
+        CACHE_FORMAT,
+        (
+            xplit_log.version,
+            xplit_log.title,
+            xplit_log.author,
+            xplit_log.people,
+            xplit_log.currencies,
+            xplit_log.currency_main,
+            xplit_log.payment_methods,
+            xplit_log.description,
+        ),
+        tuple(strings),
+        tuple(entries),
+        tuple(xplit_log.extra_payments),
+        tuple(
+            (currency, day.toordinal(), rate)
+            for currency, day, rate in (
+                xplit_log.rates.changes if xplit_log.rates is not None else ()
+            )
+        ),
+        raw,
+    )
+    return zlib.compress(marshal.dumps(payload))
+
+
+def unpack_xplit(data: bytes, original_content: Optional[str] = None) -> XplitLog:
+    """Inverse of `pack_xplit`."""
+    payload = marshal.loads(zlib.decompress(data))
+    if payload[0] != CACHE_FORMAT:
+        raise ValueError(f"Unsupported cache format: {payload[0]}")
+    _, header, strings, entries, extra_payments, rate_changes, raw = payload
+    xplit_log = XplitLog(*header)
+    xplit_log.rates = RateTable.from_currencies(
+        xplit_log.currencies,
+        (
+            (currency, date.fromordinal(day), rate)
+            for currency, day, rate in rate_changes
+        ),
+    )
+    xplit_log.entries = [
+        XplitEntry(
+            strings[section] if section >= 0 else None,
+            title,
+            description,
+            _datetime(seconds),
+            strings[paid_by],
+            strings[payment_method],
+            expense,
+            {strings[splits[i]]: splits[i + 1] for i in range(0, len(splits), 2)},
+        )
+        for (
+            section,
+            title,
+            description,
+            seconds,
+            paid_by,
+            payment_method,
+            expense,
+            splits,
+        ) in entries
+    ]
+    xplit_log.extra_payments = list(extra_payments)
+    if raw is not None:
+        raw_entries, raw_extra_payments = raw
+        xplit_log.raw = RawForm(
+            [
+                RawEntry(time_str, _datetime(seconds), amount, currency, strings[spec])
+                for time_str, seconds, amount, currency, spec in raw_entries
+            ],
+            list(raw_extra_payments),
+        )
+    xplit_log.original_content = original_content
+    return xplit_log
+
+
+class XplitCache:
+    """On-disk LRU cache of parsed ledgers.
+
+    Usage::
+
+        cache = XplitCache(max_bytes=16 * 1024 * 1024)
+        xplit_log = cache.parse("trip.xplit", SUPPORT_48_HOURS=True)
+    """
+
+    def __init__(
+        self,
+        directory: Union[Path, str, None] = None,
+        max_bytes: int = 64 * 1024 * 1024,
+    ):
+        self.directory = Path(directory) if directory else default_cache_dir()
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+
+    def key(self, source: bytes, **kwargs) -> str:
+        return cache_key(source, **kwargs)
+
+    def _path(self, key: str) -> Path:
+        return self.directory / f"{key}{CACHE_SUFFIX}"
+
+    def get(
+        self, key: str, original_content: Optional[str] = None
+    ) -> Optional[XplitLog]:
+        path = self._path(key)
+        try:
+            data = path.read_bytes()
+            xplit_log = unpack_xplit(data, original_content)
+        except FileNotFoundError:
+            return None
+        except (ValueError, EOFError, TypeError, zlib.error) as e:
+            logger.warning(f"Dropping unreadable cache file {path}: {e}")
+            path.unlink()
+            return None
+        os.utime(path)  # Mark as recently used
+        return xplit_log
+
+    def put(self, key: str, xplit_log: XplitLog) -> None:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        path = self._path(key)
+        tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+        tmp_path.write_bytes(pack_xplit(xplit_log))
+        os.replace(tmp_path, path)
+        self.evict()
+
+    def evict(self) -> None:
+        """Remove least recently used files until the cache fits `max_bytes`."""
+        files = []
+        for path in self.directory.glob(f"*{CACHE_SUFFIX}"):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            files.append((stat.st_mtime, stat.st_size, path))
+        total = sum(size for _, size, _ in files)
+        for _, size, path in sorted(files):
+            if total <= self.max_bytes:
+                break
+            logger.debug(f"Evicting cache file {path}")
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                pass
+            total -= size
+
+    def clear(self) -> None:
+        for path in self.directory.glob(f"*{CACHE_SUFFIX}"):
+            path.unlink()
+
+    def parse(self, file: Union[Path, str, TextIO], **kwargs) -> XplitLog:
+        """Same as `parse_xplit`, but served from the cache when possible."""
+        if isinstance(file, (Path, str)):
+            with open(file, "r", encoding="utf-8") as f:
+                content = f.read()
+        else:
+            content = file.read()
+        key = self.key(content.encode("utf-8"), **kwargs)
+        xplit_log = self.get(key, content)
+        if xplit_log is not None:
+            self.hits += 1
+            return xplit_log
+        self.misses += 1
+        xplit_log = parse_xplit(io.StringIO(content), **kwargs)
+        self.put(key, xplit_log)
+        return xplit_log
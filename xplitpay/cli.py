@@ -0,0 +1,247 @@
+"""Command line interface
+
+Usage::
+
+    xplitpay stats trip.xplit --support-48-hours
+    xplitpay settle trip.xplit --mode exact --money
+    xplitpay export trip.xplit -o report.md --locale en
+    xplitpay export trip.xplit --format csv -o -
+    xplitpay diff old.xplit trip.xplit
+    xplitpay batch trips/ --jobs 4
+    xplitpay serve --root trips/
+
+The CLI is meant to be called from shell hooks and editor save actions, so
+start-up time matters as much as parsing: subcommands import the modules
+they need inside their handlers, and loguru is only imported when a warning
+or an error is actually logged (or with `--verbose`). `tests/test_cli.py`
+checks that `stats` on a small ledger never imports loguru, NumPy or the
+process pool machinery, and that importing the CLI and running it stays
+within a cold-start budget of 250 ms.
+"""
+import argparse
+import json
+import sys
+from pathlib import Path
+from typing import List, Optional
+
+from . import XplitLog, logger, parse_xplit
+
+
+def _parse(args: argparse.Namespace) -> XplitLog:
+    kwargs = dict(
+        ALWAYS_INVOLVE_EVERYONE=args.always_involve_everyone,
+        SUPPORT_48_HOURS=args.support_48_hours,
+    )
+    if args.cache:
+        from .cache import XplitCache
+
+        return XplitCache().parse(args.file, **kwargs)
+    return parse_xplit(args.file, **kwargs)
+
+
+def _dump_json(obj) -> None:
+    json.dump(obj, sys.stdout, ensure_ascii=False, indent=2, default=str)
+    print()
+
+
+def cmd_parse(args: argparse.Namespace) -> int:
+    xplit_log = _parse(args)
+    if args.json:
+        from .export import to_dict
+
+        _dump_json(to_dict(xplit_log))
+    else:
+        print(f"{xplit_log.title} by {xplit_log.author}")
+        print(f"People: {', '.join(xplit_log.people.values())}")
+        print(f"Entries: {len(xplit_log.entries)}")
+    return 0
+
+
+def _money(xplit_log: XplitLog):
+    from .money import to_money
+
+    columns = to_money(xplit_log)
+    reconciliation = columns.reconcile()
+    if not reconciliation.ok:
+        logger.warning(
+            f"Balances do not sum to zero: off by {reconciliation.imbalance} minor "
+            f"units over {len(reconciliation.unbalanced_entries)} entries"
+        )
+    return columns
+
+
+def cmd_stats(args: argparse.Namespace) -> int:
+    from .export import compute_stats
+
+    xplit_log = _parse(args)
+    stats = compute_stats(_money(xplit_log) if args.money else xplit_log)
+    if args.json:
+        _dump_json(stats)
+    else:
+        print(f"Total: {stats['total']:.2f}")
+        for person, balance in stats["balance"].items():
+            print(
+                f"{person}: expense {stats['total_expenses'].get(person, 0):.2f}"
+                f" | paid {stats['total_paid'].get(person, 0):.2f}"
+                f" | balance {balance:.2f}"
+            )
+    return 0
+
+
+def cmd_settle(args: argparse.Namespace) -> int:
+    from .settle import settle
+
+    xplit_log = _parse(args)
+    settlement = settle(
+        _money(xplit_log) if args.money else xplit_log,
+        mode=args.mode,
+        time_budget=args.time_budget,
+    )
+    if args.json:
+        _dump_json(vars(settlement))
+    else:
+        for payer, receiver, amount in settlement.transfers:
+            print(f"{payer} -> {receiver}: {amount:.2f}")
+    return 0
+
+
+def cmd_export(args: argparse.Namespace) -> int:
+    from .export import RENDERERS, export_report
+
+    xplit_log = _parse(args)
+    if args.output == "-":
+        output = sys.stdout
+    else:
+        output = args.output or Path(args.file).with_suffix(RENDERERS[args.format][1])
+    name = f"markdown:{args.locale}" if args.format == "markdown" else args.format
+    export_report(xplit_log, {name: output}, include_source=not args.no_source)
+    return 0
+
+
+def cmd_diff(args: argparse.Namespace) -> int:
+    from .diff import diff_to_dict, diff_xplit, format_diff
+
+    kwargs = dict(
+        ALWAYS_INVOLVE_EVERYONE=args.always_involve_everyone,
+        SUPPORT_48_HOURS=args.support_48_hours,
+    )
+    diff = diff_xplit(parse_xplit(args.old, **kwargs), parse_xplit(args.new, **kwargs))
+    if args.json:
+        _dump_json(diff_to_dict(diff))
+    else:
+        print(format_diff(diff))
+    return 1 if diff else 0
+
+
+def cmd_batch(args: argparse.Namespace) -> int:
+    from .batch import run
+
+    return run(args)
+
+
+def cmd_serve(args: argparse.Namespace) -> int:
+    from .server import serve
+
+    print(f"Serving on http://{args.host}:{args.port}", file=sys.stderr)
+    serve(args.host, args.port, root=args.root, max_ledgers=args.max_ledgers)
+    return 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="xplitpay", description="Parse xplit files and split the bill."
+    )
+    parser.add_argument(
+        "-v", "--verbose", action="store_true", help="log debug messages"
+    )
+    from .batch import add_arguments as add_batch_arguments
+
+    subparsers = parser.add_subparsers(dest="command", metavar="COMMAND")
+    subparsers.required = True
+
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("file", help="xplit file")
+    common.add_argument("--always-involve-everyone", action="store_true")
+    common.add_argument("--support-48-hours", action="store_true")
+    common.add_argument(
+        "--cache", action="store_true", help="reuse parse results across runs"
+    )
+
+    sub = subparsers.add_parser("parse", parents=[common], help="parse a ledger")
+    sub.add_argument("--json", action="store_true", help="print all entries as JSON")
+    sub.set_defaults(func=cmd_parse)
+
+    money = argparse.ArgumentParser(add_help=False)
+    money.add_argument(
+        "--money",
+        action="store_true",
+        help="compute in exact integer cents and check that balances sum to zero",
+    )
+
+    sub = subparsers.add_parser(
+        "stats", parents=[common, money], help="totals and balances"
+    )
+    sub.add_argument("--json", action="store_true")
+    sub.set_defaults(func=cmd_stats)
+
+    sub = subparsers.add_parser("settle", parents=[common, money], help="who pays whom")
+    sub.add_argument("--mode", choices=("greedy", "exact"), default="greedy")
+    sub.add_argument("--time-budget", type=float, default=1.0)
+    sub.add_argument("--json", action="store_true")
+    sub.set_defaults(func=cmd_settle)
+
+    sub = subparsers.add_parser(
+        "export", parents=[common], help="Markdown, CSV or JSON Lines report"
+    )
+    sub.add_argument(
+        "-o",
+        "--output",
+        help="output path, or - for stdout (default: FILE.md, .csv or .jsonl)",
+    )
+    sub.add_argument(
+        "--format", choices=("markdown", "csv", "jsonl"), default="markdown"
+    )
+    sub.add_argument("--locale", choices=("zh_CN", "en"), default="zh_CN")
+    sub.add_argument(
+        "--no-source", action="store_true", help="leave out the xplit source"
+    )
+    sub.set_defaults(func=cmd_export)
+
+    sub = subparsers.add_parser(
+        "diff",
+        help="entries and balances changed between versions (exit 1 if any)",
+    )
+    sub.add_argument("old", help="old version of the xplit file")
+    sub.add_argument("new", help="new version of the xplit file")
+    sub.add_argument("--always-involve-everyone", action="store_true")
+    sub.add_argument("--support-48-hours", action="store_true")
+    sub.add_argument("--json", action="store_true")
+    sub.set_defaults(func=cmd_diff)
+
+    sub = subparsers.add_parser("batch", help="roll up many ledgers")
+    add_batch_arguments(sub)
+    sub.set_defaults(func=cmd_batch)
+
+    sub = subparsers.add_parser("serve", help="run the HTTP API")
+    sub.add_argument("--host", default="127.0.0.1")
+    sub.add_argument("--port", type=int, default=8731)
+    sub.add_argument(
+        "--root", help="directory that POST /ledgers?path=... may read from"
+    )
+    sub.add_argument("--max-ledgers", type=int, default=32)
+    sub.set_defaults(func=cmd_serve)
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = build_parser().parse_args(argv)
+    min_level = logger.min_level
+    logger.min_level = 0 if args.verbose else 30  # WARNING
+    try:
+        return args.func(args)
+    finally:
+        logger.min_level = min_level
+
+
+if __name__ == "__main__":
+    sys.exit(main())
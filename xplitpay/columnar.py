@@ -0,0 +1,171 @@
+"""Columnar view of an `XplitLog`
+
+People and payment methods are interned to integer ids, and every per-entry
+field is stored as a flat column, so that the statistics in
+`xplitpay.export.compute_stats` become reductions over arrays. NumPy is used
+when it is installed, otherwise the columns are backed by the standard
+`array` module.
+"""
+from array import array
+from dataclasses import dataclass, field
+from math import nan
+from typing import Dict, List, Tuple
+
+from . import XplitLog
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - depends on the environment
+    np = None
+
+
+@dataclass
+class XplitColumns:
+    people: List[str]
+    payment_methods: List[str]
+    expense: "array"
+    payer: "array"
+    payment_method: "array"
+    time: "array"
+    splits: "array"
+    expense_order: List[int] = field(default_factory=list)
+    paid_order: List[int] = field(default_factory=list)
+    extra_payments: List[Tuple[int, int, float]] = field(default_factory=list)
+
+    def __len__(self) -> int:
+        return len(self.expense)
+
+    @property
+    def person_ids(self) -> Dict[str, int]:
+        return {person: idx for idx, person in enumerate(self.people)}
+
+    def split_column(self, person: str):
+        """Return the split amounts of `person` for every entry."""
+        idx = self.person_ids[person]
+        if np is not None:
+            return self.splits[:, idx]
+        return self.splits[idx :: len(self.people)]
+
+    def total_expenses(self) -> List[float]:
+        """Per-person sum of splits, indexed by person id."""
+        n_people = len(self.people)
+        if np is not None:
+            return self.splits.sum(axis=0).tolist()
+        return [sum(self.splits[idx::n_people]) for idx in range(n_people)]
+
+    def total_paid(self) -> List[float]:
+        """Per-person sum of paid expenses, indexed by person id."""
+        n_people = len(self.people)
+        if np is not None:
+            return np.bincount(
+                self.payer, weights=self.expense, minlength=n_people
+            ).tolist()
+        totals = [0] * n_people
+        for payer, expense in zip(self.payer, self.expense):
+            totals[payer] += expense
+        return totals
+
+    def compute_stats(self) -> dict:
+        """Same result as `xplitpay.export.compute_stats`, computed column-wise."""
+        total_expenses = self.total_expenses()
+        total_paid = self.total_paid()
+        stats = {}
+        stats["total"] = sum(self.expense) if np is None else float(self.expense.sum())
+        stats["total_expenses"] = {
+            self.people[idx]: total_expenses[idx] for idx in self.expense_order
+        }
+        stats["total_paid"] = {
+            self.people[idx]: total_paid[idx] for idx in self.paid_order
+        }
+        stats["balance"] = {
+            self.people[idx]: total_paid[idx] - total_expenses[idx]
+            for idx in self.expense_order
+        }
+        for payer, receiver, amount in self.extra_payments:
+            for idx in (payer, receiver):
+                if self.people[idx] not in stats["balance"]:
+                    stats["balance"][self.people[idx]] = 0
+            stats["balance"][self.people[payer]] += amount
+            stats["balance"][self.people[receiver]] -= amount
+        return stats
+
+
+def to_columns(xplit_log: XplitLog) -> XplitColumns:
+    """Build the columnar view of `xplit_log`.
+
+    Person ids start with the people declared in `@people`, followed by any
+    other names met in the entries or extra payments.
+    """
+    people = list(xplit_log.people.values())
+    person_ids = {person: idx for idx, person in enumerate(people)}
+    method_names = list(xplit_log.payment_methods.values())
+    method_ids = {method: idx for idx, method in enumerate(method_names)}
+
+    def intern(table: Dict[str, int], names: List[str], name: str) -> int:
+        if name not in table:
+            table[name] = len(names)
+            names.append(name)
+        return table[name]
+
+    # Intern every name first, so that the split matrix has a fixed width
+    for entry in xplit_log.entries:
+        intern(person_ids, people, entry.paid_by)
+        for person in entry.splits:
+            intern(person_ids, people, person)
+    for payer, receiver, _ in xplit_log.extra_payments:
+        intern(person_ids, people, payer)
+        intern(person_ids, people, receiver)
+
+    n_people = len(people)
+    expense = array("d")
+    payer = array("l")
+    payment_method = array("l")
+    time = array("d")
+    splits = array("d", bytes(8 * n_people * len(xplit_log.entries)))
+    expense_order = []
+    paid_order = []
+    seen_expense = set()
+    seen_paid = set()
+    for row, entry in enumerate(xplit_log.entries):
+        payer_id = person_ids[entry.paid_by]
+        expense.append(entry.expense)
+        payer.append(payer_id)
+        payment_method.append(intern(method_ids, method_names, entry.payment_method))
+        time.append(entry.time.timestamp() if entry.time is not None else nan)
+        if payer_id not in seen_paid:
+            seen_paid.add(payer_id)
+            paid_order.append(payer_id)
+        offset = row * n_people
+        for person, amount in entry.splits.items():
+            person_id = person_ids[person]
+            splits[offset + person_id] = amount
+            if person_id not in seen_expense:
+                seen_expense.add(person_id)
+                expense_order.append(person_id)
+
+    if np is not None:
+        expense = np.frombuffer(expense, dtype=np.float64)
+        payer = np.frombuffer(payer, dtype=np.dtype(f"i{payer.itemsize}"))
+        payment_method = np.frombuffer(
+            payment_method, dtype=np.dtype(f"i{payment_method.itemsize}")
+        )
+        time = np.frombuffer(time, dtype=np.float64)
+        splits = np.frombuffer(splits, dtype=np.float64).reshape(
+            len(xplit_log.entries), n_people
+        )
+
+    return XplitColumns(
+        people,
+        method_names,
+        expense,
+        payer,
+        payment_method,
+        time,
+        splits,
+        expense_order,
+        paid_order,
+        [
+            (person_ids[payer_name], person_ids[receiver], amount)
+            for payer_name, receiver, amount in xplit_log.extra_payments
+        ],
+    )
@@ -0,0 +1,207 @@
+"""Structural diff between two versions of a ledger
+
+`diff_xplit` pairs the entries of two `XplitLog`s with hash lookups, in
+O(n) expected time. After skipping the entries that the two versions share
+at their start and end, which are compared field by field:
+
+1. entries with the same fingerprint (every field, splits included) are
+   unchanged;
+2. of the rest, entries with the same section, title, time and payer are
+   the same entry, changed;
+3. whatever is left was removed from the old version or added to the new.
+
+Duplicates are paired in file order. The per-person balance deltas are
+computed from the entries that differ and from the extra payments alone, so
+a small edit to a large ledger costs a lookup per entry and nothing like a
+second `compute_stats`::
+
+    diff = diff_xplit(parse_xplit("old.xplit"), parse_xplit("new.xplit"))
+    diff.balance_delta  # {"Lynnex": -12.5, "Kunologist": 12.5}
+"""
+from collections import Counter, defaultdict, deque
+from dataclasses import dataclass, field, fields
+from math import fsum
+from typing import Deque, Dict, Hashable, List, Tuple
+
+from . import XplitEntry, XplitLog
+
+
+def entry_fingerprint(entry: XplitEntry) -> Hashable:
+    """Every field of `entry`, in a hashable form."""
+    return (
+        entry.section_title,
+        entry.title,
+        entry.time,
+        entry.paid_by,
+        entry.description,
+        entry.payment_method,
+        entry.expense,
+        tuple(sorted(entry.splits.items())),
+    )
+
+
+def entry_identity(entry: XplitEntry) -> Hashable:
+    """The fields that make two versions of an entry the same entry."""
+    return (entry.section_title, entry.title, entry.time, entry.paid_by)
+
+
+def changed_fields(old: XplitEntry, new: XplitEntry) -> List[str]:
+    return [
+        f.name
+        for f in fields(XplitEntry)
+        if getattr(old, f.name) != getattr(new, f.name)
+    ]
+
+
+@dataclass
+class LedgerDiff:
+    added: List[XplitEntry] = field(default_factory=list)
+    removed: List[XplitEntry] = field(default_factory=list)
+    changed: List[Tuple[XplitEntry, XplitEntry]] = field(default_factory=list)
+    unchanged: int = 0
+    extra_payments_added: List[Tuple[str, str, float]] = field(default_factory=list)
+    extra_payments_removed: List[Tuple[str, str, float]] = field(default_factory=list)
+    total_delta: float = 0.0
+    balance_delta: Dict[str, float] = field(default_factory=dict)
+
+    def __bool__(self) -> bool:
+        return bool(
+            self.added
+            or self.removed
+            or self.changed
+            or self.extra_payments_added
+            or self.extra_payments_removed
+        )
+
+
+def _pair(
+    old: List[XplitEntry], new: List[XplitEntry], key
+) -> Tuple[List[Tuple[XplitEntry, XplitEntry]], List[XplitEntry], List[XplitEntry]]:
+    """Pair entries with equal `key`, in order; returns the pairs and the
+    unpaired entries of each side."""
+    by_key: Dict[Hashable, Deque[XplitEntry]] = defaultdict(deque)
+    for entry in old:
+        by_key[key(entry)].append(entry)
+    pairs, unpaired_new = [], []
+    for entry in new:
+        candidates = by_key.get(key(entry))
+        if candidates:
+            pairs.append((candidates.popleft(), entry))
+        else:
+            unpaired_new.append(entry)
+    paired_old = {id(old_entry) for old_entry, _ in pairs}
+    unpaired_old = [entry for entry in old if id(entry) not in paired_old]
+    return pairs, unpaired_old, unpaired_new
+
+
+def diff_xplit(old: XplitLog, new: XplitLog) -> LedgerDiff:
+    """Compare two versions of a ledger. See the module docstring."""
+    diff = LedgerDiff()
+    old_entries, new_entries = old.entries, new.entries
+
+    # Edits are usually local: skip the common head and tail without hashing
+    limit = min(len(old_entries), len(new_entries))
+    head = 0
+    while head < limit and old_entries[head] == new_entries[head]:
+        head += 1
+    tail = 0
+    while tail < limit - head and old_entries[-1 - tail] == new_entries[-1 - tail]:
+        tail += 1
+    old_entries = old_entries[head : len(old_entries) - tail]
+    new_entries = new_entries[head : len(new_entries) - tail]
+
+    same, old_rest, new_rest = _pair(old_entries, new_entries, entry_fingerprint)
+    diff.unchanged = head + len(same) + tail
+    diff.changed, diff.removed, diff.added = _pair(old_rest, new_rest, entry_identity)
+
+    old_payments = Counter(old.extra_payments)
+    new_payments = Counter(new.extra_payments)
+    diff.extra_payments_added = list((new_payments - old_payments).elements())
+    diff.extra_payments_removed = list((old_payments - new_payments).elements())
+
+    # Balance contributions, as in `compute_stats`, with a sign per side
+    totals: List[float] = []
+    contributions: Dict[str, List[float]] = defaultdict(list)
+
+    def add(entry: XplitEntry, sign: int) -> None:
+        totals.append(sign * entry.expense)
+        contributions[entry.paid_by].append(sign * entry.expense)
+        for person, amount in entry.splits.items():
+            contributions[person].append(-sign * amount)
+
+    for entry in diff.removed:
+        add(entry, -1)
+    for entry in diff.added:
+        add(entry, 1)
+    for old_entry, new_entry in diff.changed:
+        add(old_entry, -1)
+        add(new_entry, 1)
+    for sign, payments in (
+        (1, diff.extra_payments_added),
+        (-1, diff.extra_payments_removed),
+    ):
+        for payer, receiver, amount in payments:
+            contributions[payer].append(sign * amount)
+            contributions[receiver].append(-sign * amount)
+
+    diff.total_delta = fsum(totals)
+    for person, amounts in contributions.items():
+        delta = fsum(amounts)
+        if delta:
+            diff.balance_delta[person] = delta
+    return diff
+
+
+def diff_to_dict(diff: LedgerDiff) -> dict:
+    """JSON-ready form of `diff`."""
+    from .export import entry_to_dict
+
+    return {
+        "added": [entry_to_dict(entry) for entry in diff.added],
+        "removed": [entry_to_dict(entry) for entry in diff.removed],
+        "changed": [
+            {
+                "old": entry_to_dict(old),
+                "new": entry_to_dict(new),
+                "fields": changed_fields(old, new),
+            }
+            for old, new in diff.changed
+        ],
+        "unchanged": diff.unchanged,
+        "extra_payments_added": diff.extra_payments_added,
+        "extra_payments_removed": diff.extra_payments_removed,
+        "total_delta": diff.total_delta,
+        "balance_delta": diff.balance_delta,
+    }
+
+
+def format_diff(diff: LedgerDiff) -> str:
+    """Human-readable summary of `diff`, one line per change."""
+
+    def describe(entry: XplitEntry) -> str:
+        time = f" {entry.time:%m/%d %H:%M}" if entry.time is not None else ""
+        return (
+            f"[{entry.section_title}] {entry.title}{time}"
+            f" | {entry.expense:.2f} paid by {entry.paid_by}"
+        )
+
+    lines = [f"- {describe(entry)}" for entry in diff.removed]
+    lines.extend(f"+ {describe(entry)}" for entry in diff.added)
+    for old, new in diff.changed:
+        changes = []
+        for name in changed_fields(old, new):
+            if name == "expense":
+                changes.append(f"expense {old.expense:.2f} -> {new.expense:.2f}")
+            else:
+                changes.append(name)
+        lines.append(f"~ {describe(new)} ({', '.join(changes)})")
+    for payer, receiver, amount in diff.extra_payments_removed:
+        lines.append(f"- {payer} -> {receiver}: {amount:.2f}")
+    for payer, receiver, amount in diff.extra_payments_added:
+        lines.append(f"+ {payer} -> {receiver}: {amount:.2f}")
+    if not lines:
+        return "No changes"
+    lines.append(f"Total: {diff.total_delta:+.2f}")
+    for person, delta in diff.balance_delta.items():
+        lines.append(f"{person}: balance {delta:+.2f}")
+    return "\n".join(lines)
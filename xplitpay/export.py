@@ -1,10 +1,30 @@
-from . import XplitLog, XPLIT_VERSION
-from mdutils.mdutils import MdUtils
-from mdutils import Html
+from . import XplitEntry, XplitLog, XPLIT_VERSION
+import csv
+import json
+from contextlib import contextmanager
+from dataclasses import dataclass, field
 from datetime import datetime
+from itertools import chain
+from pathlib import Path
+from typing import (
+    TYPE_CHECKING,
+    Callable,
+    Dict,
+    Iterator,
+    List,
+    Optional,
+    TextIO,
+    Tuple,
+    Union,
+)
 
+if TYPE_CHECKING:
+    from .columnar import XplitColumns  # Imports NumPy when available
 
-def compute_stats(xplit_log: XplitLog) -> dict:
+
+def compute_stats(xplit_log: Union[XplitLog, "XplitColumns"]) -> dict:
+    if not isinstance(xplit_log, XplitLog):
+        return xplit_log.compute_stats()
     stats = {}
     stats["total"] = 0
     stats["total_expenses"] = {}
@@ -33,114 +53,287 @@ def compute_stats(xplit_log: XplitLog) -> dict:
     return stats
 
 
-def _generate_markdown_zh_cn(xplit_log: XplitLog, md_path: str, stats: dict):
-    md_file = MdUtils(file_name=md_path)
+def entry_to_dict(entry: XplitEntry) -> dict:
+    """JSON-ready form of an entry; `time` becomes an ISO 8601 string."""
+    return {
+        "section_title": entry.section_title,
+        "title": entry.title,
+        "description": entry.description,
+        "time": entry.time.isoformat() if entry.time is not None else None,
+        "paid_by": entry.paid_by,
+        "payment_method": entry.payment_method,
+        "expense": entry.expense,
+        "splits": entry.splits,
+    }
 
-    # Add Title
-    md_file.new_header(level=1, title=xplit_log.title)
 
-    # Add Description
-    for line in xplit_log.description.split("\n"):
-        md_file.new_paragraph(f"> {line}")
-
-    # Add Stats
-    md_file.new_header(level=2, title="统计与结算")
-    md_file.new_paragraph(f"**结算货币**：{xplit_log.currency_main}")
-    md_file.new_paragraph(f"**总支出** {stats['total']:.2f}")
-    text_list = ["人员", "实际花费", "实际支付", "额外盈亏补偿"]
-    people = list(stats["total_expenses"].keys())
-    for person in people:
-        text_list.extend(
-            [
-                person,
-                f"{stats['total_expenses'][person]:.2f}",
-                f"{stats['total_paid'][person]:.2f}",
-                f"{stats['balance'][person]:.2f}",
-            ]
-        )
-    md_file.new_table(columns=4, rows=len(people) + 1, text=text_list)
+def to_dict(xplit_log: XplitLog, include_entries: bool = True) -> dict:
+    """JSON-ready form of a ledger, without its `original_content`."""
+    data = {
+        "version": xplit_log.version,
+        "title": xplit_log.title,
+        "author": xplit_log.author,
+        "people": xplit_log.people,
+        "currencies": xplit_log.currencies,
+        "currency_main": xplit_log.currency_main,
+        "payment_methods": xplit_log.payment_methods,
+        "description": xplit_log.description,
+        "extra_payments": xplit_log.extra_payments,
+        "rates": [
+            (currency, day.isoformat(), rate)
+            for currency, day, rate in (
+                xplit_log.rates.changes if xplit_log.rates is not None else ()
+            )
+        ],
+        "n_entries": len(xplit_log.entries),
+    }
+    if include_entries:
+        data["entries"] = [entry_to_dict(entry) for entry in xplit_log.entries]
+    return data
 
-    # Entries
-    # First perform a group & sort. Within the same section, sort by time
-    current_subtitle = None
-    all_entries = []
-    current_section_entries = []
-    for entry in xplit_log.entries:
-        if current_subtitle != entry.section_title:
-            current_subtitle = entry.section_title
-            if current_section_entries:
-                all_entries.extend(
-                    sorted(
-                        current_section_entries,
-                        key=lambda x: x.time if x.time is not None else datetime.now(),
-                    )
-                )
-            current_section_entries = []
-        current_section_entries.append(entry)
-    if current_section_entries:
-        all_entries.extend(
-            sorted(
-                current_section_entries,
-                key=lambda x: x.time if x.time is not None else datetime.now(),
+
+MARKDOWN_LOCALES = {
+    "zh_CN": {
+        "stats": "统计与结算",
+        "currency": "**结算货币**：{currency}",
+        "total": "**总支出** {total:.2f}",
+        "stats_columns": [
+            "人员",
+            "实际花费",
+            "实际支付",
+            "额外盈亏补偿",
+        ],
+        "entry": "**支出**：{expense:.2f} ({paid_by}) | 🕒 {time}",
+        "time": "{time}",
+        "no_time": "-",
+        "extra_payments": "附加项",
+        "extra_payments_columns": ["付款人", "收款人", "金额"],
+        "developer": "开发者相关",
+        "version": "XplitPay 版本：`{version}`",
+        "generated_at": "生成时间：`{now}`",
+        "source": "源数据：",
+    },
+    "en": {
+        "stats": "Stats",
+        "currency": "**Using currency:** {currency}",
+        "total": "**Total Expenditure:** {total:.2f}",
+        "stats_columns": [
+            "Person",
+            "Actual Expense",
+            "Amount Paid",
+            "Should Receive...",
+        ],
+        "entry": "**{expense:.2f}** spent | paid by {paid_by} {time}",
+        "time": "at {time}",
+        "no_time": "",
+        "extra_payments": "Extra Payments",
+        "extra_payments_columns": ["From", "To", "Amount"],
+        "developer": "Developer Info",
+        "version": "XplitPay v`{version}`",
+        "generated_at": "Generated at `{now}`",
+        "source": "Source:",
+    },
+}
+
+
+@dataclass
+class ReportSection:
+    title: str
+    entries: List[XplitEntry]  # Sorted by time
+    _splits: Optional[List[List[Tuple[str, float]]]] = field(
+        default=None, repr=False, compare=False
+    )
+
+    @property
+    def splits(self) -> List[List[Tuple[str, float]]]:
+        """Per entry, the splits sorted by person; computed on first use."""
+        if self._splits is None:
+            self._splits = [sorted(entry.splits.items()) for entry in self.entries]
+        return self._splits
+
+
+@dataclass
+class Report:
+    """Everything the renderers need, computed once per ledger."""
+
+    xplit_log: XplitLog
+    stats: dict
+    sections: List[ReportSection]
+    generated_at: datetime
+    people: List[str] = field(default_factory=list)
+
+
+def build_report(xplit_log: XplitLog, stats: Optional[dict] = None) -> Report:
+    """Compute the stats and sort the sections of `xplit_log` for rendering.
+
+    Untimed entries sort as if they happened at `generated_at`, i.e. usually
+    last in their section.
+    """
+    if stats is None:
+        stats = compute_stats(xplit_log)
+    now = datetime.now()
+
+    def key(entry: XplitEntry) -> datetime:
+        return entry.time if entry.time is not None else now
+
+    sections = []
+    group: List[XplitEntry] = []
+    for entry in chain(xplit_log.entries, (None,)):
+        if group and (entry is None or group[-1].section_title != entry.section_title):
+            group.sort(key=key)
+            sections.append(ReportSection(group[0].section_title, group))
+            group = []
+        if entry is not None:
+            group.append(entry)
+
+    people = list(xplit_log.people.values())
+    people.extend(person for person in stats["balance"] if person not in people)
+    return Report(xplit_log, stats, sections, now, people)
+
+
+@contextmanager
+def _open_output(
+    md_path: Union[Path, str, TextIO], suffix: str = ".md"
+) -> Iterator[TextIO]:
+    if isinstance(md_path, (Path, str)):
+        md_path = str(md_path)
+        if not md_path.endswith(suffix):
+            md_path += suffix
+        with open(md_path, "w", encoding="utf-8") as f:
+            yield f
+    else:
+        yield md_path
+
+
+def _table(rows: List[List[str]]) -> str:
+    lines = ["|" + "|".join(rows[0]) + "|", "|" + " :---: |" * len(rows[0])]
+    lines.extend("|" + "|".join(row) + "|" for row in rows[1:])
+    return "\n".join(lines) + "\n\n"
+
+
+def _render_section(section: ReportSection, text: Dict[str, str]) -> str:
+    parts = [f"## {section.title}\n\n"]
+    for entry, splits in zip(section.entries, section.splits):
+        parts.append(f"### {entry.title}\n\n")
+        parts.append(f"> {entry.description}\n\n")
+        time = (
+            text["time"].format(time=entry.time.strftime("%m/%d %H:%M"))
+            if entry.time is not None
+            else text["no_time"]
+        )
+        parts.append(
+            text["entry"].format(
+                expense=entry.expense, paid_by=entry.paid_by, time=time
             )
+            + "\n\n"
         )
-    # Write to markdown
-    current_subtitle = None
-    for entry in all_entries:
-        if current_subtitle != entry.section_title:
-            md_file.new_header(level=2, title=entry.section_title)
-            current_subtitle = entry.section_title
-        md_file.new_header(level=3, title=entry.title)
-        md_file.new_paragraph("> " + entry.description)
-        md_file.new_paragraph(
-            f"**支出**：{entry.expense:.2f} ({entry.paid_by}) | 🕒 {entry.time.strftime('%m/%d %H:%M') if entry.time is not None else '-'}"
+        if not splits:
+            continue
+        parts.append(
+            _table(
+                [
+                    [person for person, _ in splits],
+                    [f"{amount:.2f}" for _, amount in splits],
+                ]
+            )
+        )
+    return "".join(parts)
+
+
+class MarkdownFragmentCache:
+    """Rendered Markdown sections, reused across exports of a changing ledger.
+
+    A section is looked up by its title, then its entries are compared with
+    those of the cached fragments, so an edit only re-renders the sections
+    it touches; the stats table and the other parts of the report are cheap
+    and always rendered. Entries that are the same objects as last time, as
+    with `xplitpay.incremental` or `xplitpay.live`, compare equal at once;
+    freshly parsed ones are compared field by field. Either way, replace
+    entries rather than editing them in place.
+
+    After each export, fragments of a locale that the export did not use
+    are dropped, so the cache holds about one report per locale. `hits` and
+    `misses` count section lookups.
+
+    Usage::
+
+        fragments = MarkdownFragmentCache()
+        generate_markdown(xplit_log, "trip.md", fragments=fragments)
+        ...  # after an edit
+        generate_markdown(new_xplit_log, "trip.md", fragments=fragments)
+    """
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self._fragments: Dict[str, Dict[str, List[Tuple[list, str]]]] = {}
+        self._used: Dict[str, Dict[str, List[Tuple[list, str]]]] = {}
+
+    def __len__(self) -> int:
+        return sum(
+            len(candidates)
+            for fragments in self._fragments.values()
+            for candidates in fragments.values()
         )
-        people = list(entry.splits.keys())
-        amounts = list(entry.splits.values())
-        # Sort by people
-        people, amounts = zip(*sorted(zip(people, amounts)))
-        people = list(people)
-        amounts_str = [f"{amount:.2f}" for amount in amounts]
-        text_list = people + amounts_str
-        md_file.new_table(columns=len(people), rows=2, text=text_list)
-
-    # Additional Items, Balances, and Metadata (placeholders for now)
-    md_file.new_header(level=2, title="附加项")
-    extra_payments = xplit_log.extra_payments
-    if extra_payments:
-        text_list = ["付款人", "收款人", "金额"]
-        for payment in extra_payments:
-            text_list.extend([payment[0], payment[1], f"{payment[2]:.2f}"])
-        md_file.new_table(columns=3, rows=len(extra_payments) + 1, text=text_list)
-
-    # Developer Information
-    md_file.new_header(level=2, title="开发者相关")
-    md_file.new_paragraph(f"XplitPay 版本：`{XPLIT_VERSION}`")
-    md_file.new_paragraph(f"生成时间：`{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}`")
-    md_file.new_paragraph(f"源数据：\n\n```plaintext\n{xplit_log.original_content}\n```")
-
-    # Save the markdown file
-    md_file.create_md_file()
-
-
-def _generate_markdown_en(xplit_log: XplitLog, md_path: str, stats: dict):
-    md_file = MdUtils(file_name=md_path)
-
-    # Add Title
-    md_file.new_header(level=1, title=xplit_log.title)
-
-    # Add Description
+
+    def get(self, section: ReportSection, locale: str, text: Dict[str, str]) -> str:
+        entries = section.entries
+        fragment = None
+        for cached_entries, cached in self._fragments.get(locale, {}).get(
+            section.title, ()
+        ):
+            if cached_entries == entries:
+                fragment = cached
+                break
+        if fragment is None:
+            self.misses += 1
+            fragment = _render_section(section, text)
+        else:
+            self.hits += 1
+        used = self._used.setdefault(locale, {})
+        used.setdefault(section.title, []).append((entries, fragment))
+        return fragment
+
+    def sweep(self, locale: str) -> None:
+        """Keep only the fragments of `locale` used since the last sweep."""
+        self._fragments[locale] = self._used.pop(locale, {})
+
+    def clear(self) -> None:
+        self._fragments.clear()
+        self._used.clear()
+        self.hits = 0
+        self.misses = 0
+
+
+def render_markdown(
+    report: Report,
+    out: TextIO,
+    locale: str = "zh_CN",
+    include_source: bool = True,
+    fragments: Optional[MarkdownFragmentCache] = None,
+) -> None:
+    """Stream the Markdown report to `out`, section by section.
+
+    With `fragments`, unchanged sections are copied from the cache.
+    """
+    try:
+        text = MARKDOWN_LOCALES[locale]
+    except KeyError:
+        raise ValueError(f"Unsupported locale: {locale}")
+    xplit_log, stats = report.xplit_log, report.stats
+
+    # Title and description
+    out.write(f"# {xplit_log.title}\n\n")
     for line in xplit_log.description.split("\n"):
-        md_file.new_paragraph(f"> {line}")
-
-    # Add Stats
-    md_file.new_header(level=2, title="Stats")
-    md_file.new_paragraph(f"**Using currency:** {xplit_log.currency_main}")
-    md_file.new_paragraph(f"**Total Expenditure:** {stats['total']:.2f}")
-    text_list = ["Person", "Actual Expense", "Amount Paid", "Should Receive..."]
-    people = list(stats["total_expenses"].keys())
-    for person in people:
-        text_list.extend(
+        out.write(f"> {line}\n\n")
+
+    # Stats
+    out.write(f"## {text['stats']}\n\n")
+    out.write(text["currency"].format(currency=xplit_log.currency_main) + "\n\n")
+    out.write(text["total"].format(total=stats["total"]) + "\n\n")
+    rows = [text["stats_columns"]]
+    for person in stats["total_expenses"]:
+        rows.append(
             [
                 person,
                 f"{stats['total_expenses'][person]:.2f}",
@@ -148,77 +341,157 @@ def _generate_markdown_en(xplit_log: XplitLog, md_path: str, stats: dict):
                 f"{stats['balance'][person]:.2f}",
             ]
         )
-    md_file.new_table(columns=4, rows=len(people) + 1, text=text_list)
+    out.write(_table(rows))
 
     # Entries
-    # First perform a group & sort. Within the same section, sort by time
-    current_subtitle = None
-    all_entries = []
-    current_section_entries = []
-    for entry in xplit_log.entries:
-        if current_subtitle != entry.section_title:
-            current_subtitle = entry.section_title
-            if current_section_entries:
-                all_entries.extend(
-                    sorted(
-                        current_section_entries,
-                        key=lambda x: x.time if x.time is not None else datetime.now(),
-                    )
-                )
-            current_section_entries = []
-        current_section_entries.append(entry)
-    if current_section_entries:
-        all_entries.extend(
-            sorted(
-                current_section_entries,
-                key=lambda x: x.time if x.time is not None else datetime.now(),
+    for section in report.sections:
+        if fragments is None:
+            out.write(_render_section(section, text))
+        else:
+            out.write(fragments.get(section, locale, text))
+
+    # Extra payments
+    out.write(f"## {text['extra_payments']}\n\n")
+    if xplit_log.extra_payments:
+        rows = [text["extra_payments_columns"]]
+        for payer, receiver, amount in xplit_log.extra_payments:
+            rows.append([payer, receiver, f"{amount:.2f}"])
+        out.write(_table(rows))
+
+    # Developer information
+    out.write(f"## {text['developer']}\n\n")
+    out.write(text["version"].format(version=XPLIT_VERSION) + "\n\n")
+    now = report.generated_at.strftime("%Y-%m-%d %H:%M:%S")
+    out.write(text["generated_at"].format(now=now) + "\n\n")
+    if include_source and xplit_log.original_content is not None:
+        out.write(f"{text['source']}\n\n```plaintext\n")
+        out.write(xplit_log.original_content)
+        out.write("\n```\n")
+    if fragments is not None:
+        fragments.sweep(locale)
+
+
+CSV_COLUMNS = [
+    "section",
+    "title",
+    "description",
+    "time",
+    "paid_by",
+    "payment_method",
+    "expense",
+]
+
+
+def render_csv(report: Report, out: TextIO) -> None:
+    """One row per entry, in report order, with one split column per person."""
+    writer = csv.writer(out, lineterminator="\n")
+    writer.writerow(CSV_COLUMNS + report.people)
+    people = report.people
+    for section in report.sections:
+        for entry in section.entries:
+            splits = entry.splits
+            writer.writerow(
+                [
+                    section.title,
+                    entry.title,
+                    entry.description,
+                    entry.time.isoformat() if entry.time is not None else "",
+                    entry.paid_by,
+                    entry.payment_method,
+                    entry.expense,
+                ]
+                + [splits.get(person, "") for person in people]
             )
+
+
+def render_jsonl(report: Report, out: TextIO) -> None:
+    """One `entry_to_dict` object per line, in report order."""
+    for section in report.sections:
+        for entry in section.entries:
+            out.write(json.dumps(entry_to_dict(entry), ensure_ascii=False) + "\n")
+
+
+RENDERERS: Dict[str, Tuple[Callable[..., None], str]] = {
+    "markdown": (render_markdown, ".md"),
+    "csv": (render_csv, ".csv"),
+    "jsonl": (render_jsonl, ".jsonl"),
+}
+
+
+def export_report(
+    xplit_log: XplitLog,
+    outputs: Dict[str, Union[Path, str, TextIO]],
+    include_source: bool = True,
+    stats: Optional[dict] = None,
+    fragments: Optional[MarkdownFragmentCache] = None,
+) -> Report:
+    """Render one report into several formats, computing it only once.
+
+    `outputs` maps formats to files or file-like objects. Formats are
+    `csv`, `jsonl` and `markdown`, or `markdown:<locale>` for other locales
+    than `zh_CN`::
+
+        export_report(
+            xplit_log,
+            {"markdown": "trip.md", "markdown:en": "trip.en.md", "csv": "trip.csv"},
         )
-    # Write to markdown
-    current_subtitle = None
-    for entry in all_entries:
-        if current_subtitle != entry.section_title:
-            md_file.new_header(level=2, title=entry.section_title)
-            current_subtitle = entry.section_title
-        md_file.new_header(level=3, title=entry.title)
-        md_file.new_paragraph("> " + entry.description)
-        md_file.new_paragraph(
-            f"**{entry.expense:.2f}** spent | paid by {entry.paid_by} {'at ' + entry.time.strftime('%m/%d %H:%M') if entry.time is not None else ''}"
-        )
-        people = list(entry.splits.keys())
-        amounts = list(entry.splits.values())
-        # Sort by people
-        people, amounts = zip(*sorted(zip(people, amounts)))
-        people = list(people)
-        amounts_str = [f"{amount:.2f}" for amount in amounts]
-        text_list = people + amounts_str
-        md_file.new_table(columns=len(people), rows=2, text=text_list)
-
-    # Additional Items, Balances, and Metadata (placeholders for now)
-    md_file.new_header(level=2, title="Extra Payments")
-    extra_payments = xplit_log.extra_payments
-    if extra_payments:
-        text_list = ["From", "To", "Amount"]
-        for payment in extra_payments:
-            text_list.extend([payment[0], payment[1], f"{payment[2]:.2f}"])
-        md_file.new_table(columns=3, rows=len(extra_payments) + 1, text=text_list)
-
-    # Developer Information
-    md_file.new_header(level=2, title="Developer Info")
-    md_file.new_paragraph(f"XplitPay v`{XPLIT_VERSION}`")
-    md_file.new_paragraph(
-        f"Generated at `{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}`"
-    )
-    md_file.new_paragraph(f"Source:\n\n```plaintext\n{xplit_log.original_content}\n```")
+    """
+    jobs = []
+    for name, output in outputs.items():
+        format_, _, locale = name.partition(":")
+        if format_ not in RENDERERS:
+            raise ValueError(f"Unsupported format: {name}")
+        options = {}
+        if format_ == "markdown":
+            options = dict(
+                locale=locale or "zh_CN",
+                include_source=include_source,
+                fragments=fragments,
+            )
+            if options["locale"] not in MARKDOWN_LOCALES:
+                raise ValueError(f"Unsupported locale: {locale}")
+        jobs.append((RENDERERS[format_], output, options))
 
-    # Save the markdown file
-    md_file.create_md_file()
+    report = build_report(xplit_log, stats)
+    for (render, _), output, options in jobs:
+        # Paths are written as given, without adding the format's suffix
+        with _open_output(output, suffix="") as out:
+            render(report, out, **options)
+    return report
 
 
-def generate_markdown(xplit_log: XplitLog, md_path: str, locale: str = "zh_CN"):
-    stats = compute_stats(xplit_log)
+def write_markdown(
+    xplit_log: XplitLog,
+    out: TextIO,
+    locale: str = "zh_CN",
+    stats: Optional[dict] = None,
+    include_source: bool = True,
+    fragments: Optional[MarkdownFragmentCache] = None,
+) -> None:
+    """Stream the Markdown report of `xplit_log` to `out`, section by section."""
+    if locale not in MARKDOWN_LOCALES:
+        raise ValueError(f"Unsupported locale: {locale}")
+    render_markdown(
+        build_report(xplit_log, stats), out, locale, include_source, fragments
+    )
+
 
-    if locale == "zh_CN":
-        _generate_markdown_zh_cn(xplit_log, md_path, stats)
-    elif locale == "en":
-        _generate_markdown_en(xplit_log, md_path, stats)
+def generate_markdown(
+    xplit_log: XplitLog,
+    md_path: Union[Path, str, TextIO],
+    locale: str = "zh_CN",
+    include_source: bool = True,
+    fragments: Optional[MarkdownFragmentCache] = None,
+):
+    """Write the Markdown report of `xplit_log` to a file or file-like object.
+
+    A `.md` suffix is appended to paths that lack one. Pass
+    `include_source=False` to leave the source ledger out of the report.
+    Use `export_report` to write several locales or formats at once, and
+    `fragments` to reuse the sections that did not change since the last
+    export.
+    """
+    with _open_output(md_path) as out:
+        write_markdown(
+            xplit_log, out, locale, include_source=include_source, fragments=fragments
+        )
@@ -0,0 +1,196 @@
+"""Query indexes over the entries of an `XplitLog`
+
+`XplitIndex` is built once, in O(n log n), and answers range queries in
+O(log n) without scanning the entries:
+
+- every timed entry, sorted by `time`, with prefix sums of `expense`;
+- per person, posting lists of the entries they paid for and of the entries
+  they have a split in, each with prefix sums of the amounts;
+- per payment method, a posting list with prefix sums of `expense`;
+- per section title, the `(start, stop)` offsets into `entries`.
+
+Time ranges are half-open, `start <= time < end`. A `date` (rather than a
+`datetime`) as `end` includes that whole day. Entries without a `time` have
+no place on the time line: they are left out of any query with a `start` or
+an `end`, and counted by unbounded ones, so that e.g. `spent(person)` equals
+`compute_stats(xplit_log)["total_expenses"][person]` up to rounding.
+
+Usually obtained through `XplitLog.index()`::
+
+    index = xplit_log.index()
+    index.spent("Lynnex", date(2024, 6, 2), date(2024, 6, 5))
+    index.total(date(2024, 6, 3), date(2024, 6, 3), payment_method="💵现金")
+"""
+from bisect import bisect_left
+from datetime import date, datetime, timedelta
+from itertools import accumulate
+from typing import Dict, List, Optional, Tuple, Union
+
+from . import XplitEntry
+
+TimeBound = Union[datetime, date, None]
+
+
+def _start(bound: TimeBound) -> Optional[datetime]:
+    if bound is None or isinstance(bound, datetime):
+        return bound
+    return datetime(bound.year, bound.month, bound.day)
+
+
+def _end(bound: TimeBound) -> Optional[datetime]:
+    if bound is None or isinstance(bound, datetime):
+        return bound
+    return datetime(bound.year, bound.month, bound.day) + timedelta(days=1)
+
+
+class _Posting:
+    """Time-sorted entry ids with prefix sums of one amount per entry."""
+
+    __slots__ = ("ids", "times", "prefix", "untimed", "untimed_total")
+
+    def __init__(self):
+        self.ids: List[int] = []
+        self.times: List[datetime] = []
+        self.prefix: List[float] = [0.0]
+        self.untimed: List[int] = []
+        self.untimed_total = 0.0
+
+    def add(self, entry_id: int, time: Optional[datetime], amount: float) -> None:
+        """Entries must be added in time order, untimed ones in any order."""
+        if time is None:
+            self.untimed.append(entry_id)
+            self.untimed_total += amount
+        else:
+            self.ids.append(entry_id)
+            self.times.append(time)
+            self.prefix.append(self.prefix[-1] + amount)
+
+    def bounds(self, start: TimeBound, end: TimeBound) -> Tuple[int, int]:
+        start, end = _start(start), _end(end)
+        lo = bisect_left(self.times, start) if start is not None else 0
+        hi = bisect_left(self.times, end) if end is not None else len(self.times)
+        return lo, max(lo, hi)
+
+    def sum(self, start: TimeBound, end: TimeBound) -> float:
+        lo, hi = self.bounds(start, end)
+        total = self.prefix[hi] - self.prefix[lo]
+        if start is None and end is None:
+            total += self.untimed_total
+        return total
+
+    def select(self, start: TimeBound, end: TimeBound) -> List[int]:
+        lo, hi = self.bounds(start, end)
+        if start is None and end is None:
+            return self.ids + self.untimed
+        return self.ids[lo:hi]
+
+
+class XplitIndex:
+    """Indexes over `entries`. See the module docstring."""
+
+    def __init__(self, entries: List[XplitEntry]):
+        self.entries = entries
+        self.size = len(entries)
+        # Stable sort: entries at the same minute keep their file order
+        order = sorted(
+            (idx for idx, entry in enumerate(entries) if entry.time is not None),
+            key=lambda idx: entries[idx].time,
+        )
+        order.extend(idx for idx, entry in enumerate(entries) if entry.time is None)
+
+        self.by_time = _Posting()
+        self.paid_by: Dict[str, _Posting] = {}
+        self.splits: Dict[str, _Posting] = {}
+        self.payment_methods: Dict[str, _Posting] = {}
+        for idx in order:
+            entry = entries[idx]
+            self.by_time.add(idx, entry.time, entry.expense)
+            for postings, key, amount in (
+                (self.paid_by, entry.paid_by, entry.expense),
+                (self.payment_methods, entry.payment_method, entry.expense),
+            ):
+                posting = postings.get(key)
+                if posting is None:
+                    posting = postings[key] = _Posting()
+                posting.add(idx, entry.time, amount)
+            for person, amount in entry.splits.items():
+                posting = self.splits.get(person)
+                if posting is None:
+                    posting = self.splits[person] = _Posting()
+                posting.add(idx, entry.time, amount)
+
+        # Prefix sums in file order, for section totals
+        self.file_prefix = [0.0]
+        self.file_prefix.extend(accumulate(entry.expense for entry in entries))
+        self.sections: Dict[Optional[str], List[Tuple[int, int]]] = {}
+        start = 0
+        for idx in range(1, len(entries) + 1):
+            if (
+                idx == len(entries)
+                or entries[idx].section_title != entries[start].section_title
+            ):
+                title = entries[start].section_title
+                self.sections.setdefault(title, []).append((start, idx))
+                start = idx
+
+    def _select(self, posting: Optional[_Posting], start, end) -> List[XplitEntry]:
+        if posting is None:
+            return []
+        return [self.entries[idx] for idx in posting.select(start, end)]
+
+    def entries_between(
+        self, start: TimeBound = None, end: TimeBound = None
+    ) -> List[XplitEntry]:
+        """Entries in the time range, in time order."""
+        return self._select(self.by_time, start, end)
+
+    def entries_paid_by(
+        self, person: str, start: TimeBound = None, end: TimeBound = None
+    ) -> List[XplitEntry]:
+        return self._select(self.paid_by.get(person), start, end)
+
+    def entries_involving(
+        self, person: str, start: TimeBound = None, end: TimeBound = None
+    ) -> List[XplitEntry]:
+        """Entries in which `person` has a split."""
+        return self._select(self.splits.get(person), start, end)
+
+    def total(
+        self,
+        start: TimeBound = None,
+        end: TimeBound = None,
+        payment_method: Optional[str] = None,
+    ) -> float:
+        """Sum of `expense` in the range, optionally for one payment method."""
+        if payment_method is None:
+            return self.by_time.sum(start, end)
+        posting = self.payment_methods.get(payment_method)
+        return posting.sum(start, end) if posting is not None else 0.0
+
+    def paid(
+        self, person: str, start: TimeBound = None, end: TimeBound = None
+    ) -> float:
+        """How much `person` paid in the range."""
+        posting = self.paid_by.get(person)
+        return posting.sum(start, end) if posting is not None else 0.0
+
+    def spent(
+        self, person: str, start: TimeBound = None, end: TimeBound = None
+    ) -> float:
+        """The sum of `person`'s splits in the range, i.e. their own expense."""
+        posting = self.splits.get(person)
+        return posting.sum(start, end) if posting is not None else 0.0
+
+    def section(self, title: Optional[str]) -> List[XplitEntry]:
+        """Entries of the section(s) titled `title`, in file order."""
+        return [
+            entry
+            for start, stop in self.sections.get(title, ())
+            for entry in self.entries[start:stop]
+        ]
+
+    def section_total(self, title: Optional[str]) -> float:
+        return sum(
+            self.file_prefix[stop] - self.file_prefix[start]
+            for start, stop in self.sections.get(title, ())
+        )
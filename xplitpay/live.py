@@ -0,0 +1,194 @@
+"""Live ledger with incrementally maintained statistics
+
+`LiveLedger` holds entries and extra payments that can be added, removed
+and updated at any time, and keeps the aggregates of
+`xplitpay.export.compute_stats` current as it goes: every change costs
+O(number of splits) instead of a pass over the whole ledger.
+
+All methods take one lock, so a ledger can be shared between threads;
+`snapshot` copies the aggregates under that lock, so a reader never sees a
+half-applied change. As in `xplitpay.incremental`, a person is dropped from
+the aggregates once nothing refers to them any more, which also resets the
+rounding error that repeated additions and subtractions accumulate.
+
+Entries are stored as given, not copied: replace an entry with
+`update_entry` rather than editing it in place.
+"""
+import threading
+from collections import Counter
+from dataclasses import dataclass, field
+from itertools import count
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from . import XplitEntry, XplitLog
+
+
+@dataclass(frozen=True)
+class LedgerSnapshot:
+    version: int
+    n_entries: int
+    stats: dict = field(repr=False)
+
+
+class _Totals:
+    """Per-person sums that forget people whose last contribution is gone."""
+
+    def __init__(self):
+        self.amounts: Dict[str, float] = {}
+        self.refs = Counter()
+
+    def add(self, person: str, amount: float, sign: int) -> None:
+        self.refs[person] += sign
+        if self.refs[person]:
+            self.amounts[person] = self.amounts.get(person, 0) + sign * amount
+        else:
+            del self.refs[person]
+            del self.amounts[person]
+
+
+class LiveLedger:
+    """Mutable ledger with always-current stats. See the module docstring.
+
+    Usage::
+
+        ledger = LiveLedger(parse_xplit("trip.xplit"))
+        entry_id = ledger.add_entry(entry)
+        ledger.update_entry(entry_id, corrected_entry)
+        ledger.snapshot().stats["balance"]
+    """
+
+    def __init__(self, xplit_log: Optional[XplitLog] = None):
+        self._lock = threading.RLock()
+        self._ids = count()
+        self._entries: Dict[int, XplitEntry] = {}
+        self._extra_payments: Dict[int, Tuple[str, str, float]] = {}
+        self._total = 0.0
+        self._paid = _Totals()
+        self._expenses = _Totals()
+        self._extra = _Totals()
+        self._balance: Dict[str, float] = {}
+        self.version = 0
+        if xplit_log is not None:
+            self.add_entries(xplit_log.entries)
+            for payment in xplit_log.extra_payments:
+                self.add_extra_payment(*payment)
+
+    def _update_balance(self, people: Iterable[str]) -> None:
+        paid, expenses, extra = (
+            self._paid.amounts,
+            self._expenses.amounts,
+            self._extra.amounts,
+        )
+        for person in people:
+            if person in expenses or person in extra:
+                self._balance[person] = (
+                    paid.get(person, 0) - expenses.get(person, 0) + extra.get(person, 0)
+                )
+            else:
+                self._balance.pop(person, None)
+
+    def _apply_entry(self, entry: XplitEntry, sign: int) -> None:
+        self._total += sign * entry.expense
+        self._paid.add(entry.paid_by, entry.expense, sign)
+        for person, amount in entry.splits.items():
+            self._expenses.add(person, amount, sign)
+        self._update_balance((entry.paid_by, *entry.splits))
+
+    def _apply_extra_payment(self, payment: Tuple[str, str, float], sign: int) -> None:
+        payer, receiver, amount = payment
+        self._extra.add(payer, amount, sign)
+        self._extra.add(receiver, -amount, sign)
+        self._update_balance((payer, receiver))
+
+    def add_entry(self, entry: XplitEntry) -> int:
+        """Add `entry`; returns its id."""
+        with self._lock:
+            entry_id = next(self._ids)
+            self._entries[entry_id] = entry
+            self._apply_entry(entry, 1)
+            self.version += 1
+            return entry_id
+
+    def add_entries(self, entries: Iterable[XplitEntry]) -> List[int]:
+        """Add many entries as one change."""
+        with self._lock:
+            ids = []
+            for entry in entries:
+                entry_id = next(self._ids)
+                self._entries[entry_id] = entry
+                self._apply_entry(entry, 1)
+                ids.append(entry_id)
+            self.version += 1
+            return ids
+
+    def remove_entry(self, entry_id: int) -> XplitEntry:
+        with self._lock:
+            entry = self._entries.pop(entry_id)
+            self._apply_entry(entry, -1)
+            if not self._entries:
+                self._total = 0.0
+            self.version += 1
+            return entry
+
+    def update_entry(self, entry_id: int, entry: XplitEntry) -> None:
+        with self._lock:
+            self._apply_entry(self._entries[entry_id], -1)
+            self._entries[entry_id] = entry
+            self._apply_entry(entry, 1)
+            self.version += 1
+
+    def add_extra_payment(self, payer: str, receiver: str, amount: float) -> int:
+        """Add a transfer of `amount` from `payer` to `receiver`; returns its id."""
+        with self._lock:
+            payment_id = next(self._ids)
+            self._extra_payments[payment_id] = (payer, receiver, amount)
+            self._apply_extra_payment((payer, receiver, amount), 1)
+            self.version += 1
+            return payment_id
+
+    def remove_extra_payment(self, payment_id: int) -> Tuple[str, str, float]:
+        with self._lock:
+            payment = self._extra_payments.pop(payment_id)
+            self._apply_extra_payment(payment, -1)
+            self.version += 1
+            return payment
+
+    def update_extra_payment(
+        self, payment_id: int, payer: str, receiver: str, amount: float
+    ) -> None:
+        with self._lock:
+            self._apply_extra_payment(self._extra_payments[payment_id], -1)
+            self._extra_payments[payment_id] = (payer, receiver, amount)
+            self._apply_extra_payment((payer, receiver, amount), 1)
+            self.version += 1
+
+    def entry(self, entry_id: int) -> XplitEntry:
+        with self._lock:
+            return self._entries[entry_id]
+
+    def entries(self) -> Dict[int, XplitEntry]:
+        """A copy of the entries by id, in insertion order."""
+        with self._lock:
+            return dict(self._entries)
+
+    def extra_payments(self) -> Dict[int, Tuple[str, str, float]]:
+        with self._lock:
+            return dict(self._extra_payments)
+
+    def snapshot(self) -> LedgerSnapshot:
+        """Consistent copy of the stats, shaped like `compute_stats`."""
+        with self._lock:
+            return LedgerSnapshot(
+                self.version,
+                len(self._entries),
+                {
+                    "total": self._total,
+                    "total_expenses": dict(self._expenses.amounts),
+                    "total_paid": dict(self._paid.amounts),
+                    "balance": dict(self._balance),
+                },
+            )
+
+    @property
+    def stats(self) -> dict:
+        return self.snapshot().stats
@@ -0,0 +1,254 @@
+"""Integer money: amounts as minor units
+
+`to_money` turns an `XplitLog` into `MoneyColumns`, where every amount is an
+integer number of minor units (cents with the default `scale` of 100), so
+that totals and balances are exact integer sums and `reconcile` can check
+that the books balance to the unit.
+
+Rounding rules, applied once per amount when the columns are built:
+
+- an amount is scaled, rounded to 6 decimal places to drop binary noise,
+  then rounded half to even: 2.675 becomes 268 cents, 0.125 becomes 12;
+- the splits of an entry are rounded down, and the units left over go one
+  each to the largest fractional parts, ties going to the person listed
+  first. An even three-way split of 100.00 is thus 33.34, 33.33 and 33.33;
+- splits are made to sum to the rounded expense, unless the float splits
+  already missed it by half a unit or more (e.g. ratios that do not add up
+  to 1), in which case they sum to their own rounded total and `reconcile`
+  reports the entry.
+
+Columns use NumPy when it is installed, the standard `array` module
+otherwise, like `xplitpay.columnar`. Splits are stored sparsely, one row per
+`(entry, person)`, as most entries involve a few of the people.
+"""
+from array import array
+from dataclasses import dataclass, field
+from math import floor
+from typing import Dict, List, Sequence, Tuple
+
+from . import XplitLog
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - depends on the environment
+    np = None
+
+DEFAULT_SCALE = 100
+
+
+def to_minor(amount: float, scale: int = DEFAULT_SCALE) -> int:
+    """`amount` in minor units, rounded half to even."""
+    return round(round(amount * scale, 6))
+
+
+def allocate(
+    total: int, amounts: Sequence[float], scale: int = DEFAULT_SCALE
+) -> List[int]:
+    """Round `amounts` to minor units so that they sum to `total` exactly.
+
+    See the module docstring for the rules; `total` is ignored when the
+    amounts miss it by half a unit or more.
+    """
+    scaled = [round(amount * scale, 6) for amount in amounts]
+    units = list(map(floor, scaled))
+    exact = sum(scaled)
+    if abs(exact - total) >= 0.5:
+        total = round(round(exact, 6))
+    left = total - sum(units)
+    if left == len(units):
+        return [unit + 1 for unit in units]
+    if left:
+        order = sorted(range(len(units)), key=lambda i: (units[i] - scaled[i], i))
+        for i in order[:left]:
+            units[i] += 1
+    return units
+
+
+@dataclass
+class Reconciliation:
+    """Outcome of `MoneyColumns.reconcile`, in minor units."""
+
+    imbalance: int
+    unbalanced_entries: List[Tuple[int, int]] = field(default_factory=list)
+
+    @property
+    def ok(self) -> bool:
+        return self.imbalance == 0 and not self.unbalanced_entries
+
+
+@dataclass
+class MoneyColumns:
+    scale: int
+    people: List[str]
+    expense: "array"
+    payer: "array"
+    split_entry: "array"
+    split_person: "array"
+    split_amount: "array"
+    expense_order: List[int] = field(default_factory=list)
+    paid_order: List[int] = field(default_factory=list)
+    extra_payments: List[Tuple[int, int, int]] = field(default_factory=list)
+
+    def __len__(self) -> int:
+        return len(self.expense)
+
+    def _sum_by(self, ids, amounts) -> List[int]:
+        n_people = len(self.people)
+        if np is not None:
+            totals = np.zeros(n_people, dtype=np.int64)
+            np.add.at(totals, ids, amounts)
+            return totals.tolist()
+        totals = [0] * n_people
+        for idx, amount in zip(ids, amounts):
+            totals[idx] += amount
+        return totals
+
+    def total_expenses(self) -> List[int]:
+        """Per-person sum of splits, indexed by person id."""
+        return self._sum_by(self.split_person, self.split_amount)
+
+    def total_paid(self) -> List[int]:
+        """Per-person sum of paid expenses, indexed by person id."""
+        return self._sum_by(self.payer, self.expense)
+
+    def balance_minor(self) -> Dict[str, int]:
+        """Balances in minor units, in the order of `compute_stats`."""
+        total_expenses = self.total_expenses()
+        total_paid = self.total_paid()
+        balance = {
+            self.people[idx]: total_paid[idx] - total_expenses[idx]
+            for idx in self.expense_order
+        }
+        for payer, receiver, amount in self.extra_payments:
+            for idx in (payer, receiver):
+                balance.setdefault(self.people[idx], 0)
+            balance[self.people[payer]] += amount
+            balance[self.people[receiver]] -= amount
+        return balance
+
+    def compute_stats(self, minor_units: bool = False) -> dict:
+        """Same shape as `xplitpay.export.compute_stats`, exactly computed.
+
+        Amounts are converted back to main currency units unless
+        `minor_units` is set.
+        """
+        total_expenses = self.total_expenses()
+        total_paid = self.total_paid()
+        total = int(self.expense.sum()) if np is not None else sum(self.expense)
+        stats = {
+            "total": total,
+            "total_expenses": {
+                self.people[idx]: total_expenses[idx] for idx in self.expense_order
+            },
+            "total_paid": {
+                self.people[idx]: total_paid[idx] for idx in self.paid_order
+            },
+            "balance": self.balance_minor(),
+        }
+        if minor_units:
+            return stats
+        scale = self.scale
+        stats["total"] /= scale
+        for key in ("total_expenses", "total_paid", "balance"):
+            stats[key] = {
+                person: amount / scale for person, amount in stats[key].items()
+            }
+        return stats
+
+    def reconcile(self) -> Reconciliation:
+        """Check that the balances sum to zero.
+
+        `unbalanced_entries` lists `(entry index, expense - splits)` for
+        every entry whose splits do not cover its expense.
+        """
+        if np is not None:
+            covered = np.zeros(len(self.expense), dtype=np.int64)
+            np.add.at(covered, self.split_entry, self.split_amount)
+            gaps = self.expense - covered
+            unbalanced = [(int(row), int(gaps[row])) for row in np.flatnonzero(gaps)]
+        else:
+            covered = [0] * len(self.expense)
+            for row, amount in zip(self.split_entry, self.split_amount):
+                covered[row] += amount
+            unbalanced = [
+                (row, expense - amount)
+                for row, (expense, amount) in enumerate(zip(self.expense, covered))
+                if expense != amount
+            ]
+        return Reconciliation(sum(self.balance_minor().values()), unbalanced)
+
+
+def to_money(xplit_log: XplitLog, scale: int = DEFAULT_SCALE) -> MoneyColumns:
+    """Build the integer money view of `xplit_log`. See the module docstring.
+
+    Person ids start with the people declared in `@people`, followed by any
+    other names met in the entries or extra payments.
+    """
+    people = list(xplit_log.people.values())
+    person_ids = {person: idx for idx, person in enumerate(people)}
+
+    def intern(name: str) -> int:
+        if name not in person_ids:
+            person_ids[name] = len(people)
+            people.append(name)
+        return person_ids[name]
+
+    expense = []
+    payer = []
+    split_entry = []
+    split_person = []
+    split_amount = []
+    expense_order = []
+    paid_order = []
+    seen_expense = set()
+    seen_paid = set()
+    for row, entry in enumerate(xplit_log.entries):
+        payer_id = intern(entry.paid_by)
+        expense_minor = to_minor(entry.expense, scale)
+        expense.append(expense_minor)
+        payer.append(payer_id)
+        if payer_id not in seen_paid:
+            seen_paid.add(payer_id)
+            paid_order.append(payer_id)
+        splits = entry.splits
+        ids = [intern(person) for person in splits]
+        split_entry.extend([row] * len(ids))
+        split_person.extend(ids)
+        split_amount.extend(allocate(expense_minor, splits.values(), scale))
+        for person_id in ids:
+            if person_id not in seen_expense:
+                seen_expense.add(person_id)
+                expense_order.append(person_id)
+    extra_payments = [
+        (intern(payer_name), intern(receiver), to_minor(amount, scale))
+        for payer_name, receiver, amount in xplit_log.extra_payments
+    ]
+
+    expense = array("q", expense)
+    payer = array("l", payer)
+    split_entry = array("l", split_entry)
+    split_person = array("l", split_person)
+    split_amount = array("q", split_amount)
+    if np is not None:
+        expense = np.frombuffer(expense, dtype=np.int64)
+        payer = np.frombuffer(payer, dtype=np.dtype(f"i{payer.itemsize}"))
+        split_entry = np.frombuffer(
+            split_entry, dtype=np.dtype(f"i{split_entry.itemsize}")
+        )
+        split_person = np.frombuffer(
+            split_person, dtype=np.dtype(f"i{split_person.itemsize}")
+        )
+        split_amount = np.frombuffer(split_amount, dtype=np.int64)
+
+    return MoneyColumns(
+        scale,
+        people,
+        expense,
+        payer,
+        split_entry,
+        split_person,
+        split_amount,
+        expense_order,
+        paid_order,
+        extra_payments,
+    )
@@ -0,0 +1,114 @@
+"""Exchange rates that change over time
+
+The rates of `@currencies` hold for the whole ledger unless an optional
+`@rates` block changes them from a given date on::
+
+    @currencies
+        C: CNY
+        J: JPY = 0.046
+    @rates
+        20240603 J = 0.047
+        20240610 J = 0.045
+
+An amount is converted at the rate of its entry's day: the day of `time`,
+or of the section date for entries without a time. Amounts with no date at
+all (undated sections before the first dated one, extra payments) use the
+`@currencies` rate. Only eight-digit dates are accepted, so that the rates
+never depend on today's date like four-digit section dates do.
+
+Rate changes are per day, so `RateTable.rate` caches one bisect result per
+`(currency, day)`; a ledger rarely has more than a few hundred of those.
+The parser converts each amount as it streams the entries, since the splits
+of an entry depend on its converted expense; with the cache, a conversion
+is one dictionary lookup and a multiplication. Rates are per day, not per
+section: a section's date already selects its rates.
+"""
+from bisect import bisect_right
+from datetime import date, datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+Dated = Optional[date]  # `datetime` is a subclass of `date`
+
+
+class RateTable:
+    """Rates to the main currency, looked up by currency and day."""
+
+    def __init__(
+        self,
+        main_currency: str,
+        base: Dict[str, float],
+        changes: Iterable[Tuple[str, date, float]] = (),
+    ):
+        self.main_currency = main_currency
+        self.base = dict(base)
+        self.changes: List[Tuple[str, date, float]] = sorted(
+            ((currency, _day(when), rate) for currency, when, rate in changes),
+            key=lambda change: (change[0], change[1]),
+        )
+        self._days: Dict[str, List[int]] = {}
+        self._rates: Dict[str, List[float]] = {}
+        for currency, day, rate in self.changes:
+            if currency not in self.base:
+                raise ValueError(f"Rate given for unknown currency: {currency}")
+            self._days.setdefault(currency, []).append(day.toordinal())
+            self._rates.setdefault(currency, [self.base[currency]]).append(rate)
+        self._cache: Dict[Tuple[str, int], float] = {}
+
+    @classmethod
+    def from_currencies(
+        cls,
+        currencies: Dict[str, object],
+        changes: Iterable[Tuple[str, date, float]] = (),
+    ) -> "RateTable":
+        """Build from an `XplitLog.currencies` dict (main currency first)."""
+        main_currency = next(iter(currencies))
+        base = {
+            symbol: value[1]
+            for symbol, value in currencies.items()
+            if symbol != main_currency
+        }
+        return cls(main_currency, base, changes)
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, RateTable):
+            return NotImplemented
+        return (self.main_currency, self.base, self.changes) == (
+            other.main_currency,
+            other.base,
+            other.changes,
+        )
+
+    def __repr__(self) -> str:
+        return f"RateTable({self.main_currency!r}, {self.base!r}, {self.changes!r})"
+
+    def rate(self, currency: str, when: Dated = None) -> float:
+        """Rate of `currency` on the day of `when` (`None`: the base rate)."""
+        if currency == self.main_currency:
+            return 1.0
+        days = self._days.get(currency)
+        if days is None or when is None:
+            return self.base[currency]
+        key = (currency, when.toordinal())
+        try:
+            return self._cache[key]
+        except KeyError:
+            rate = self._rates[currency][bisect_right(days, key[1])]
+            self._cache[key] = rate
+            return rate
+
+    def convert(self, amount: float, currency: str, when: Dated = None) -> float:
+        if currency == self.main_currency:
+            return amount
+        return amount * self.rate(currency, when)
+
+
+def _day(when: date) -> date:
+    return when.date() if isinstance(when, datetime) else when
+
+
+def parse_rate_line(line: str) -> Tuple[str, date, float]:
+    """Parse a `@rates` line such as `20240603 J = 0.047`."""
+    parts = line.replace("=", " ").split()
+    if len(parts) != 3 or len(parts[0]) != 8 or not parts[0].isdigit():
+        raise ValueError(f"Malformed rate line (expected `YYYYMMDD X = rate`): {line}")
+    return parts[1], datetime.strptime(parts[0], "%Y%m%d").date(), float(parts[2])
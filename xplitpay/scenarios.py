@@ -0,0 +1,173 @@
+"""What-if evaluation of a ledger under other options and rates
+
+`parse_xplit(..., keep_raw=True)` keeps what every entry line says before
+options and rates are applied: its amount and currency, split spec, time
+string and section date. `evaluate` recomputes the expenses, splits and
+stats of any number of scenarios from that raw form, in one pass over the
+entries and without reading or matching the file again::
+
+    xplit_log = parse_xplit("trip.xplit", keep_raw=True, SUPPORT_48_HOURS=True)
+    results = evaluate(
+        xplit_log,
+        [
+            Scenario("as parsed", {"SUPPORT_48_HOURS": True}),
+            Scenario("everyone", {"SUPPORT_48_HOURS": True,
+                                  "ALWAYS_INVOLVE_EVERYONE": True}),
+            Scenario("cheap yen", {"SUPPORT_48_HOURS": True}, rates={"J": 0.044}),
+        ],
+    )
+    results["everyone"].stats["balance"]
+
+`Scenario.options` are the keyword options of `parse_xplit`. `rates`
+replaces the rate of a currency on every day, `@rates` changes included.
+A scenario evaluates exactly as parsing the edited file would, so its
+stats equal `compute_stats` of that parse. Scenarios that only differ by
+name are evaluated once.
+"""
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from . import SPLIT_PLAN_CACHE, XplitEntry, XplitLog, parse_time
+from .rates import RateTable
+
+
+@dataclass(frozen=True)
+class Scenario:
+    name: str
+    options: Dict[str, bool] = field(default_factory=dict)
+    rates: Dict[str, float] = field(default_factory=dict)
+
+    def _key(self) -> tuple:
+        return (
+            bool(self.options.get("ALWAYS_INVOLVE_EVERYONE", False)),
+            bool(self.options.get("SUPPORT_48_HOURS", False)),
+            tuple(sorted(self.rates.items())),
+        )
+
+
+@dataclass
+class ScenarioResult:
+    scenario: Scenario
+    stats: dict
+    entries: Optional[List[XplitEntry]] = field(default=None, repr=False)
+
+
+class _Evaluation:
+    """Running stats of one distinct scenario."""
+
+    def __init__(self, key: tuple, xplit_log: XplitLog, keep_entries: bool):
+        self.always_involve_everyone, self.support_48_hours, overrides = key
+        rates = xplit_log.rates or RateTable.from_currencies(xplit_log.currencies)
+        overrides = dict(overrides)
+        if rates.main_currency in overrides:
+            raise ValueError(f"Cannot change the main currency: {rates.main_currency}")
+        for currency in overrides:
+            if currency not in rates.base:
+                raise ValueError(f"Rate given for unknown currency: {currency}")
+        self.rates = RateTable(
+            rates.main_currency,
+            {**rates.base, **overrides},
+            [change for change in rates.changes if change[0] not in overrides],
+        )
+        self.total = 0.0
+        self.total_expenses: Dict[str, float] = {}
+        self.total_paid: Dict[str, float] = {}
+        self.entries: Optional[List[XplitEntry]] = [] if keep_entries else None
+
+    def stats(self, extra_payments: List[Tuple[str, str, float, str]]) -> dict:
+        total_paid = self.total_paid
+        balance = {
+            person: total_paid.get(person, 0) - amount
+            for person, amount in self.total_expenses.items()
+        }
+        convert = self.rates.convert
+        for payer, receiver, amount, currency in extra_payments:
+            amount = convert(amount, currency)
+            balance[payer] = balance.get(payer, 0) + amount
+            balance[receiver] = balance.get(receiver, 0) - amount
+        return {
+            "total": self.total,
+            "total_expenses": dict(self.total_expenses),
+            "total_paid": dict(total_paid),
+            "balance": balance,
+        }
+
+
+def evaluate(
+    xplit_log: XplitLog, scenarios: Iterable[Scenario], entries: bool = False
+) -> Dict[str, ScenarioResult]:
+    """Evaluate `scenarios` on `xplit_log`, which must have been parsed with
+    `keep_raw=True`. Returns the results by scenario name, with the
+    recomputed entries too if `entries` is set."""
+    raw = xplit_log.raw
+    if raw is None or len(raw.entries) != len(xplit_log.entries):
+        raise ValueError("Parse the ledger with keep_raw=True to evaluate scenarios")
+    scenarios = list(scenarios)
+    if len({scenario.name for scenario in scenarios}) != len(scenarios):
+        raise ValueError("Scenario names must be unique")
+
+    evaluations: Dict[tuple, _Evaluation] = {}
+    for scenario in scenarios:
+        key = scenario._key()
+        if key not in evaluations:
+            evaluations[key] = _Evaluation(key, xplit_log, entries)
+    evaluations_list = list(evaluations.values())
+    time_flags = {evaluation.support_48_hours for evaluation in evaluations_list}
+
+    people = xplit_log.people
+    currencies = xplit_log.currencies
+    main_currency = next(iter(currencies))
+    people_key = "\0".join(f"{abbr}:{name}" for abbr, name in people.items())
+    get_plan = SPLIT_PLAN_CACHE.get
+
+    for entry, raw_entry in zip(xplit_log.entries, raw.entries):
+        time_str, date, amount, currency, spec = raw_entry
+        times: Dict[bool, Optional[datetime]] = {
+            flag: parse_time(time_str, date, flag) if date else None
+            for flag in time_flags
+        }
+        paid_by = entry.paid_by
+        for evaluation in evaluations_list:
+            time = times[evaluation.support_48_hours]
+            when = time or date
+            rates = evaluation.rates
+            expense = rates.convert(amount, currency, when) if currency else 0.0
+            plan = get_plan(
+                spec,
+                people,
+                people_key,
+                main_currency,
+                evaluation.always_involve_everyone,
+            )
+            splits = plan.apply(expense, currencies, main_currency, rates, when)
+
+            evaluation.total += expense
+            total_paid = evaluation.total_paid
+            total_paid[paid_by] = total_paid.get(paid_by, 0) + expense
+            total_expenses = evaluation.total_expenses
+            for person, split in splits.items():
+                total_expenses[person] = total_expenses.get(person, 0) + split
+            if evaluation.entries is not None:
+                evaluation.entries.append(
+                    XplitEntry(
+                        entry.section_title,
+                        entry.title,
+                        entry.description,
+                        time,
+                        paid_by,
+                        entry.payment_method,
+                        expense,
+                        splits,
+                    )
+                )
+
+    results = {}
+    for scenario in scenarios:
+        evaluation = evaluations[scenario._key()]
+        results[scenario.name] = ScenarioResult(
+            scenario,
+            evaluation.stats(raw.extra_payments),
+            list(evaluation.entries) if evaluation.entries is not None else None,
+        )
+    return results
@@ -0,0 +1,360 @@
+"""Local HTTP API
+
+A small asyncio HTTP/1.1 server, standard library only, over the parsing,
+stats, settlement and Markdown functions::
+
+    POST /ledgers                         body: xplit source
+    POST /ledgers?path=trip.xplit         read a file under `root` instead
+    GET  /ledgers/<id>                    header fields
+    GET  /ledgers/<id>/entries
+    GET  /ledgers/<id>/stats
+    GET  /ledgers/<id>/settlement?mode=exact
+    GET  /ledgers/<id>/markdown?locale=en&source=0
+
+Parse options are query parameters of the POST (`always_involve_everyone=1`,
+`support_48_hours=1`). The ledger id is `xplitpay.cache.cache_key` of the
+source and options, so posting an unchanged file is a dictionary lookup and
+every GET response depends on its URL only. The ETag is therefore derived
+from the URL, and a matching `If-None-Match` on a known ledger is answered
+with 304 without rendering anything. Query parameters that a view does not
+use are ignored, so they neither change the ETag nor add cached responses.
+
+Parsed ledgers, and the responses rendered from them, are kept in an LRU of
+`max_ledgers` entries. Parsing and rendering run in `executor` (the event
+loop's default thread pool unless given), so a large ledger does not stall
+the other connections. Concurrent posts of the same source share one parse.
+
+Run it with ``xplitpay serve --port 8731 --root ~/trips``.
+"""
+import asyncio
+import hashlib
+import io
+import json
+from collections import OrderedDict
+from concurrent.futures import Executor
+from dataclasses import dataclass, field
+from functools import partial
+from http import HTTPStatus
+from pathlib import Path
+from typing import Callable, Dict, Optional, Tuple, Union
+from urllib.parse import parse_qsl, urlsplit
+
+from . import XPLIT_VERSION, XplitLog, logger, parse_xplit
+from .cache import cache_key
+from .export import compute_stats, entry_to_dict, to_dict, write_markdown
+from .settle import settle
+
+JSON_TYPE = "application/json; charset=utf-8"
+MARKDOWN_TYPE = "text/markdown; charset=utf-8"
+PARSE_FLAGS = {
+    "always_involve_everyone": "ALWAYS_INVOLVE_EVERYONE",
+    "support_48_hours": "SUPPORT_48_HOURS",
+}
+
+
+class HTTPError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+@dataclass
+class Response:
+    status: int
+    body: bytes = b""
+    content_type: str = JSON_TYPE
+    headers: Dict[str, str] = field(default_factory=dict)
+
+
+@dataclass
+class _Ledger:
+    xplit_log: XplitLog
+    responses: Dict[Tuple, Response] = field(default_factory=dict)
+
+
+def _json(obj) -> bytes:
+    return json.dumps(obj, ensure_ascii=False).encode("utf-8")
+
+
+def _is_true(value: str) -> bool:
+    return value.lower() in ("1", "true", "yes", "on")
+
+
+def _parse_source(source: bytes, kwargs: dict) -> XplitLog:
+    return parse_xplit(io.StringIO(source.decode("utf-8")), **kwargs)
+
+
+def _render_header(xplit_log: XplitLog, params: dict) -> Tuple[bytes, str]:
+    return _json(to_dict(xplit_log, include_entries=False)), JSON_TYPE
+
+
+def _render_entries(xplit_log: XplitLog, params: dict) -> Tuple[bytes, str]:
+    return _json([entry_to_dict(entry) for entry in xplit_log.entries]), JSON_TYPE
+
+
+def _render_stats(xplit_log: XplitLog, params: dict) -> Tuple[bytes, str]:
+    return _json(compute_stats(xplit_log)), JSON_TYPE
+
+
+def _render_settlement(xplit_log: XplitLog, params: dict) -> Tuple[bytes, str]:
+    settlement = settle(xplit_log, mode=params["mode"])
+    return _json(vars(settlement)), JSON_TYPE
+
+
+def _render_markdown(xplit_log: XplitLog, params: dict) -> Tuple[bytes, str]:
+    out = io.StringIO()
+    write_markdown(
+        xplit_log,
+        out,
+        params["locale"],
+        include_source=params["source"] == "1",
+    )
+    return out.getvalue().encode("utf-8"), MARKDOWN_TYPE
+
+
+VIEWS: Dict[str, Callable[[XplitLog, dict], Tuple[bytes, str]]] = {
+    "": _render_header,
+    "entries": _render_entries,
+    "stats": _render_stats,
+    "settlement": _render_settlement,
+    "markdown": _render_markdown,
+}
+
+# Query parameters of each view, with their defaults. Boolean flags are
+# normalized to "1" or "0".
+VIEW_PARAMS: Dict[str, Dict[str, Union[str, bool]]] = {
+    "settlement": {"mode": "greedy"},
+    "markdown": {"locale": "zh_CN", "source": True},
+}
+
+
+def _view_params(view: str, params: dict) -> Dict[str, str]:
+    """The parameters of `params` that `view` uses, defaults filled in."""
+    view_params = {}
+    for name, default in VIEW_PARAMS.get(view, {}).items():
+        if isinstance(default, bool):
+            value = _is_true(params[name]) if name in params else default
+            view_params[name] = "1" if value else "0"
+        else:
+            view_params[name] = params.get(name, default)
+    return view_params
+
+
+def _etag(path: str, params: dict) -> str:
+    digest = hashlib.sha256(f"{XPLIT_VERSION}\0{path}".encode("utf-8"))
+    for name, value in sorted(params.items()):
+        digest.update(f"\0{name}={value}".encode("utf-8"))
+    # Weak: Markdown reports embed their generation time
+    return f'W/"{digest.hexdigest()[:32]}"'
+
+
+def _etag_matches(etag: str, if_none_match: Optional[str]) -> bool:
+    if not if_none_match:
+        return False
+
+    def opaque(tag: str) -> str:  # Weak comparison, RFC 7232 section 2.3.2
+        return tag[2:] if tag.startswith("W/") else tag
+
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in candidates or any(opaque(tag) == opaque(etag) for tag in candidates)
+
+
+class XplitServer:
+    """The HTTP API. See the module docstring.
+
+    Usage::
+
+        server = XplitServer(root="trips")
+        srv = await server.start("127.0.0.1", 8731)
+        await srv.serve_forever()
+    """
+
+    def __init__(
+        self,
+        root: Union[Path, str, None] = None,
+        max_ledgers: int = 32,
+        max_body: int = 16 * 1024 * 1024,
+        executor: Optional[Executor] = None,
+    ):
+        self.root = Path(root).resolve() if root is not None else None
+        self.max_ledgers = max_ledgers
+        self.max_body = max_body
+        self.executor = executor
+        self.parses = 0
+        self._ledgers: "OrderedDict[str, _Ledger]" = OrderedDict()
+        self._pending: Dict[str, asyncio.Future] = {}
+
+    async def _run(self, func, *args):
+        loop = asyncio.get_event_loop()
+        return await loop.run_in_executor(self.executor, partial(func, *args))
+
+    async def _parse(self, key: str, source: bytes, kwargs: dict) -> _Ledger:
+        try:
+            self.parses += 1
+            xplit_log = await self._run(_parse_source, source, kwargs)
+        finally:
+            del self._pending[key]
+        ledger = self._ledgers[key] = _Ledger(xplit_log)
+        while len(self._ledgers) > self.max_ledgers:
+            self._ledgers.popitem(last=False)
+        return ledger
+
+    async def add_ledger(self, source: bytes, **kwargs) -> Tuple[str, _Ledger, bool]:
+        """Parse `source` unless already known; returns `(id, ledger, new)`."""
+        key = cache_key(source, **kwargs)
+        ledger = self._ledgers.get(key)
+        if ledger is not None:
+            self._ledgers.move_to_end(key)
+            return key, ledger, False
+        if key not in self._pending:
+            self._pending[key] = asyncio.ensure_future(self._parse(key, source, kwargs))
+        # Shielded so that one client hanging up does not cancel the parse
+        # the other clients are waiting for
+        return key, await asyncio.shield(self._pending[key]), True
+
+    async def _post_ledger(self, params: dict, body: bytes) -> Response:
+        kwargs = {
+            option: _is_true(params.get(flag, "0"))
+            for flag, option in PARSE_FLAGS.items()
+        }
+        if "path" in params:
+            if self.root is None:
+                raise HTTPError(403, "Reading files is disabled (no root directory)")
+            path = (self.root / params["path"]).resolve()
+            try:
+                path.relative_to(self.root)
+            except ValueError:
+                raise HTTPError(403, "Path is outside of the root directory")
+            try:
+                body = await self._run(path.read_bytes)
+            except (FileNotFoundError, IsADirectoryError):
+                raise HTTPError(404, f"No such file: {params['path']}")
+        try:
+            key, ledger, new = await self.add_ledger(body, **kwargs)
+        except Exception as e:
+            raise HTTPError(400, f"Failed to parse ledger: {type(e).__name__}: {e}")
+        data = to_dict(ledger.xplit_log, include_entries=False)
+        data["id"] = key
+        return Response(
+            201 if new else 200, _json(data), headers={"Location": f"/ledgers/{key}"}
+        )
+
+    async def _get_view(
+        self, key: str, view: str, params: dict, headers: Dict[str, str]
+    ) -> Response:
+        ledger = self._ledgers.get(key)
+        if ledger is None:
+            raise HTTPError(404, "Unknown ledger, POST it to /ledgers first")
+        self._ledgers.move_to_end(key)
+        params = _view_params(view, params)
+        etag = _etag(f"/ledgers/{key}/{view}", params)
+        if _etag_matches(etag, headers.get("if-none-match")):
+            return Response(304, headers={"ETag": etag})
+        response_key = (view, tuple(sorted(params.items())))
+        response = ledger.responses.get(response_key)
+        if response is None:
+            try:
+                body, content_type = await self._run(
+                    VIEWS[view], ledger.xplit_log, params
+                )
+            except ValueError as e:
+                raise HTTPError(400, str(e))
+            response = ledger.responses[response_key] = Response(
+                200, body, content_type, {"ETag": etag}
+            )
+        return response
+
+    async def handle(
+        self, method: str, target: str, headers: Dict[str, str], body: bytes
+    ) -> Response:
+        """Answer one request. `headers` must have lower-case names."""
+        url = urlsplit(target)
+        params = dict(parse_qsl(url.query))
+        parts = [part for part in url.path.split("/") if part]
+        try:
+            if parts == ["ledgers"]:
+                if method != "POST":
+                    raise HTTPError(405, "Use POST to add a ledger")
+                return await self._post_ledger(params, body)
+            if 2 <= len(parts) <= 3 and parts[0] == "ledgers":
+                view = parts[2] if len(parts) == 3 else ""
+                if view not in VIEWS:
+                    raise HTTPError(404, f"Unknown view: {view}")
+                if method not in ("GET", "HEAD"):
+                    raise HTTPError(405, "Use GET to read a ledger")
+                return await self._get_view(parts[1], view, params, headers)
+            raise HTTPError(404, f"Not found: {url.path}")
+        except HTTPError as e:
+            return Response(e.status, _json({"error": str(e)}))
+
+    async def _handle_client(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line.strip():
+                    break
+                method, target, version = request_line.decode("latin-1").split()
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if not line.strip():
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                length = int(headers.get("content-length", 0))
+                keep_alive = (
+                    version == "HTTP/1.1"
+                    and headers.get("connection", "").lower() != "close"
+                )
+                if length > self.max_body:
+                    response = Response(413, _json({"error": "Request too large"}))
+                    keep_alive = False
+                else:
+                    body = await reader.readexactly(length)
+                    response = await self.handle(method, target, headers, body)
+                writer.write(self._encode(response, keep_alive, method == "HEAD"))
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except ValueError:  # Malformed request line or Content-Length
+            writer.write(self._encode(Response(400), False, False))
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    @staticmethod
+    def _encode(response: Response, keep_alive: bool, head: bool) -> bytes:
+        status = HTTPStatus(response.status)
+        headers = dict(response.headers)
+        if response.status != 304:
+            headers["Content-Type"] = response.content_type
+            headers["Content-Length"] = str(len(response.body))
+        headers["Connection"] = "keep-alive" if keep_alive else "close"
+        lines = [f"HTTP/1.1 {status.value} {status.phrase}"]
+        lines.extend(f"{name}: {value}" for name, value in headers.items())
+        head_bytes = ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1")
+        if head or response.status == 304:
+            return head_bytes
+        return head_bytes + response.body
+
+    async def start(self, host: str = "127.0.0.1", port: int = 8731):
+        """Start listening; returns the `asyncio` server."""
+        return await asyncio.start_server(self._handle_client, host, port)
+
+
+def serve(host: str = "127.0.0.1", port: int = 8731, **kwargs) -> None:
+    """Run an `XplitServer` until interrupted."""
+
+    async def main():
+        server = await XplitServer(**kwargs).start(host, port)
+        logger.info("Serving xplitpay API on http://{}:{}", host, port)
+        async with server:
+            await server.serve_forever()
+
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        pass
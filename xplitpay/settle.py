@@ -0,0 +1,179 @@
+"""Settlement: who should pay whom
+
+Turns the balances of `xplitpay.export.compute_stats` (positive means the
+person should receive money) into a list of transfers. Two modes exist:
+
+- `greedy`: repeatedly matches the largest debtor with the largest creditor
+  using two heaps. O(n log n), never more than n - 1 transfers.
+- `exact`: finds the minimum number of transfers by splitting the group into
+  as many zero-sum subgroups as possible. Exponential in the number of
+  people, so it gives up after `time_budget` seconds (or when there are more
+  than `max_exact_people` people with a non-zero balance) and falls back to
+  the greedy result.
+
+Amounts are settled in cents, so every transfer is a multiple of 0.01.
+`xplitpay.money.MoneyColumns` are settled in their own minor units, without
+going through floats.
+"""
+import heapq
+import time
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Dict, List, Tuple, Union
+
+from . import XplitLog, logger
+from .export import compute_stats
+
+if TYPE_CHECKING:
+    from .columnar import XplitColumns
+    from .money import MoneyColumns
+
+SETTLE_MODES = ("greedy", "exact")
+_RESIDUAL = "\x00residual"
+
+
+@dataclass
+class Settlement:
+    transfers: List[Tuple[str, str, float]] = field(default_factory=list)
+    mode: str = "greedy"
+    exact: bool = False
+    elapsed: float = 0.0
+    residual: float = 0.0
+
+    @property
+    def n_transfers(self) -> int:
+        return len(self.transfers)
+
+
+def _to_cents(balance: Dict[str, float]) -> Dict[str, int]:
+    cents = {person: round(amount * 100) for person, amount in balance.items()}
+    return {person: amount for person, amount in cents.items() if amount}
+
+
+def _settle_greedy(cents: Dict[str, int]) -> List[Tuple[str, str, int]]:
+    # Max-heaps of (negated amount, person); ties are broken by name
+    creditors = [(-amount, person) for person, amount in cents.items() if amount > 0]
+    debtors = [(amount, person) for person, amount in cents.items() if amount < 0]
+    heapq.heapify(creditors)
+    heapq.heapify(debtors)
+    transfers = []
+    while creditors and debtors:
+        credit, creditor = heapq.heappop(creditors)
+        debt, debtor = heapq.heappop(debtors)
+        amount = min(-credit, -debt)
+        transfers.append((debtor, creditor, amount))
+        if -credit > amount:
+            heapq.heappush(creditors, (credit + amount, creditor))
+        if -debt > amount:
+            heapq.heappush(debtors, (debt + amount, debtor))
+    return transfers
+
+
+def _settle_exact(
+    cents: Dict[str, int], deadline: float
+) -> Union[List[Tuple[str, str, int]], None]:
+    people = sorted(cents)
+    amounts = [cents[person] for person in people]
+    residual = sum(amounts)
+    if residual:
+        # A phantom member absorbs the imbalance so that a zero-sum
+        # partition exists. Its transfers are dropped afterwards.
+        people.append(_RESIDUAL)
+        amounts.append(-residual)
+    n = len(people)
+    full = (1 << n) - 1
+
+    # groups[mask]: most zero-sum groups the members of `mask` can form
+    subset_sum = [0] * (full + 1)
+    groups = [0] * (full + 1)
+    for mask in range(1, full + 1):
+        if not mask & 0xFFF and time.perf_counter() > deadline:
+            return None
+        low = mask & -mask
+        subset_sum[mask] = subset_sum[mask ^ low] + amounts[low.bit_length() - 1]
+        best = 0
+        bits = mask
+        while bits:
+            bit = bits & -bits
+            bits ^= bit
+            if groups[mask ^ bit] > best:
+                best = groups[mask ^ bit]
+        groups[mask] = best + (subset_sum[mask] == 0)
+
+    # Peel members off in an order that keeps the optimum, so that every
+    # zero-sum prefix closes one group
+    order = []
+    mask = full
+    while mask:
+        target = groups[mask] - (subset_sum[mask] == 0)
+        bits = mask
+        while bits:
+            bit = bits & -bits
+            bits ^= bit
+            if groups[mask ^ bit] == target:
+                break
+        order.append(bit.bit_length() - 1)
+        mask ^= bit
+
+    transfers = []
+    group = {}
+    running = 0
+    for idx in reversed(order):
+        group[people[idx]] = amounts[idx]
+        running += amounts[idx]
+        if running == 0:
+            transfers.extend(
+                transfer
+                for transfer in _settle_greedy(group)
+                if _RESIDUAL not in transfer[:2]
+            )
+            group = {}
+    return transfers
+
+
+def settle(
+    stats: Union[XplitLog, "XplitColumns", "MoneyColumns", dict],
+    mode: str = "greedy",
+    time_budget: float = 1.0,
+    max_exact_people: int = 20,
+) -> Settlement:
+    """Compute the transfers that settle every balance.
+
+    `stats` is either a ledger, which is passed through `compute_stats`
+    first, or the result of `compute_stats` itself. Each transfer is a
+    `(payer, receiver, amount)` tuple, like `XplitLog.extra_payments`.
+    """
+    if mode not in SETTLE_MODES:
+        raise ValueError(f"Unknown settlement mode: {mode}")
+    start = time.perf_counter()
+    scale = getattr(stats, "scale", 100)
+    if hasattr(stats, "balance_minor"):
+        cents = {
+            person: amount for person, amount in stats.balance_minor().items() if amount
+        }
+    else:
+        if not isinstance(stats, dict):
+            stats = compute_stats(stats)
+        cents = _to_cents(stats["balance"])
+    settlement = Settlement(mode=mode, residual=sum(cents.values()) / scale)
+    transfers = None
+    if mode == "exact":
+        if len(cents) <= max_exact_people:
+            transfers = _settle_exact(cents, start + time_budget)
+        if transfers is None:
+            logger.warning(
+                f"Exact settlement of {len(cents)} people gave up, using greedy"
+            )
+        else:
+            settlement.exact = True
+    if transfers is None:
+        transfers = _settle_greedy(cents)
+
+    settlement.transfers = [
+        (payer, receiver, amount / scale) for payer, receiver, amount in transfers
+    ]
+    settlement.elapsed = time.perf_counter() - start
+    logger.debug(
+        f"Settled {len(cents)} people with {settlement.n_transfers} transfers "
+        f"in {settlement.elapsed:.6f}s ({mode})"
+    )
+    return settlement
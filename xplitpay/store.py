@@ -0,0 +1,279 @@
+"""SQLite archive of many ledgers
+
+`XplitStore` imports xplit files into a local SQLite database, streaming
+the entries into it so that no `XplitLog` is built, and answers the
+questions of `xplitpay.export.compute_stats` in SQL over any subset of the
+archive::
+
+    store = XplitStore("archive.sqlite")
+    store.import_paths(["trips/"], SUPPORT_48_HOURS=True)
+    store.compute_stats(start=date(2023, 1, 1), end=date(2023, 12, 31))
+
+Imports are idempotent: every ledger is identified by its resolved path,
+and stored with `xplitpay.cache.cache_key` of its content and parse
+options. Importing an unchanged file does nothing, and importing a changed
+one replaces the rows of its previous version. Copies of a file are
+separate ledgers. Entries, splits and extra payments are
+indexed by ledger, person, time, payment method and section.
+
+People are matched by full name across ledgers, as in `xplitpay.batch`.
+Time ranges follow `xplitpay.index`: half-open, a `date` as `end` includes
+that day, and untimed entries only count in unbounded queries.
+"""
+import sqlite3
+from datetime import datetime
+from itertools import islice
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+
+from . import _iter_entries, _open_xplit, _read_header, logger
+from .cache import cache_key
+from .index import TimeBound, _end, _start
+
+SCHEMA_VERSION = 1
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS ledgers (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    path TEXT NOT NULL UNIQUE,
+    content_hash TEXT NOT NULL,
+    title TEXT,
+    author TEXT,
+    currency_main TEXT,
+    imported_at TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS entries (
+    id INTEGER PRIMARY KEY,
+    ledger_id INTEGER NOT NULL REFERENCES ledgers(id) ON DELETE CASCADE,
+    section_title TEXT,
+    title TEXT,
+    description TEXT,
+    time TEXT,
+    paid_by TEXT NOT NULL,
+    payment_method TEXT,
+    expense REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS splits (
+    entry_id INTEGER NOT NULL REFERENCES entries(id) ON DELETE CASCADE,
+    person TEXT NOT NULL,
+    amount REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS extra_payments (
+    ledger_id INTEGER NOT NULL REFERENCES ledgers(id) ON DELETE CASCADE,
+    payer TEXT NOT NULL,
+    receiver TEXT NOT NULL,
+    amount REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS entries_ledger ON entries(ledger_id);
+CREATE INDEX IF NOT EXISTS entries_time ON entries(time);
+CREATE INDEX IF NOT EXISTS entries_paid_by ON entries(paid_by, time);
+CREATE INDEX IF NOT EXISTS entries_payment_method ON entries(payment_method, time);
+CREATE INDEX IF NOT EXISTS entries_section ON entries(section_title);
+CREATE INDEX IF NOT EXISTS splits_entry ON splits(entry_id);
+CREATE INDEX IF NOT EXISTS splits_person ON splits(person);
+CREATE INDEX IF NOT EXISTS extra_payments_ledger ON extra_payments(ledger_id);
+"""
+_BATCH_SIZE = 1000
+
+
+class XplitStore:
+    """SQLite-backed ledger archive. See the module docstring."""
+
+    def __init__(self, path: Union[Path, str] = ":memory:"):
+        self.connection = sqlite3.connect(str(path))
+        self.connection.execute("PRAGMA foreign_keys = ON")
+        version = self.connection.execute("PRAGMA user_version").fetchone()[0]
+        if version not in (0, SCHEMA_VERSION):
+            raise ValueError(f"Unsupported store schema version: {version}")
+        with self.connection:
+            self.connection.executescript(_SCHEMA)
+            self.connection.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+    def close(self) -> None:
+        self.connection.close()
+
+    def __enter__(self) -> "XplitStore":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def import_file(self, path: Union[Path, str], **kwargs) -> Tuple[int, bool]:
+        """Import one file; returns `(ledger id, whether anything changed)`."""
+        path = Path(path).resolve()
+        content_hash = cache_key(path.read_bytes(), **kwargs)
+        row = self.connection.execute(
+            "SELECT id, content_hash FROM ledgers WHERE path = ?", (str(path),)
+        ).fetchone()
+        if row is not None and row[1] == content_hash:
+            return row[0], False
+
+        with self.connection, _open_xplit(path) as f:
+            self.connection.execute("DELETE FROM ledgers WHERE path = ?", (str(path),))
+            header, lines = _read_header(f)
+            ledger_id = self.connection.execute(
+                "INSERT INTO ledgers (path, content_hash, title, author,"
+                " currency_main, imported_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (
+                    str(path),
+                    content_hash,
+                    header.title,
+                    header.author,
+                    header.currency_main,
+                    datetime.now().isoformat(timespec="seconds"),
+                ),
+            ).lastrowid
+            self.connection.executemany(
+                "INSERT INTO extra_payments VALUES (?, ?, ?, ?)",
+                ((ledger_id, *payment) for payment in header.extra_payments),
+            )
+            entries = _iter_entries(lines, header, **kwargs)
+            while True:
+                batch = list(islice(entries, _BATCH_SIZE))
+                if not batch:
+                    break
+                self._insert_entries(ledger_id, batch)
+        logger.debug("Imported {} as ledger {}", path, ledger_id)
+        return ledger_id, True
+
+    def _insert_entries(self, ledger_id: int, entries) -> None:
+        cursor = self.connection.cursor()
+        splits = []
+        for entry in entries:
+            entry_id = cursor.execute(
+                "INSERT INTO entries (ledger_id, section_title, title, description,"
+                " time, paid_by, payment_method, expense)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    ledger_id,
+                    entry.section_title,
+                    entry.title,
+                    entry.description,
+                    entry.time.isoformat() if entry.time is not None else None,
+                    entry.paid_by,
+                    entry.payment_method,
+                    entry.expense,
+                ),
+            ).lastrowid
+            splits.extend(
+                (entry_id, person, amount) for person, amount in entry.splits.items()
+            )
+        cursor.executemany("INSERT INTO splits VALUES (?, ?, ?)", splits)
+
+    def import_paths(
+        self, patterns: Iterable[Union[Path, str]], **kwargs
+    ) -> Dict[str, Optional[str]]:
+        """Import files, directories and globs, as `xplitpay.batch` expands
+        them. Returns, by path, `None` or the error that skipped the file."""
+        from .batch import find_ledgers
+
+        results = {}
+        for path in find_ledgers(patterns):
+            try:
+                self.import_file(path, **kwargs)
+                results[str(path)] = None
+            except Exception as e:
+                logger.error(f"Failed to import {path}: {e}")
+                results[str(path)] = f"{type(e).__name__}: {e}"
+        return results
+
+    def remove(self, path: Union[Path, str]) -> None:
+        with self.connection:
+            self.connection.execute(
+                "DELETE FROM ledgers WHERE path = ?", (str(Path(path).resolve()),)
+            )
+
+    def ledgers(self) -> List[Tuple[int, str, str]]:
+        """`(id, resolved path, title)` of every imported ledger."""
+        return self.connection.execute(
+            "SELECT id, path, title FROM ledgers ORDER BY id"
+        ).fetchall()
+
+    def _where(
+        self,
+        ledger_ids: Optional[Iterable[int]],
+        start: TimeBound,
+        end: TimeBound,
+    ) -> Tuple[str, list]:
+        clauses, params = [], []
+        if ledger_ids is not None:
+            ledger_ids = list(ledger_ids)
+            clauses.append(f"e.ledger_id IN ({', '.join('?' * len(ledger_ids))})")
+            params.extend(ledger_ids)
+        if start is not None:
+            clauses.append("e.time >= ?")
+            params.append(_start(start).isoformat())
+        if end is not None:
+            clauses.append("e.time < ?")
+            params.append(_end(end).isoformat())
+        return (" WHERE " + " AND ".join(clauses) if clauses else ""), params
+
+    def compute_stats(
+        self,
+        ledger_ids: Optional[Iterable[int]] = None,
+        start: TimeBound = None,
+        end: TimeBound = None,
+    ) -> dict:
+        """`compute_stats` over the selected ledgers, computed in SQL.
+
+        Extra payments have no date, so they only count when neither
+        `start` nor `end` is given.
+        """
+        ledger_ids = list(ledger_ids) if ledger_ids is not None else None
+        where, params = self._where(ledger_ids, start, end)
+        execute = self.connection.execute
+        stats = {}
+        stats["total"] = execute(
+            f"SELECT TOTAL(e.expense) FROM entries e{where}", params
+        ).fetchone()[0]
+        stats["total_expenses"] = dict(
+            execute(
+                "SELECT s.person, TOTAL(s.amount) FROM splits s"
+                f" JOIN entries e ON e.id = s.entry_id{where}"
+                " GROUP BY s.person ORDER BY MIN(e.id)",
+                params,
+            ).fetchall()
+        )
+        stats["total_paid"] = dict(
+            execute(
+                f"SELECT e.paid_by, TOTAL(e.expense) FROM entries e{where}"
+                " GROUP BY e.paid_by ORDER BY MIN(e.id)",
+                params,
+            ).fetchall()
+        )
+        stats["balance"] = {
+            person: stats["total_paid"].get(person, 0) - amount
+            for person, amount in stats["total_expenses"].items()
+        }
+        if start is None and end is None:
+            extra_where = ""
+            if ledger_ids is not None:
+                placeholders = ", ".join("?" * len(ledger_ids))
+                extra_where = f" WHERE x.ledger_id IN ({placeholders})"
+            for payer, receiver, amount in execute(
+                "SELECT x.payer, x.receiver, x.amount FROM extra_payments x"
+                f"{extra_where} ORDER BY x.rowid",
+                ledger_ids or [],
+            ):
+                stats["balance"][payer] = stats["balance"].get(payer, 0) + amount
+                stats["balance"][receiver] = stats["balance"].get(receiver, 0) - amount
+        return stats
+
+    def totals_by(
+        self,
+        column: str,
+        ledger_ids: Optional[Iterable[int]] = None,
+        start: TimeBound = None,
+        end: TimeBound = None,
+    ) -> Dict[str, float]:
+        """Sum of `expense` grouped by `paid_by`, `payment_method` or
+        `section_title`."""
+        if column not in ("paid_by", "payment_method", "section_title"):
+            raise ValueError(f"Cannot group by {column}")
+        where, params = self._where(ledger_ids, start, end)
+        return dict(
+            self.connection.execute(
+                f"SELECT e.{column}, TOTAL(e.expense) FROM entries e{where}"
+                f" GROUP BY e.{column} ORDER BY MIN(e.id)",
+                params,
+            ).fetchall()
+        )
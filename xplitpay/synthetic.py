@@ -0,0 +1,181 @@
+"""Deterministic synthetic xplit files
+
+Generates `@xplit 0.0.3` ledgers of any size for tests and benchmarks. The
+same arguments and `seed` always produce the same file. Dated sections use
+eight-digit dates, so parsing does not depend on `guess_year` and today's
+date.
+"""
+import random
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Dict, Iterator, Optional, TextIO, Union
+
+from . import XPLIT_VERSION
+
+# Relative weights of the split spec shapes in generated entries
+DEFAULT_SPLIT_MIX = {
+    "half": 4,  # s(P0)0.5
+    "ratio": 1,  # s(P0)0.3
+    "self": 2,  # s(P0)1
+    "fixed_main": 1,  # s(P0)C12.5
+    "fixed_foreign": 2,  # s(P0)J790
+    "shared": 1,  # s(P0) s(P1) s(P2)
+    "none": 1,  # no split spec at all
+}
+FOREIGN_CURRENCIES = [
+    ("J", "JPY", 0.046),
+    ("U", "USD", 7.1),
+    ("E", "EUR", 7.7),
+    ("K", "KRW", 0.0052),
+    ("T", "THB", 0.2),
+]
+PAYMENT_METHODS = [
+    ("CASH", "💵现金"),
+    ("DEBIT", "💳借记卡/信用卡"),
+    ("WECHAT", "💭微信"),
+    ("ALIPAY", "🔷支付宝"),
+]
+WORDS = [
+    "LAWSON",
+    "FamilyMart",
+    "拉面",
+    "寿司",
+    "车票",
+    "门票",
+    "酒店",
+    "咖啡",
+    "便利店",
+    "Starbucks",
+    "晚餐",
+    "tram",
+    "museum",
+    "纪念品",
+]
+
+
+def iter_xplit_lines(
+    n_people: int = 4,
+    n_entries: int = 1000,
+    n_sections: Optional[int] = None,
+    n_currencies: int = 2,
+    split_mix: Optional[Dict[str, float]] = None,
+    undated_sections: float = 0.05,
+    seed: int = 0,
+) -> Iterator[str]:
+    """Yield the lines of a synthetic ledger, without trailing newlines.
+
+    `n_currencies` counts the main currency (CNY). `n_sections` defaults to
+    one section per 20 entries. `undated_sections` is the fraction of
+    sections without a date header. Entry times never exceed 23:59, so the
+    file parses with and without `SUPPORT_48_HOURS`.
+    """
+    if not 1 <= n_currencies <= len(FOREIGN_CURRENCIES) + 1:
+        raise ValueError(
+            f"n_currencies must be between 1 and {len(FOREIGN_CURRENCIES) + 1}"
+        )
+    rng = random.Random(seed)
+    split_mix = split_mix or DEFAULT_SPLIT_MIX
+    kinds = list(split_mix)
+    weights = [split_mix[kind] for kind in kinds]
+    people = [f"P{idx}" for idx in range(n_people)]
+    rates = {"C": 1.0}
+    rates.update(
+        (symbol, rate) for symbol, _, rate in FOREIGN_CURRENCIES[: n_currencies - 1]
+    )
+    currencies = list(rates)
+    n_sections = n_sections or max(1, n_entries // 20)
+
+    yield f"@xplit {XPLIT_VERSION}"
+    yield f"@title Synthetic ledger #{seed}"
+    yield "@author xplitpay.synthetic"
+    yield "@people"
+    for person in people:
+        yield f"    {person}: Person {person[1:]}"
+    yield "@currencies"
+    yield "    C: CNY"
+    for symbol, name, rate in FOREIGN_CURRENCIES[: n_currencies - 1]:
+        yield f"    {symbol}: {name} = {rate}"
+    yield "@payment_methods"
+    for code, name in PAYMENT_METHODS:
+        yield f"    {code}: {name}"
+    yield "@description"
+    yield f"    {n_entries} entries, {n_people} people, {n_sections} sections"
+    yield "@extra_payments"
+    for _ in range(min(3, n_people)):
+        payer, receiver = rng.sample(people, 2) if n_people > 1 else people * 2
+        yield f"    {payer} -> {receiver}: C{rng.randint(1, 500)}"
+    yield ""
+
+    day = date(2024, 1, 1)
+    entry_idx = 0
+    for section_idx in range(n_sections):
+        if section_idx and rng.random() < undated_sections:
+            yield f"@ 杂项 {section_idx}"
+        else:
+            yield f"@ {day.strftime('%Y%m%d')} Day {section_idx}"
+            day += timedelta(days=1)
+        # Spread the entries evenly over the sections
+        section_end = (section_idx + 1) * n_entries // n_sections
+        while entry_idx < section_end:
+            yield _entry_line(rng, entry_idx, people, rates, kinds, weights)
+            entry_idx += 1
+        yield ""
+
+
+def _entry_line(rng, entry_idx, people, rates, kinds, weights) -> str:
+    title = rng.choice(WORDS)
+    description = f"{rng.choice(WORDS)} {entry_idx}"
+    time_str = (
+        "-"
+        if rng.random() < 0.1
+        else f"{rng.randint(0, 23):02d}{rng.randint(0, 59):02d}"
+    )
+    payer = rng.choice(people)
+    method = rng.choice(PAYMENT_METHODS)[0]
+    currencies = list(rates)
+    currency = rng.choice(currencies)
+    # Drawn in CNY, so that every currency spans the same range of expenses.
+    # Shares are then at least 2 CNY (ratios of at least 0.1 included) and
+    # fixed shares at most half of the expense, so splits never overspend.
+    expense = rng.randint(20, 3000)
+    amount = max(1, round(expense / rates[currency]))
+    expense = amount * rates[currency]
+    kind = rng.choices(kinds, weights)[0]
+    person = rng.choice(people)
+    if kind == "half":
+        spec = f" s({person})0.5"
+    elif kind == "ratio":
+        spec = f" s({person})0.{rng.randint(1, 9)}"
+    elif kind == "self":
+        spec = f" s({person})1"
+    elif kind == "fixed_main":
+        spec = f" s({person})C{rng.randint(2, int(expense // 2) - 1)}.5"
+    elif kind == "fixed_foreign":
+        foreign = currencies[-1]
+        share = rng.randint(2, int(expense // 4))
+        spec = f" s({person}){foreign}{max(1, round(share / rates[foreign]))}"
+    elif kind == "shared":
+        shared = rng.sample(people, min(len(people), rng.randint(2, 4)))
+        spec = "".join(f" s({other})" for other in shared)
+    else:
+        spec = ""
+    return (
+        f'"{title}" "{description}" {time_str} {payer}:{method}'
+        f" {currency}{amount}{spec}"
+    )
+
+
+def generate_xplit(**kwargs) -> str:
+    """Return a synthetic ledger as a string. See `iter_xplit_lines`."""
+    return "\n".join(iter_xplit_lines(**kwargs)) + "\n"
+
+
+def write_xplit(file: Union[Path, str, TextIO], **kwargs) -> None:
+    """Write a synthetic ledger line by line. See `iter_xplit_lines`."""
+    if isinstance(file, (Path, str)):
+        with open(file, "w", encoding="utf-8") as f:
+            write_xplit(f, **kwargs)
+        return
+    for line in iter_xplit_lines(**kwargs):
+        file.write(line)
+        file.write("\n")
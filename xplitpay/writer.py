@@ -0,0 +1,417 @@
+"""Writing xplit files
+
+`serialize_xplit` turns an `XplitLog` back into `@xplit 0.0.3` text, and
+`XplitWriter` appends entries to an existing file without rewriting it::
+
+    with XplitWriter("trip.xplit", xplit_log, SUPPORT_48_HOURS=True) as writer:
+        writer.append(XplitEntry(
+            None, "拉面", "一兰", datetime(2024, 6, 12, 19, 5), "Lynnex", "💵现金",
+            68.0, {"Lynnex": 34.0, "Kunologist": 34.0},
+        ))
+
+Entries hold resolved values, so they are written in the main currency and
+every split as a fixed amount (`s(K)C34`); shares of exactly 0 are left out.
+Amounts are written with `repr`, so they parse back to the same floats.
+
+Appends are buffered and written with a single `write` on `flush` (or when
+the `with` block ends). The writer only reads the header and the tail of
+the file, to find the people, currencies and the last `@` section. An entry
+goes to the last section when its `section_title` is `None` or the same and
+its `time` falls on the section's day (or in the early hours of the next
+day, with `SUPPORT_48_HOURS`); otherwise a new section is opened,
+named after `section_title` or dated after `time`. The appended lines are
+then parsed on their own, and the entries exactly as `parse_xplit` would
+return them are added to the given in-memory `XplitLog` and `XplitCache`.
+The `RawForm` of a log parsed with `keep_raw=True` is kept in step.
+"""
+import os
+from dataclasses import replace
+from datetime import datetime
+from itertools import chain
+from math import isfinite
+from pathlib import Path
+from typing import Iterator, List, Optional, TextIO, Tuple, Union
+
+from . import (
+    HEADER_KEYWORDS,
+    SECTION_DATE_PATTERN,
+    XPLIT_VERSION,
+    RawForm,
+    XplitEntry,
+    XplitLog,
+    _iter_entries,
+    _parse_section_header,
+    _read_header,
+    parse_date,
+    uncomment_line,
+)
+
+_TAIL_BLOCK = 8192
+# With SUPPORT_48_HOURS, appended entries before this hour of the next day
+# stay in the section of the previous day (written as e.g. `2530`)
+LATE_NIGHT_HOURS = 6
+
+
+def format_amount(amount: float) -> str:
+    """Shortest text that parses back to `amount`, without an exponent.
+
+    The format has no sign, so negative (and infinite or NaN) amounts are
+    rejected with a `ValueError`.
+    """
+    if not isfinite(amount) or amount < 0:
+        raise ValueError(f"Cannot write amount {amount!r}: must be finite and >= 0")
+    if amount == int(amount):
+        return str(int(amount))
+    text = repr(float(amount))
+    if "e" in text or "E" in text:
+        text = f"{amount:.12f}".rstrip("0")
+    return text
+
+
+def _reverse(mapping: dict) -> dict:
+    return {name: abbr for abbr, name in mapping.items()}
+
+
+def _check_text(text: str, what: str) -> str:
+    if not text or '"' in text or "#" in text or "\n" in text:
+        raise ValueError(
+            f"Cannot write {what} {text!r}:"
+            " must be non-empty and free of '\"', '#' and newlines"
+        )
+    return text
+
+
+def format_time(
+    time: Optional[datetime],
+    section_date: Optional[datetime],
+    support_48_hours: bool = False,
+) -> str:
+    """`HHMM` relative to the section date, `-` for no time."""
+    if time is None:
+        return "-"
+    if section_date is None:
+        raise ValueError(f"Cannot write time {time} in a section without a date")
+    days = (time.date() - section_date.date()).days
+    if days == 0 or (days == 1 and support_48_hours):
+        return f"{time.hour + 24 * days:02d}{time.minute:02d}"
+    raise ValueError(
+        f"Time {time} does not fall on the section date {section_date:%Y/%m/%d}"
+    )
+
+
+def format_entry(
+    entry: XplitEntry,
+    xplit_log: XplitLog,
+    section_date: Optional[datetime] = None,
+    support_48_hours: bool = False,
+) -> str:
+    """One entry line, with amounts in the main currency of `xplit_log`."""
+    main_currency = next(iter(xplit_log.currencies))
+    people = _reverse(xplit_log.people)
+    payment_methods = _reverse(xplit_log.payment_methods)
+    try:
+        paid_by = people[entry.paid_by]
+        payment_method = payment_methods[entry.payment_method]
+        splits = "".join(
+            f" s({people[person]}){main_currency}{format_amount(amount)}"
+            for person, amount in entry.splits.items()
+            if amount != 0
+        )
+    except KeyError as e:
+        raise ValueError(f"Unknown person or payment method: {e}")
+    return (
+        f'"{_check_text(entry.title, "title")}"'
+        f' "{_check_text(entry.description, "description")}"'
+        f" {format_time(entry.time, section_date, support_48_hours)}"
+        f" {paid_by}:{payment_method}"
+        f" {main_currency}{format_amount(entry.expense)}{splits}"
+    )
+
+
+def format_section_header(section_title: str) -> str:
+    """Inverse of the title normalization of the parser."""
+    first, _, rest = section_title.partition(" ")
+    if first.count("/") == 2:
+        token = datetime.strptime(first, "%Y/%m/%d").strftime("%Y%m%d")
+        return f"@ {token} {rest}" if rest else f"@ {token}"
+    if SECTION_DATE_PATTERN.match(first):
+        raise ValueError(f"Undated section title looks like a date: {section_title!r}")
+    return f"@ {_check_text(section_title, 'section title')}"
+
+
+def _iter_header_lines(xplit_log: XplitLog) -> Iterator[str]:
+    main_currency = next(iter(xplit_log.currencies))
+    yield f"@xplit {xplit_log.version or XPLIT_VERSION}"
+    yield f"@title {xplit_log.title}"
+    yield f"@author {xplit_log.author}"
+    yield "@people"
+    for abbr, name in xplit_log.people.items():
+        yield f"    {abbr}: {name}"
+    yield "@currencies"
+    for symbol, value in xplit_log.currencies.items():
+        if symbol == main_currency:
+            yield f"    {symbol}: {value}"
+        else:
+            yield f"    {symbol}: {value[0]} = {format_amount(value[1])}"
+    if xplit_log.rates is not None and xplit_log.rates.changes:
+        yield "@rates"
+        for symbol, day, rate in xplit_log.rates.changes:
+            yield f"    {day:%Y%m%d} {symbol} = {format_amount(rate)}"
+    yield "@payment_methods"
+    for code, name in xplit_log.payment_methods.items():
+        yield f"    {code}: {name}"
+    yield "@description"
+    for line in xplit_log.description.split("\n"):
+        yield f"    {line}"
+    yield "@extra_payments"
+    people = _reverse(xplit_log.people)
+    for payer, receiver, amount in xplit_log.extra_payments:
+        yield (
+            f"    {people.get(payer, payer)} -> {people.get(receiver, receiver)}:"
+            f" {main_currency}{format_amount(amount)}"
+        )
+
+
+def _next_section_header(
+    entry: XplitEntry,
+    section_title: Optional[str],
+    section_date: Optional[datetime],
+    support_48_hours: bool = False,
+) -> Optional[str]:
+    """The `@` line to write before `entry`, or `None` if it belongs to the
+    current section. See the module docstring."""
+    if entry.section_title is not None and entry.section_title != section_title:
+        return format_section_header(entry.section_title)
+    if entry.time is not None:
+        allowed = 1 if support_48_hours and entry.time.hour < LATE_NIGHT_HOURS else 0
+        days = (
+            (entry.time.date() - section_date.date()).days
+            if section_date is not None
+            else None
+        )
+        if days is None or not 0 <= days <= allowed:
+            return f"@ {entry.time:%Y%m%d}"
+    if section_title is None:
+        raise ValueError("The first section needs a section title or a time")
+    return None
+
+
+def iter_xplit_lines(xplit_log: XplitLog, **kwargs) -> Iterator[str]:
+    """Yield the lines of `serialize_xplit`, without trailing newlines."""
+    support_48_hours = kwargs.get("SUPPORT_48_HOURS", False)
+    yield from _iter_header_lines(xplit_log)
+    section_title = None
+    section_date = None
+    for entry in xplit_log.entries:
+        if entry.section_title is None:
+            # Hand-built entries go by their time, as with `XplitWriter`
+            header = _next_section_header(
+                entry, section_title, section_date, support_48_hours
+            )
+        elif entry.section_title != section_title:
+            header = format_section_header(entry.section_title)
+        else:
+            header = None
+        if header is not None:
+            section_title, own_date = _parse_section_header(header)
+            section_date = own_date or section_date
+            yield ""
+            yield header
+        yield format_entry(entry, xplit_log, section_date, support_48_hours)
+
+
+def serialize_xplit(xplit_log: XplitLog, **kwargs) -> str:
+    """`xplit_log` as `@xplit` text. Pass `SUPPORT_48_HOURS=True` to allow
+    times after midnight in the section of the previous day."""
+    return "\n".join(iter_xplit_lines(xplit_log, **kwargs)) + "\n"
+
+
+def _reverse_lines(f) -> Iterator[str]:
+    """Lines of the binary file `f`, last first, read in blocks from the end."""
+    position = f.seek(0, os.SEEK_END)
+    partial = b""
+    while position > 0:
+        size = min(_TAIL_BLOCK, position)
+        position -= size
+        f.seek(position)
+        lines = (f.read(size) + partial).split(b"\n")
+        partial = lines.pop(0)
+        for line in reversed(lines):
+            yield line.decode("utf-8")
+    yield partial.decode("utf-8")
+
+
+def _scan_tail(path: Path) -> Tuple[Optional[str], Optional[str], bool]:
+    """The last `@` section line of `path`, the date token it inherits, and
+    whether the file ends with a newline."""
+    section_line = None
+    with open(path, "rb") as f:
+        ends_with_newline = True
+        if f.seek(0, os.SEEK_END):
+            f.seek(-1, os.SEEK_END)
+            ends_with_newline = f.read(1) == b"\n"
+        for line in _reverse_lines(f):
+            line = uncomment_line(line)
+            if not line.startswith("@"):
+                continue
+            if line.split()[0][1:] in HEADER_KEYWORDS:
+                break
+            token = line[1:].split()[0] if line[1:].split() else ""
+            if SECTION_DATE_PATTERN.match(token):
+                if section_line is None:
+                    return line, None, ends_with_newline
+                return section_line, token, ends_with_newline
+            if section_line is None:
+                section_line = line
+    return section_line, None, ends_with_newline
+
+
+class XplitWriter:
+    """Appends entries to an xplit file. See the module docstring.
+
+    `xplit_log` is the parsed file, if there is one in memory; its entries
+    and `original_content` are updated on `flush`. `cache` is an
+    `XplitCache` to store the updated ledger in; it needs `xplit_log` with
+    its `original_content`. `kwargs` are the parse options of the file.
+    """
+
+    def __init__(
+        self,
+        path: Union[Path, str],
+        xplit_log: Optional[XplitLog] = None,
+        cache=None,
+        **kwargs,
+    ):
+        self.path = Path(path)
+        self.xplit_log = xplit_log
+        self.cache = cache
+        self.options = kwargs
+        self._pending: List[XplitEntry] = []
+        if xplit_log is not None:
+            self._header = xplit_log
+        else:
+            with open(self.path, "r", encoding="utf-8") as f:
+                self._header, _ = _read_header(f)
+        section_line, inherited, self._ends_with_newline = _scan_tail(self.path)
+        self._section_line = section_line
+        self._inherited = parse_date(inherited) if inherited else None
+        self._section_title, own_date = (
+            _parse_section_header(section_line) if section_line else (None, None)
+        )
+        self._section_date = own_date or self._inherited
+
+    def __enter__(self) -> "XplitWriter":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc_type is None:
+            self.flush()
+
+    def append(self, entry: XplitEntry) -> None:
+        """Queue `entry`; nothing is written before `flush`."""
+        self._pending.append(entry)
+
+    def extend(self, entries) -> None:
+        self._pending.extend(entries)
+
+    def _open_section(self, entry: XplitEntry) -> Optional[str]:
+        """The `@` line to write before `entry`, if it needs a new section."""
+        header = _next_section_header(
+            entry,
+            self._section_title,
+            self._section_date,
+            self.options.get("SUPPORT_48_HOURS", False),
+        )
+        if header is None:
+            return None
+        self._section_title, own_date = _parse_section_header(header)
+        self._section_date = own_date or self._section_date
+        return header
+
+    def flush(self) -> List[XplitEntry]:
+        """Write the queued entries at once; returns them as parsed."""
+        if not self._pending:
+            return []
+        support_48_hours = self.options.get("SUPPORT_48_HOURS", False)
+        start_line, start_date = self._section_line, self._inherited
+        state = (self._section_line, self._section_title, self._section_date)
+        lines = []
+        try:
+            for entry in self._pending:
+                header = self._open_section(entry)
+                if header is not None:
+                    lines.extend(("", header))
+                    self._section_line = header
+                    if _parse_section_header(header)[1] is None:
+                        self._inherited = self._section_date
+                    else:
+                        self._inherited = None
+                lines.append(
+                    format_entry(
+                        entry, self._header, self._section_date, support_48_hours
+                    )
+                )
+        except ValueError:
+            self._section_line, self._section_title, self._section_date = state
+            self._inherited = start_date
+            raise
+        text = "\n".join(lines) + "\n"
+        if not self._ends_with_newline:
+            text = "\n" + text
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(text)
+        self._ends_with_newline = True
+        self._pending = []
+
+        xplit_log = self.xplit_log
+        keep_raw = xplit_log is not None and xplit_log.raw is not None
+        # The raw entries are collected apart, and added with the entries
+        header = replace(self._header, raw=RawForm() if keep_raw else None)
+        entries = list(
+            _iter_entries(
+                chain([start_line] if start_line else [], filter(None, lines)),
+                header,
+                start_date,
+                **self.options,
+            )
+        )
+        if xplit_log is not None:
+            xplit_log.entries.extend(entries)
+            if keep_raw:
+                xplit_log.raw.entries.extend(header.raw.entries)
+            if xplit_log.original_content is not None:
+                xplit_log.original_content += text
+                if self.cache is not None:
+                    key = self.cache.key(
+                        xplit_log.original_content.encode("utf-8"),
+                        keep_raw=keep_raw,
+                        **self.options,
+                    )
+                    self.cache.put(key, xplit_log)
+        return entries
+
+
+def append_entries(
+    path: Union[Path, str],
+    entries,
+    xplit_log: Optional[XplitLog] = None,
+    cache=None,
+    **kwargs,
+) -> List[XplitEntry]:
+    """Append `entries` to `path` in one write. See `XplitWriter`."""
+    writer = XplitWriter(path, xplit_log, cache, **kwargs)
+    writer.extend(entries)
+    return writer.flush()
+
+
+def write_xplit_log(
+    file: Union[Path, str, TextIO], xplit_log: XplitLog, **kwargs
+) -> None:
+    """Write `serialize_xplit(xplit_log)` to a path or a text stream."""
+    if isinstance(file, (Path, str)):
+        with open(file, "w", encoding="utf-8") as f:
+            write_xplit_log(f, xplit_log, **kwargs)
+        return
+    for line in iter_xplit_lines(xplit_log, **kwargs):
+        file.write(line)
+        file.write("\n")